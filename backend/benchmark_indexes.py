@@ -0,0 +1,135 @@
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.engine import Connection
+from database import Base
+from models import ApplicationStatus, Borrower, Guarantor, Lender, LenderPolicy, LoanApplication, MatchResult
+from migrations import HOT_PATH_INDEXES, migrate
+from services.pagination import application_list, lender_list, match_list
+from utils.id_generator import generate_id
+
+
+def seed(conn: Connection, applications: int, lenders: int, policies_per_lender: int):
+    rng = random.Random(7)
+    lender_rows = [{"id": generate_id("ldr"), "name": f"Lender {i}", "is_active": i % 4 != 0} for i in range(lenders)]
+    policy_rows = [
+        {"id": generate_id("pol"), "lender_id": lender["id"], "program_name": f"Program {j}"}
+        for lender in lender_rows for j in range(policies_per_lender)
+    ]
+    conn.execute(insert(Lender), lender_rows)
+    conn.execute(insert(LenderPolicy), policy_rows)
+    
+    statuses = list(ApplicationStatus)
+    app_ids = []
+    for start in range(0, applications, 1000):
+        borrowers, guarantors, apps, matches = [], [], [], []
+        for _ in range(start, min(start + 1000, applications)):
+            borrower_id = generate_id("bor")
+            app_id = generate_id("app")
+            app_ids.append(app_id)
+            borrowers.append({
+                "id": borrower_id, "business_name": "Biz", "industry": "Construction", "state": "TX",
+                "years_in_business": 3, "annual_revenue": 400000
+            })
+            guarantors.append({"id": generate_id("gua"), "borrower_id": borrower_id, "name": "Owner", "fico_score": 700})
+            apps.append({
+                "id": app_id, "borrower_id": borrower_id, "amount": rng.randint(10, 500) * 1000, "term_months": 36,
+                "equipment_type": "Excavator", "status": rng.choice(statuses)
+            })
+            for policy in policy_rows:
+                matches.append({
+                    "id": generate_id("mtc"), "application_id": app_id, "lender_id": policy["lender_id"],
+                    "policy_id": policy["id"], "eligible": rng.random() < 0.3, "fit_score": round(rng.uniform(0, 100), 1)
+                })
+        conn.execute(insert(Borrower), borrowers)
+        conn.execute(insert(Guarantor), guarantors)
+        conn.execute(insert(LoanApplication), apps)
+        conn.execute(insert(MatchResult), matches)
+    return app_ids, lender_rows
+
+
+def workload(app_ids: list[str], lender_rows: list[dict]) -> dict:
+    app_id = app_ids[len(app_ids) // 2]
+    return {
+        "matches by score": match_list(app_id, limit=100),
+        "eligible top 10": match_list(app_id, eligible_only=True, limit=10),
+        "policies for lender": select(LenderPolicy).where(LenderPolicy.lender_id == lender_rows[-1]["id"]),
+        "active lenders": lender_list(active_only=True, limit=100),
+        "submitted applications": application_list(status="submitted", limit=100),
+        "guarantors for borrowers": select(Guarantor).where(Guarantor.borrower_id.in_(
+            select(LoanApplication.borrower_id).order_by(LoanApplication.id).limit(100)
+        )),
+    }
+
+
+def explain(conn: Connection, statement) -> list[str]:
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    if conn.dialect.name == "sqlite":
+        return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))]
+    return [row[0] for row in conn.execute(text(f"EXPLAIN {compiled}"))]
+
+
+def timed(conn: Connection, statement, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(statement).all()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def measure(engine, queries: dict, repeat: int) -> dict:
+    with engine.connect() as conn:
+        if conn.dialect.name in ("sqlite", "postgresql"):
+            conn.execute(text("ANALYZE"))
+        return {name: (explain(conn, query), timed(conn, query, repeat)) for name, query in queries.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare query plans before and after the hot-path index migration")
+    parser.add_argument("--url", default=None, help="Empty database to benchmark against (default: temporary SQLite file)")
+    parser.add_argument("--applications", type=int, default=5000)
+    parser.add_argument("--lenders", type=int, default=20)
+    parser.add_argument("--policies-per-lender", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=25)
+    args = parser.parse_args()
+    
+    path = None
+    if args.url is None:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+    engine = create_engine(args.url or f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            for name in HOT_PATH_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            app_ids, lender_rows = seed(conn, args.applications, args.lenders, args.policies_per_lender)
+        queries = workload(app_ids, lender_rows)
+        
+        before = measure(engine, queries, args.repeat)
+        started = time.perf_counter()
+        migrate(engine)
+        migration_ms = (time.perf_counter() - started) * 1000
+        after = measure(engine, queries, args.repeat)
+        
+        rows = args.applications * args.lenders * args.policies_per_lender
+        print(f"{args.applications} applications, {rows} match rows; migration took {migration_ms:.0f} ms\n")
+        for name in queries:
+            (plan_before, ms_before), (plan_after, ms_after) = before[name], after[name]
+            print(f"== {name}: {ms_before:.2f} ms -> {ms_after:.2f} ms")
+            print("   before: " + "\n           ".join(plan_before))
+            print("   after:  " + "\n           ".join(plan_after))
+            print()
+    finally:
+        engine.dispose()
+        if path:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
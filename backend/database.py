@@ -1,14 +1,58 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config import settings
+from services.query_counter import instrument
 
-engine = create_engine(settings.database_url)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite"
+}
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False) if driver else url
+
+def engine_options(url: str) -> dict:
+    parsed = make_url(url)
+    options = {"pool_pre_ping": settings.db_pool_pre_ping}
+    if parsed.get_backend_name() == "sqlite":
+        return options
+    
+    options["pool_size"] = settings.db_pool_size
+    options["max_overflow"] = settings.db_max_overflow
+    options["pool_timeout"] = settings.db_pool_timeout
+    if settings.db_statement_timeout_ms:
+        timeout = str(settings.db_statement_timeout_ms)
+        if parsed.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+engine = create_engine(settings.database_url, **engine_options(settings.database_url))
+instrument(engine)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
+async_engine = None
+AsyncSessionLocal = None
+if settings.database_mode == "async":
+    async_url = settings.async_database_url or async_database_url(settings.database_url)
+    async_engine = create_async_engine(async_url, **engine_options(async_url))
+    instrument(async_engine.sync_engine)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
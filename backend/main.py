@@ -1,9 +1,20 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from routers import applications_router, lenders_router, underwriting_router, matches_router, imports_router
+from config import settings
+from database import async_engine, engine, Base
+from routers import (
+    applications_router, lenders_router, underwriting_router, matches_router, imports_router,
+    async_applications_router, async_lenders_router, async_matches_router, with_fallback
+)
+from services.underwriting import match_writer, underwriting_jobs
+from services.pagination import NEXT_CURSOR_HEADER
+from services.query_counter import count_queries
+from migrations import migrate
 
 Base.metadata.create_all(bind=engine)
+migrate(engine)
+
+STREAMING_MEDIA_TYPES = ("application/x-ndjson", "text/event-stream")
 
 app = FastAPI(
     title="Lender Matching Platform",
@@ -16,15 +27,39 @@ app.add_middleware(
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "X-Query-Count"]
 )
 
+@app.middleware("http")
+async def count_request_queries(request: Request, call_next):
+    with count_queries(settings.query_budget or None) as counter:
+        response = await call_next(request)
+    if response.headers.get("content-type", "").split(";")[0] not in STREAMING_MEDIA_TYPES:
+        response.headers["X-Query-Count"] = str(counter.count)
+    return response
+
+if settings.database_mode == "async":
+    applications_router = with_fallback(async_applications_router, applications_router)
+    lenders_router = with_fallback(async_lenders_router, lenders_router)
+    matches_router = with_fallback(async_matches_router, matches_router)
+
 app.include_router(applications_router)
 app.include_router(lenders_router)
 app.include_router(underwriting_router)
 app.include_router(matches_router)
 app.include_router(imports_router)
 
+@app.on_event("shutdown")
+def shutdown():
+    underwriting_jobs.shutdown(wait=True)
+    match_writer.shutdown()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    if async_engine is not None:
+        await async_engine.dispose()
+
 @app.get("/")
 def root():
     return {"message": "Lender Matching Platform API", "docs": "/docs"}
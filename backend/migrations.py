@@ -0,0 +1,212 @@
+import argparse
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, Optional
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Dialect, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex
+from database import Base
+from models import MatchResult
+
+COMPACT_MATCH_COLUMNS = ("met_mask", "failed_mask", "observed")
+
+HOT_PATH_INDEXES = (
+    "ix_match_results_application_score",
+    "ix_match_results_application_eligible_score",
+    "ix_lender_policies_lender_id",
+    "ix_lenders_is_active",
+    "ix_loan_applications_status",
+    "ix_guarantors_borrower_id",
+)
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], list[str]]
+    transactional: bool = True
+
+
+def add_match_columns(conn: Connection, names: tuple[str, ...]) -> list[str]:
+    inspector = inspect(conn)
+    if not inspector.has_table(MatchResult.__tablename__):
+        return []
+    
+    existing = {column["name"] for column in inspector.get_columns(MatchResult.__tablename__)}
+    added = []
+    for name in names:
+        if name in existing:
+            continue
+        column_type = MatchResult.__table__.c[name].type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {MatchResult.__tablename__} ADD COLUMN {name} {column_type}"))
+        added.append(name)
+    return added
+
+
+def compact_match_columns(conn: Connection) -> list[str]:
+    return add_match_columns(conn, COMPACT_MATCH_COLUMNS)
+
+
+def compact_bounds(conn: Connection) -> list[str]:
+    return add_match_columns(conn, ("bounds",))
+
+
+def create_index_ddl(index: Index, dialect: Dialect) -> str:
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+    if dialect.name == "postgresql":
+        ddl = ddl.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)
+    return ddl
+
+
+def drop_invalid_index(conn: Connection, name: str):
+    invalid = conn.execute(text(
+        "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": name}).first()
+    if invalid:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def create_indexes(conn: Connection, names: tuple[str, ...]) -> list[str]:
+    indexes = {index.name: index for table in Base.metadata.tables.values() for index in table.indexes}
+    created = []
+    for name in names:
+        index = indexes[name]
+        inspector = inspect(conn)
+        if not inspector.has_table(index.table.name):
+            continue
+        if conn.dialect.name == "postgresql":
+            drop_invalid_index(conn, name)
+        if name in {existing["name"] for existing in inspector.get_indexes(index.table.name)}:
+            continue
+        conn.execute(text(create_index_ddl(index, conn.dialect)))
+        created.append(name)
+    return created
+
+
+def hot_path_indexes(conn: Connection) -> list[str]:
+    return create_indexes(conn, HOT_PATH_INDEXES)
+
+
+def unique_match_policy(conn: Connection) -> list[str]:
+    if not inspect(conn).has_table(MatchResult.__tablename__):
+        return []
+    
+    conn.execute(text(
+        f"DELETE FROM {MatchResult.__tablename__} WHERE id NOT IN "
+        f"(SELECT MIN(id) FROM {MatchResult.__tablename__} GROUP BY application_id, policy_id)"
+    ))
+    return create_indexes(conn, ("uq_match_results_application_policy",))
+
+
+MIGRATIONS = (
+    Migration(1, "compact_match_columns", compact_match_columns),
+    Migration(2, "hot_path_indexes", hot_path_indexes, transactional=False),
+    Migration(3, "unique_match_policy", unique_match_policy, transactional=False),
+    Migration(4, "compact_bounds", compact_bounds),
+)
+
+
+def add_compact_match_columns(engine: Engine) -> list[str]:
+    with engine.begin() as conn:
+        return compact_match_columns(conn)
+
+
+def applied_versions(engine: Engine) -> dict[int, datetime]:
+    if not inspect(engine).has_table(schema_migrations.name):
+        return {}
+    with engine.connect() as conn:
+        return dict(conn.execute(select(schema_migrations.c.version, schema_migrations.c.applied_at)).all())
+
+
+def create_version_table(engine: Engine):
+    try:
+        schema_migrations.create(engine, checkfirst=True)
+    except DBAPIError:
+        if not inspect(engine).has_table(schema_migrations.name):
+            raise
+
+
+@contextmanager
+def migration_connection(engine: Engine, migration: Migration) -> Iterator[Connection]:
+    if migration.transactional or engine.dialect.name != "postgresql":
+        with engine.begin() as conn:
+            yield conn
+    else:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            yield conn
+
+
+@contextmanager
+def migration_lock(engine: Engine) -> Iterator[None]:
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SELECT pg_advisory_lock(hashtext('schema_migrations'))"))
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext('schema_migrations'))"))
+
+
+def migrate(engine: Engine, target: Optional[int] = None) -> dict[str, list[str]]:
+    applied = {}
+    with migration_lock(engine):
+        create_version_table(engine)
+        done = applied_versions(engine)
+        for migration in MIGRATIONS:
+            if migration.version in done or (target is not None and migration.version > target):
+                continue
+            with migration_connection(engine, migration) as conn:
+                applied[migration.name] = migration.apply(conn)
+                conn.execute(schema_migrations.insert().values(
+                    version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+                ))
+    return applied
+
+
+def main():
+    from database import SessionLocal, engine
+    from services.criteria_codec import backfill_compact
+    
+    parser = argparse.ArgumentParser(description="Apply schema upgrades and data backfills")
+    parser.add_argument("--status", action="store_true", help="List migrations and whether they have been applied")
+    parser.add_argument("--target", type=int, default=None, help="Apply migrations up to this version only")
+    parser.add_argument("--backfill-compact", action="store_true", help="Convert JSON match criteria to compact bitmasks")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    
+    if args.status:
+        versions = applied_versions(engine)
+        for migration in MIGRATIONS:
+            applied_at = versions.get(migration.version)
+            print(f"{migration.version:>4}  {migration.name:<28} {applied_at or 'pending'}")
+        return
+    
+    applied = migrate(engine, args.target)
+    for name, changes in applied.items():
+        print(f"Applied {name}: {changes or 'no changes'}")
+    if not applied:
+        print("Schema is up to date")
+    if args.backfill_compact:
+        db = SessionLocal()
+        try:
+            print(backfill_compact(db, args.batch_size))
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
 from models.application import Borrower, Guarantor, LoanApplication, ApplicationStatus
 from models.lender import Lender, LenderPolicy
 from models.match import MatchResult
+from models.catalog import CatalogVersion, GLOBAL_VERSION_KEY
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, ForeignKey, Enum as SQLEnum, Integer
+from sqlalchemy import Column, String, Float, ForeignKey, Enum as SQLEnum, Index, Integer
 from sqlalchemy.orm import relationship
 from database import Base
 from utils.id_generator import app_id, borrower_id, guarantor_id
@@ -28,7 +28,7 @@ class Guarantor(Base):
     __tablename__ = "guarantors"
     
     id = Column(String, primary_key=True, default=guarantor_id)
-    borrower_id = Column(String, ForeignKey("borrowers.id"), nullable=False)
+    borrower_id = Column(String, ForeignKey("borrowers.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     fico_score = Column(Integer, nullable=False)
     has_bankruptcy = Column(Integer, default=0)
@@ -50,3 +50,7 @@ class LoanApplication(Base):
     
     borrower = relationship("Borrower", back_populates="applications")
     matches = relationship("MatchResult", back_populates="application", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("ix_loan_applications_status", status, id),
+    )
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, Integer
+from database import Base
+
+GLOBAL_VERSION_KEY = "*"
+
+class CatalogVersion(Base):
+    __tablename__ = "catalog_versions"
+    
+    lender_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -9,7 +9,7 @@ class Lender(Base):
     id = Column(String, primary_key=True, default=lender_id)
     name = Column(String, nullable=False, unique=True)
     description = Column(String, nullable=True)
-    is_active = Column(Boolean, default=True)
+    is_active = Column(Boolean, default=True, index=True)
     
     policies = relationship("LenderPolicy", back_populates="lender", cascade="all, delete-orphan")
 
@@ -17,7 +17,7 @@ class LenderPolicy(Base):
     __tablename__ = "lender_policies"
     
     id = Column(String, primary_key=True, default=policy_id)
-    lender_id = Column(String, ForeignKey("lenders.id"), nullable=False)
+    lender_id = Column(String, ForeignKey("lenders.id"), nullable=False, index=True)
     program_name = Column(String, nullable=False)
     
     fico_min = Column(Integer, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, String, Float, Boolean, ForeignKey, Index, Integer, JSON
 from sqlalchemy.orm import relationship
 from database import Base
 from utils.id_generator import match_id
@@ -20,5 +20,16 @@ class MatchResult(Base):
     criteria_failed = Column(JSON, nullable=True)
     rejection_reasons = Column(JSON, nullable=True)
     
+    met_mask = Column(Integer, nullable=True)
+    failed_mask = Column(Integer, nullable=True)
+    observed = Column(JSON, nullable=True)
+    bounds = Column(JSON, nullable=True)
+    
     application = relationship("LoanApplication", back_populates="matches")
+    
+    __table_args__ = (
+        Index("ix_match_results_application_score", application_id, fit_score.desc(), id),
+        Index("ix_match_results_application_eligible_score", application_id, eligible, fit_score.desc(), id),
+        Index("uq_match_results_application_policy", application_id, policy_id, unique=True),
+    )
 
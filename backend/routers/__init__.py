@@ -1,5 +1,20 @@
+from fastapi import APIRouter
 from routers.applications import router as applications_router
 from routers.lenders import router as lenders_router
 from routers.underwriting import router as underwriting_router
 from routers.matches import router as matches_router
 from routers.imports import router as imports_router
+from routers.async_applications import router as async_applications_router
+from routers.async_lenders import router as async_lenders_router
+from routers.async_matches import router as async_matches_router
+
+
+def with_fallback(primary: APIRouter, fallback: APIRouter) -> APIRouter:
+    taken = {(route.path, method) for route in primary.routes for method in route.methods}
+    merged = APIRouter()
+    merged.routes.extend(primary.routes)
+    merged.routes.extend(
+        route for route in fallback.routes
+        if not any((route.path, method) in taken for method in route.methods)
+    )
+    return merged
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
 from models import Borrower, Guarantor, LoanApplication, ApplicationStatus
 from schemas import LoanApplicationCreate, LoanApplicationResponse, LoanApplicationUpdate
 from services.validation import validate_application
+from services.loaders import application_query
+from services.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, application_key, application_list, page
+from services.underwriting import match_writer
 
 router = APIRouter(prefix="/applications", tags=["Applications"])
 
@@ -45,24 +48,36 @@ def create_application(data: LoanApplicationCreate, db: Session = Depends(get_db
         status=ApplicationStatus.DRAFT
     )
     db.add(application)
+    db.flush()
+    app_id = application.id
     db.commit()
-    db.refresh(application)
-    return application
+    return application_query(db).filter(LoanApplication.id == app_id).one()
 
 @router.get("", response_model=List[LoanApplicationResponse])
-def list_applications(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return db.query(LoanApplication).offset(skip).limit(limit).all()
+def list_applications(response: Response, skip: int = 0, limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+                      cursor: Optional[str] = None, status: Optional[str] = None, state: Optional[str] = None,
+                      min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+                      db: Session = Depends(get_db)):
+    try:
+        query = application_list(status, state, min_amount, max_amount, cursor, limit, skip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    applications, next_cursor = page(db.execute(query).unique().scalars().all(), limit, application_key)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return applications
 
 @router.get("/{app_id}", response_model=LoanApplicationResponse)
 def get_application(app_id: str, db: Session = Depends(get_db)):
-    app = db.query(LoanApplication).filter(LoanApplication.id == app_id).first()
+    app = application_query(db).filter(LoanApplication.id == app_id).first()
     if not app:
         raise HTTPException(status_code=404, detail="Application not found")
     return app
 
 @router.put("/{app_id}", response_model=LoanApplicationResponse)
 def update_application(app_id: str, data: LoanApplicationUpdate, db: Session = Depends(get_db)):
-    app = db.query(LoanApplication).filter(LoanApplication.id == app_id).first()
+    app = application_query(db).filter(LoanApplication.id == app_id).first()
     if not app:
         raise HTTPException(status_code=404, detail="Application not found")
     
@@ -71,8 +86,7 @@ def update_application(app_id: str, data: LoanApplicationUpdate, db: Session = D
         setattr(app, key, value)
     
     db.commit()
-    db.refresh(app)
-    return app
+    return application_query(db).filter(LoanApplication.id == app_id).one()
 
 @router.delete("/{app_id}")
 def delete_application(app_id: str, db: Session = Depends(get_db)):
@@ -80,6 +94,7 @@ def delete_application(app_id: str, db: Session = Depends(get_db)):
     if not app:
         raise HTTPException(status_code=404, detail="Application not found")
     
+    match_writer.discard(app_id)
     db.delete(app)
     db.commit()
     return {"message": "Application deleted"}
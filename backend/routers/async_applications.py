@@ -0,0 +1,115 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from database import get_async_db
+from models import Borrower, Guarantor, LoanApplication, ApplicationStatus
+from schemas import LoanApplicationCreate, LoanApplicationResponse, LoanApplicationUpdate
+from services.validation import validate_application
+from services.loaders import APPLICATION_DETAIL
+from services.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, application_key, application_list, page
+from services.underwriting import match_writer
+
+router = APIRouter(prefix="/applications", tags=["Applications"])
+
+async def load_application(db: AsyncSession, app_id: str) -> LoanApplication:
+    app = (await db.execute(
+        select(LoanApplication).options(APPLICATION_DETAIL).where(LoanApplication.id == app_id)
+    )).scalar_one_or_none()
+    if not app:
+        raise HTTPException(status_code=404, detail="Application not found")
+    return app
+
+@router.post("", response_model=LoanApplicationResponse)
+async def create_application_async(data: LoanApplicationCreate, db: AsyncSession = Depends(get_async_db)):
+    validation = validate_application(data.model_dump())
+    if not validation.valid:
+        raise HTTPException(status_code=400, detail={"errors": [e.model_dump() for e in validation.errors]})
+    
+    borrower = Borrower(
+        business_name=data.borrower.business_name,
+        industry=data.borrower.industry,
+        state=data.borrower.state,
+        years_in_business=data.borrower.years_in_business,
+        annual_revenue=data.borrower.annual_revenue,
+        paynet_score=data.borrower.paynet_score
+    )
+    db.add(borrower)
+    await db.flush()
+    
+    for g in data.borrower.guarantors:
+        db.add(Guarantor(
+            borrower_id=borrower.id,
+            name=g.name,
+            fico_score=g.fico_score,
+            has_bankruptcy=g.has_bankruptcy,
+            has_open_tax_liens=g.has_open_tax_liens
+        ))
+    
+    application = LoanApplication(
+        borrower_id=borrower.id,
+        amount=data.amount,
+        term_months=data.term_months,
+        equipment_type=data.equipment_type,
+        equipment_age_years=data.equipment_age_years,
+        equipment_description=data.equipment_description,
+        status=ApplicationStatus.DRAFT
+    )
+    db.add(application)
+    await db.flush()
+    app_id = application.id
+    await db.commit()
+    db.expunge_all()
+    return await load_application(db, app_id)
+
+@router.get("", response_model=List[LoanApplicationResponse])
+async def list_applications_async(response: Response, skip: int = 0,
+                                  limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                                  status: Optional[str] = None, state: Optional[str] = None,
+                                  min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+                                  db: AsyncSession = Depends(get_async_db)):
+    try:
+        query = application_list(status, state, min_amount, max_amount, cursor, limit, skip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    result = await db.execute(query)
+    applications, next_cursor = page(result.unique().scalars().all(), limit, application_key)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return applications
+
+@router.get("/{app_id}", response_model=LoanApplicationResponse)
+async def get_application_async(app_id: str, db: AsyncSession = Depends(get_async_db)):
+    return await load_application(db, app_id)
+
+@router.put("/{app_id}", response_model=LoanApplicationResponse)
+async def update_application_async(app_id: str, data: LoanApplicationUpdate, db: AsyncSession = Depends(get_async_db)):
+    app = await load_application(db, app_id)
+    
+    update_data = data.model_dump(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(app, key, value)
+    
+    await db.commit()
+    return app
+
+@router.delete("/{app_id}")
+async def delete_application_async(app_id: str, db: AsyncSession = Depends(get_async_db)):
+    app = await load_application(db, app_id)
+    
+    await run_in_threadpool(match_writer.discard, app_id)
+    await db.delete(app)
+    await db.commit()
+    return {"message": "Application deleted"}
+
+@router.post("/{app_id}/submit")
+async def submit_application_async(app_id: str, db: AsyncSession = Depends(get_async_db)):
+    app = await db.get(LoanApplication, app_id)
+    if not app:
+        raise HTTPException(status_code=404, detail="Application not found")
+    
+    app.status = ApplicationStatus.SUBMITTED
+    await db.commit()
+    return {"message": "Application submitted", "status": app.status.value}
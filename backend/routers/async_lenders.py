@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from database import get_async_db
+from models import Lender, LenderPolicy
+from schemas import LenderCreate, LenderResponse, LenderUpdate, LenderPolicyCreate, LenderPolicyResponse
+from services.catalog import policy_catalog
+from services.loaders import LENDER_DETAIL
+from services.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, lender_key, lender_list, page
+
+router = APIRouter(prefix="/lenders", tags=["Lenders"])
+
+async def load_lender(db: AsyncSession, lender_id: str) -> Lender:
+    lender = (await db.execute(
+        select(Lender).options(LENDER_DETAIL).where(Lender.id == lender_id)
+    )).scalar_one_or_none()
+    if not lender:
+        raise HTTPException(status_code=404, detail="Lender not found")
+    return lender
+
+async def load_policy(db: AsyncSession, lender_id: str, policy_id: str) -> LenderPolicy:
+    policy = (await db.execute(
+        select(LenderPolicy).where(LenderPolicy.id == policy_id, LenderPolicy.lender_id == lender_id)
+    )).scalar_one_or_none()
+    if not policy:
+        raise HTTPException(status_code=404, detail="Policy not found")
+    return policy
+
+@router.post("", response_model=LenderResponse)
+async def create_lender_async(data: LenderCreate, db: AsyncSession = Depends(get_async_db)):
+    lender = Lender(**data.model_dump())
+    db.add(lender)
+    await db.flush()
+    lender_id = lender.id
+    await db.run_sync(policy_catalog.mark_changed, lender_id)
+    await db.commit()
+    db.expunge_all()
+    return await load_lender(db, lender_id)
+
+@router.get("", response_model=List[LenderResponse])
+async def list_lenders_async(response: Response, active_only: bool = False, cursor: Optional[str] = None,
+                             limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), db: AsyncSession = Depends(get_async_db)):
+    try:
+        query = lender_list(active_only, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    result = await db.execute(query)
+    lenders, next_cursor = page(result.scalars().all(), limit, lender_key)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return lenders
+
+@router.get("/{lender_id}", response_model=LenderResponse)
+async def get_lender_async(lender_id: str, db: AsyncSession = Depends(get_async_db)):
+    return await load_lender(db, lender_id)
+
+@router.put("/{lender_id}", response_model=LenderResponse)
+async def update_lender_async(lender_id: str, data: LenderUpdate, db: AsyncSession = Depends(get_async_db)):
+    lender = await load_lender(db, lender_id)
+    
+    update_data = data.model_dump(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(lender, key, value)
+    
+    await db.run_sync(policy_catalog.mark_changed, lender_id)
+    await db.commit()
+    return lender
+
+@router.delete("/{lender_id}")
+async def delete_lender_async(lender_id: str, db: AsyncSession = Depends(get_async_db)):
+    lender = await load_lender(db, lender_id)
+    
+    await db.delete(lender)
+    await db.run_sync(policy_catalog.mark_changed, lender_id)
+    await db.commit()
+    return {"message": "Lender deleted"}
+
+@router.post("/{lender_id}/policies", response_model=LenderPolicyResponse)
+async def create_policy_async(lender_id: str, data: LenderPolicyCreate, db: AsyncSession = Depends(get_async_db)):
+    if await db.get(Lender, lender_id) is None:
+        raise HTTPException(status_code=404, detail="Lender not found")
+    
+    policy = LenderPolicy(lender_id=lender_id, **data.model_dump())
+    db.add(policy)
+    await db.run_sync(policy_catalog.mark_changed, lender_id)
+    await db.commit()
+    return policy
+
+@router.delete("/{lender_id}/policies/{policy_id}")
+async def delete_policy_async(lender_id: str, policy_id: str, db: AsyncSession = Depends(get_async_db)):
+    policy = await load_policy(db, lender_id, policy_id)
+    
+    await db.delete(policy)
+    await db.run_sync(policy_catalog.mark_changed, lender_id)
+    await db.commit()
+    return {"message": "Policy deleted"}
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from database import get_async_db
+from models import MatchResult, LoanApplication
+from schemas import MatchResultResponse
+from services.criteria_codec import expand_matches
+from services.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, match_key, match_list, page, pending_match_list
+from services.underwriting import match_writer
+
+router = APIRouter(prefix="/matches", tags=["Matches"])
+
+@router.get("/{app_id}", response_model=List[MatchResultResponse])
+async def get_matches_async(app_id: str, response: Response, min_fit_score: Optional[float] = None,
+                            eligible_only: bool = False, cursor: Optional[str] = None,
+                            limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), db: AsyncSession = Depends(get_async_db)):
+    if await db.get(LoanApplication, app_id) is None:
+        raise HTTPException(status_code=404, detail="Application not found")
+    
+    try:
+        pending = match_writer.pending(app_id)
+        if pending is not None:
+            rows = pending_match_list(pending, min_fit_score, eligible_only, cursor, limit)
+        else:
+            rows = (await db.execute(match_list(app_id, min_fit_score, eligible_only, cursor, limit))).scalars().all()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    matches, next_cursor = page(rows, limit, match_key)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return matches if pending is not None else await db.run_sync(expand_matches, matches)
+
+@router.get("/{app_id}/eligible", response_model=List[MatchResultResponse])
+async def get_eligible_matches_async(app_id: str, top_k: Optional[int] = Query(None, ge=1, le=100),
+                                     db: AsyncSession = Depends(get_async_db)):
+    pending = match_writer.pending(app_id)
+    if pending is not None:
+        eligible = sorted((MatchResult(**row) for row in pending if row["eligible"]), key=lambda m: m.fit_score, reverse=True)
+        return eligible[:top_k]
+    
+    query = select(MatchResult).where(
+        MatchResult.application_id == app_id,
+        MatchResult.eligible == True
+    ).order_by(MatchResult.fit_score.desc())
+    if top_k is not None:
+        query = query.limit(top_k)
+    result = await db.execute(query)
+    return await db.run_sync(expand_matches, result.scalars().all())
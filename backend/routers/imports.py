@@ -6,6 +6,7 @@ import tempfile
 from database import get_db
 from models import Lender, LenderPolicy
 from services.pdf_parser import parse_pdf, parse_all_pdfs
+from services.catalog import policy_catalog
 
 router = APIRouter(prefix="/import", tags=["Import"])
 
@@ -54,6 +55,7 @@ async def import_pdf(file: UploadFile = File(...), db: Session = Depends(get_db)
             db.add(policy)
             policies_created.append(program.get("name", "Standard Program"))
         
+        policy_catalog.mark_changed(db, lender.id)
         db.commit()
         
         return {
@@ -72,6 +74,7 @@ def import_from_directory(directory: str, db: Session = Depends(get_db)):
     
     results = parse_all_pdfs(directory)
     imported = []
+    lender_ids = []
     
     for data in results:
         if "error" in data:
@@ -88,6 +91,7 @@ def import_from_directory(directory: str, db: Session = Depends(get_db)):
         if not programs:
             programs = [{"name": "Standard Program"}]
         
+        lender_ids.append(lender.id)
         policies_created = []
         for program in programs:
             policy = LenderPolicy(
@@ -115,6 +119,7 @@ def import_from_directory(directory: str, db: Session = Depends(get_db)):
             "policies": policies_created
         })
     
+    policy_catalog.mark_changed(db, *lender_ids)
     db.commit()
     return {"imported": imported, "total": len(imported)}
 
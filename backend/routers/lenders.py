@@ -1,12 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
-from models import Lender, LenderPolicy
+from config import settings
+from models import Lender, LenderPolicy, ApplicationStatus
 from schemas import (
     LenderCreate, LenderResponse, LenderUpdate,
-    LenderPolicyCreate, LenderPolicyResponse, LenderPolicyUpdate
+    LenderPolicyCreate, LenderPolicyResponse, LenderPolicyUpdate,
+    LenderPolicyUpdateResponse, PolicyReachResponse,
+    PolicyBacktestResponse
 )
+from services.application_index import application_index
+from services.backtest import backtest_policy
+from services.catalog import policy_catalog
+from services.loaders import lender_query
+from services.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, lender_key, lender_list, page
+from services.underwriting import run_policy_reunderwrite_job, underwriting_jobs
 
 router = APIRouter(prefix="/lenders", tags=["Lenders"])
 
@@ -14,17 +24,48 @@ router = APIRouter(prefix="/lenders", tags=["Lenders"])
 def create_lender(data: LenderCreate, db: Session = Depends(get_db)):
     lender = Lender(**data.model_dump())
     db.add(lender)
+    db.flush()
+    lender_id = lender.id
+    policy_catalog.mark_changed(db, lender_id)
     db.commit()
-    db.refresh(lender)
-    return lender
+    return lender_query(db).filter(Lender.id == lender_id).one()
 
 @router.get("", response_model=List[LenderResponse])
-def list_lenders(db: Session = Depends(get_db)):
-    return db.query(Lender).all()
+def list_lenders(response: Response, active_only: bool = False, cursor: Optional[str] = None,
+                 limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_db)):
+    try:
+        query = lender_list(active_only, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    lenders, next_cursor = page(db.execute(query).scalars().all(), limit, lender_key)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return lenders
+
+@router.post("/policies/preview-reach", response_model=PolicyReachResponse)
+def preview_policy_reach(data: LenderPolicyCreate, status: Optional[List[str]] = Query(None),
+                         limit: int = Query(100, ge=0, le=10000), db: Session = Depends(get_db)):
+    for value in status or []:
+        try:
+            ApplicationStatus(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Unknown status: {value}")
+    
+    started = time.perf_counter()
+    index = application_index.get(db)
+    reach = index.reach(LenderPolicy(**data.model_dump()), status)
+    reach["application_ids"] = reach["application_ids"][:limit]
+    
+    return PolicyReachResponse(
+        **reach,
+        index_age_seconds=round(time.monotonic() - index.built_at, 2),
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 2)
+    )
 
 @router.get("/{lender_id}", response_model=LenderResponse)
 def get_lender(lender_id: str, db: Session = Depends(get_db)):
-    lender = db.query(Lender).filter(Lender.id == lender_id).first()
+    lender = lender_query(db).filter(Lender.id == lender_id).first()
     if not lender:
         raise HTTPException(status_code=404, detail="Lender not found")
     return lender
@@ -39,9 +80,9 @@ def update_lender(lender_id: str, data: LenderUpdate, db: Session = Depends(get_
     for key, value in update_data.items():
         setattr(lender, key, value)
     
+    policy_catalog.mark_changed(db, lender.id)
     db.commit()
-    db.refresh(lender)
-    return lender
+    return lender_query(db).filter(Lender.id == lender_id).one()
 
 @router.delete("/{lender_id}")
 def delete_lender(lender_id: str, db: Session = Depends(get_db)):
@@ -50,6 +91,7 @@ def delete_lender(lender_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Lender not found")
     
     db.delete(lender)
+    policy_catalog.mark_changed(db, lender_id)
     db.commit()
     return {"message": "Lender deleted"}
 
@@ -61,11 +103,12 @@ def create_policy(lender_id: str, data: LenderPolicyCreate, db: Session = Depend
     
     policy = LenderPolicy(lender_id=lender_id, **data.model_dump())
     db.add(policy)
+    policy_catalog.mark_changed(db, lender_id)
     db.commit()
     db.refresh(policy)
     return policy
 
-@router.put("/{lender_id}/policies/{policy_id}", response_model=LenderPolicyResponse)
+@router.put("/{lender_id}/policies/{policy_id}", response_model=LenderPolicyUpdateResponse)
 def update_policy(lender_id: str, policy_id: str, data: LenderPolicyUpdate, db: Session = Depends(get_db)):
     policy = db.query(LenderPolicy).filter(
         LenderPolicy.id == policy_id,
@@ -78,9 +121,29 @@ def update_policy(lender_id: str, policy_id: str, data: LenderPolicyUpdate, db:
     for key, value in update_data.items():
         setattr(policy, key, value)
     
+    policy_catalog.mark_changed(db, lender_id)
     db.commit()
     db.refresh(policy)
-    return policy
+    
+    response = LenderPolicyUpdateResponse.model_validate(policy)
+    if update_data:
+        job = underwriting_jobs.submit(policy.id, run_policy_reunderwrite_job, kind="policy", requeue_running=True)
+        response.reunderwriting_job_id = job.id
+    return response
+
+@router.post("/{lender_id}/policies/{policy_id}/backtest", response_model=PolicyBacktestResponse)
+def backtest_policy_update(lender_id: str, policy_id: str, data: LenderPolicyUpdate,
+                           parallel: bool = False, chunk_size: int = Query(1000, ge=1, le=10000),
+                           sample_limit: int = Query(100, ge=0, le=10000), db: Session = Depends(get_db)):
+    policy = db.query(LenderPolicy).filter(
+        LenderPolicy.id == policy_id,
+        LenderPolicy.lender_id == lender_id
+    ).first()
+    if not policy:
+        raise HTTPException(status_code=404, detail="Policy not found")
+    
+    workers = settings.underwriting_workers if parallel else 1
+    return backtest_policy(db, policy, data.model_dump(exclude_unset=True), chunk_size, workers, sample_limit)
 
 @router.delete("/{lender_id}/policies/{policy_id}")
 def delete_policy(lender_id: str, policy_id: str, db: Session = Depends(get_db)):
@@ -92,5 +155,6 @@ def delete_policy(lender_id: str, policy_id: str, db: Session = Depends(get_db))
         raise HTTPException(status_code=404, detail="Policy not found")
     
     db.delete(policy)
+    policy_catalog.mark_changed(db, lender_id)
     db.commit()
     return {"message": "Policy deleted"}
@@ -1,25 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from database import get_db
 from models import MatchResult, LoanApplication
-from schemas import MatchResultResponse
+from schemas import MatchResultResponse, NearMiss, NearMissResponse
+from services.catalog import policy_catalog
+from services.criteria_codec import expand_matches
+from services.features import ApplicationFeatures
+from services.loaders import application_query
+from services.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, match_key, match_list, page, pending_match_list
+from services.underwriting import match_writer
 
 router = APIRouter(prefix="/matches", tags=["Matches"])
 
 @router.get("/{app_id}", response_model=List[MatchResultResponse])
-def get_matches(app_id: str, db: Session = Depends(get_db)):
+def get_matches(app_id: str, response: Response, min_fit_score: Optional[float] = None, eligible_only: bool = False,
+                cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+                db: Session = Depends(get_db)):
     application = db.query(LoanApplication).filter(LoanApplication.id == app_id).first()
     if not application:
         raise HTTPException(status_code=404, detail="Application not found")
     
-    matches = db.query(MatchResult).filter(MatchResult.application_id == app_id).order_by(MatchResult.fit_score.desc()).all()
-    return matches
+    try:
+        pending = match_writer.pending(app_id)
+        if pending is not None:
+            rows = pending_match_list(pending, min_fit_score, eligible_only, cursor, limit)
+        else:
+            rows = db.execute(match_list(app_id, min_fit_score, eligible_only, cursor, limit)).scalars().all()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    matches, next_cursor = page(rows, limit, match_key)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return matches if pending is not None else expand_matches(db, matches)
 
 @router.get("/{app_id}/eligible", response_model=List[MatchResultResponse])
-def get_eligible_matches(app_id: str, db: Session = Depends(get_db)):
-    matches = db.query(MatchResult).filter(
+def get_eligible_matches(app_id: str, top_k: Optional[int] = Query(None, ge=1, le=100), db: Session = Depends(get_db)):
+    pending = match_writer.pending(app_id)
+    if pending is not None:
+        eligible = sorted((MatchResult(**row) for row in pending if row["eligible"]), key=lambda m: m.fit_score, reverse=True)
+        return eligible[:top_k]
+    
+    query = db.query(MatchResult).filter(
         MatchResult.application_id == app_id,
         MatchResult.eligible == True
-    ).order_by(MatchResult.fit_score.desc()).all()
-    return matches
+    ).order_by(MatchResult.fit_score.desc())
+    if top_k is not None:
+        query = query.limit(top_k)
+    return expand_matches(db, query.all())
+
+@router.get("/{app_id}/near-misses", response_model=NearMissResponse)
+def get_near_misses(app_id: str, max_failures: int = Query(1, ge=1, le=5), db: Session = Depends(get_db)):
+    application = application_query(db).filter(LoanApplication.id == app_id).first()
+    if not application:
+        raise HTTPException(status_code=404, detail="Application not found")
+    
+    catalog = policy_catalog.get(db)
+    features = ApplicationFeatures.from_application(application)
+    
+    near_misses = [
+        NearMiss(
+            lender_id=lender.id,
+            lender_name=lender.name,
+            policy_id=policy.id,
+            program_name=policy.program_name,
+            failed_count=len(criteria_failed),
+            criteria_failed=criteria_failed,
+            fixable=adjustments is not None,
+            adjustments=adjustments or []
+        )
+        for lender, policy, criteria_failed, adjustments in catalog.matrix.near_misses(features, max_failures)
+    ]
+    return NearMissResponse(
+        application_id=app_id,
+        max_failures=max_failures,
+        total_policies=len(catalog.entries),
+        near_misses=near_misses
+    )
@@ -1,71 +1,134 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+import json
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Optional
 from database import get_db
-from models import LoanApplication, Lender, LenderPolicy, MatchResult, ApplicationStatus
-from schemas import UnderwritingResponse, MatchResultResponse
-from services.rules import run_all_rules, get_available_rules
-from services.validation import validate_application
+from config import settings
+from models import LoanApplication, ApplicationStatus
+from schemas import UnderwritingResponse, MatchResultResponse, BatchUnderwritingRequest, BatchUnderwritingResponse
+from services.rules import get_available_rules, get_rule_stats
+from services.catalog import policy_catalog
+from services.criteria_codec import expand_matches
+from services.result_cache import result_cache
+from services.features import ApplicationFeatures
+from services.loaders import application_query
+from services.underwriting import (
+    underwrite_application, underwrite_top_k, underwrite_batch, underwriting_jobs,
+    run_underwriting_job, stream_application, match_writer
+)
 
 router = APIRouter(prefix="/underwrite", tags=["Underwriting"])
 
+@router.post("/batch", response_model=BatchUnderwritingResponse)
+def run_batch_underwriting(data: BatchUnderwritingRequest, db: Session = Depends(get_db)):
+    if data.application_ids is None and data.status is None:
+        raise HTTPException(status_code=400, detail="Provide application_ids or status")
+    
+    status = None
+    if data.status is not None:
+        try:
+            status = ApplicationStatus(data.status)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Unknown status: {data.status}")
+    
+    workers = settings.underwriting_workers if data.parallel else 1
+    return underwrite_batch(db, data.application_ids, status, data.chunk_size, workers)
+
 @router.post("/{app_id}", response_model=UnderwritingResponse)
-def run_underwriting(app_id: str, db: Session = Depends(get_db)):
-    application = db.query(LoanApplication).filter(LoanApplication.id == app_id).first()
+def run_underwriting(app_id: str, run_async: bool = Query(False, alias="async"),
+                     top_k: Optional[int] = Query(None, ge=1, le=100), detail: bool = False,
+                     db: Session = Depends(get_db)):
+    application = application_query(db).filter(LoanApplication.id == app_id).first()
     if not application:
         raise HTTPException(status_code=404, detail="Application not found")
     
-    db.query(MatchResult).filter(MatchResult.application_id == app_id).delete()
-    
-    application.status = ApplicationStatus.UNDERWRITING
-    db.commit()
-    
-    lenders = db.query(Lender).filter(Lender.is_active == True).all()
-    
-    matches = []
-    for lender in lenders:
-        for policy in lender.policies:
-            eligible, score, met, failed, reasons = run_all_rules(application, policy)
-            
-            match = MatchResult(
-                application_id=app_id,
-                lender_id=lender.id,
-                policy_id=policy.id,
-                lender_name=lender.name,
-                eligible=eligible,
-                fit_score=score,
-                matched_program=policy.program_name if eligible else None,
-                criteria_met=met,
-                criteria_failed=failed,
-                rejection_reasons=reasons if not eligible else None
-            )
-            db.add(match)
-            matches.append(match)
+    if run_async:
+        job = underwriting_jobs.submit(app_id, run_underwriting_job)
+        return JSONResponse(status_code=202, content=job.to_dict())
     
-    application.status = ApplicationStatus.COMPLETED
-    db.commit()
+    if top_k is not None and not detail:
+        catalog, top_rows, eligible_count, changes, shared = underwrite_top_k(db, application, top_k)
+        return UnderwritingResponse(
+            application_id=app_id,
+            status="completed",
+            total_lenders=len(catalog.lenders),
+            eligible_count=eligible_count,
+            changes=changes,
+            shared=shared,
+            matches=[MatchResultResponse.model_validate(row) for row in top_rows]
+        )
     
-    for m in matches:
-        db.refresh(m)
+    catalog, matches, cached, changes, shared = underwrite_application(db, application)
     
     eligible_count = sum(1 for m in matches if m.eligible)
+    if top_k is not None:
+        matches = sorted((m for m in matches if m.eligible), key=lambda m: m.fit_score, reverse=True)[:top_k]
     
     return UnderwritingResponse(
         application_id=app_id,
         status="completed",
-        total_lenders=len(lenders),
+        total_lenders=len(catalog.lenders),
         eligible_count=eligible_count,
-        matches=[MatchResultResponse.model_validate(m) for m in matches]
+        cached=cached,
+        changes=changes,
+        shared=shared,
+        matches=[MatchResultResponse.model_validate(m) for m in expand_matches(db, matches)]
     )
 
+@router.post("/{app_id}/stream")
+def stream_underwriting(app_id: str, format: str = Query("ndjson", pattern="^(ndjson|sse)$"), db: Session = Depends(get_db)):
+    application = application_query(db).filter(LoanApplication.id == app_id).first()
+    if not application:
+        raise HTTPException(status_code=404, detail="Application not found")
+    
+    features = ApplicationFeatures.from_application(application)
+    previous_status = application.status
+    application.status = ApplicationStatus.UNDERWRITING
+    db.commit()
+    
+    catalog = policy_catalog.get(db)
+    events = stream_application(app_id, catalog, features, previous_status)
+    
+    if format == "sse":
+        body = (f"event: {event}\ndata: {json.dumps(payload)}\n\n" for event, payload in events)
+        return StreamingResponse(body, media_type="text/event-stream")
+    
+    body = (json.dumps({"type": event, **payload}) + "\n" for event, payload in events)
+    return StreamingResponse(body, media_type="application/x-ndjson")
+
 @router.get("/{app_id}/status")
 def get_underwriting_status(app_id: str, db: Session = Depends(get_db)):
     application = db.query(LoanApplication).filter(LoanApplication.id == app_id).first()
     if not application:
         raise HTTPException(status_code=404, detail="Application not found")
     
-    return {"application_id": app_id, "status": application.status.value}
+    job = underwriting_jobs.latest_for(app_id)
+    return {
+        "application_id": app_id,
+        "status": application.status.value,
+        "job": job.to_dict() if job else None
+    }
+
+@router.get("/jobs/{job_id}")
+def get_underwriting_job(job_id: str):
+    job = underwriting_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 @router.get("/rules/available")
 def list_available_rules():
-    return {"rules": get_available_rules()}
+    return {"rules": get_available_rules(), **get_rule_stats()}
+
+@router.get("/catalog/stats")
+def get_catalog_stats():
+    return policy_catalog.stats()
+
+@router.get("/cache/stats")
+def get_result_cache_stats():
+    return result_cache.stats()
+
+@router.get("/writer/stats")
+def get_match_writer_stats():
+    return {"mode": settings.match_persistence, **match_writer.stats()}
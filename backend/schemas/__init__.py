@@ -5,6 +5,12 @@ from schemas.application import (
 )
 from schemas.lender import (
     LenderCreate, LenderResponse, LenderUpdate,
-    LenderPolicyCreate, LenderPolicyResponse, LenderPolicyUpdate
+    LenderPolicyCreate, LenderPolicyResponse, LenderPolicyUpdate,
+    LenderPolicyUpdateResponse,
+    PolicyReachResponse, BacktestOutcome, PolicyBacktestResponse
+)
+from schemas.match import (
+    MatchResultResponse, MatchChanges, UnderwritingResponse,
+    Adjustment, NearMiss, NearMissResponse,
+    BatchUnderwritingRequest, BatchApplicationSummary, BatchUnderwritingResponse
 )
-from schemas.match import MatchResultResponse, UnderwritingResponse
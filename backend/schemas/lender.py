@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 class LenderPolicyCreate(BaseModel):
     program_name: str
@@ -27,6 +27,36 @@ class LenderPolicyResponse(LenderPolicyCreate):
     class Config:
         from_attributes = True
 
+class LenderPolicyUpdateResponse(LenderPolicyResponse):
+    reunderwriting_job_id: Optional[str] = None
+
+class PolicyReachResponse(BaseModel):
+    total_applications: int
+    eligible_count: int
+    reach_rate: float
+    failed_by_criteria: Dict[str, int]
+    application_ids: List[str]
+    index_age_seconds: float
+    elapsed_ms: float
+
+class BacktestOutcome(BaseModel):
+    eligible_count: int
+    approval_rate: float
+    rejections_by_criteria: Dict[str, int]
+
+class PolicyBacktestResponse(BaseModel):
+    policy_id: str
+    applications: int
+    current: BacktestOutcome
+    proposed: BacktestOutcome
+    approval_rate_delta: float
+    newly_rejected_count: int
+    newly_approved_count: int
+    newly_rejected: List[str]
+    newly_approved: List[str]
+    workers: int
+    elapsed_ms: float
+
 class LenderPolicyUpdate(BaseModel):
     program_name: Optional[str] = None
     fico_min: Optional[int] = None
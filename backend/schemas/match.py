@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Union
 
 class CriteriaDetail(BaseModel):
     criteria: str
@@ -22,9 +22,61 @@ class MatchResultResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class MatchChanges(BaseModel):
+    inserted: int
+    updated: int
+    deleted: int
+
 class UnderwritingResponse(BaseModel):
     application_id: str
     status: str
     total_lenders: int
     eligible_count: int
+    cached: bool = False
+    changes: Optional[MatchChanges] = None
+    shared: bool = False
     matches: List[MatchResultResponse]
+
+class Adjustment(BaseModel):
+    field: str
+    current: Union[int, float]
+    required: Union[int, float]
+    change: Union[int, float]
+
+class NearMiss(BaseModel):
+    lender_id: str
+    lender_name: Optional[str]
+    policy_id: str
+    program_name: str
+    failed_count: int
+    criteria_failed: List[dict]
+    fixable: bool
+    adjustments: List[Adjustment]
+
+class NearMissResponse(BaseModel):
+    application_id: str
+    max_failures: int
+    total_policies: int
+    near_misses: List[NearMiss]
+
+class BatchUnderwritingRequest(BaseModel):
+    application_ids: Optional[List[str]] = None
+    status: Optional[str] = None
+    chunk_size: int = Field(500, ge=1, le=5000)
+    parallel: bool = False
+
+class BatchApplicationSummary(BaseModel):
+    application_id: str
+    status: str
+    total_policies: int
+    eligible_count: int
+
+class BatchUnderwritingResponse(BaseModel):
+    processed: int
+    matches_written: int
+    changes: MatchChanges
+    total_lenders: int
+    workers: int
+    elapsed_ms: float
+    applications_per_second: float
+    results: List[BatchApplicationSummary]
@@ -0,0 +1,181 @@
+import threading
+import time
+from typing import Iterable, Optional, Union
+import numpy as np
+from sqlalchemy.orm import Session
+from config import settings
+from models import LoanApplication, LenderPolicy
+from services.compiled_policy import CompiledPolicy, as_compiled
+from services.features import ApplicationFeatures
+from services.criteria import CRITERIA_NAMES
+from services.rules import RULES_REGISTRY
+from services.underwriting import feature_chunks
+
+
+class SortedColumn:
+
+    def __init__(self, values: list[Optional[float]]):
+        column = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        present = np.flatnonzero(~np.isnan(column))
+        self.order = present[np.argsort(column[present], kind="stable")]
+        self.values = column[self.order]
+        self.size = len(values)
+
+    def at_least(self, bound: float) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.order[np.searchsorted(self.values, bound, side="left"):]] = True
+        return mask
+
+    def at_most(self, bound: float) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.order[:np.searchsorted(self.values, bound, side="right")]] = True
+        return mask
+
+
+def _bitmaps(values: list[str]) -> dict[str, np.ndarray]:
+    bitmaps: dict[str, np.ndarray] = {}
+    for idx, value in enumerate(values):
+        if value not in bitmaps:
+            bitmaps[value] = np.zeros(len(values), dtype=bool)
+        bitmaps[value][idx] = True
+    return bitmaps
+
+
+class ApplicationIndex:
+
+    def __init__(self, items: list[tuple[str, str, ApplicationFeatures]]):
+        self.ids = [app_id for app_id, _, _ in items]
+        self.features = [f for _, _, f in items]
+        self.size = len(items)
+        self.built_at = time.monotonic()
+        features = self.features
+
+        self.fico = SortedColumn([f.fico_score if f.has_guarantor else None for f in features])
+        self.paynet = SortedColumn([f.paynet_score or None for f in features])
+        self.years = SortedColumn([f.years_in_business for f in features])
+        self.revenue = SortedColumn([f.annual_revenue for f in features])
+        self.amount = SortedColumn([f.amount for f in features])
+        self.term = SortedColumn([f.term_months for f in features])
+        self.equipment_age = SortedColumn([f.equipment_age_years for f in features])
+
+        self.statuses = _bitmaps([status for _, status, _ in items])
+        self.states = _bitmaps([f.state for f in features])
+        self.industries = _bitmaps([f.industry_lower for f in features])
+        self.equipment_types = _bitmaps([f.equipment_type_lower for f in features])
+        self.bankruptcy = np.array([f.has_guarantor and f.has_bankruptcy != 0 for f in features], dtype=bool)
+        self.tax_liens = np.array([f.has_guarantor and f.has_open_tax_liens != 0 for f in features], dtype=bool)
+
+    def _any(self, bitmaps: dict[str, np.ndarray], keys: Iterable[str]) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        for key in keys:
+            if key in bitmaps:
+                mask |= bitmaps[key]
+        return mask
+
+    def checks(self, policy: CompiledPolicy) -> dict[str, np.ndarray]:
+        checks = {}
+        if policy.fico_min:
+            checks["fico_score"] = self.fico.at_least(policy.fico_min)
+        if policy.paynet_min:
+            checks["paynet_score"] = self.paynet.at_least(policy.paynet_min)
+        if policy.min_years_in_business:
+            checks["years_in_business"] = self.years.at_least(policy.min_years_in_business)
+        if policy.min_annual_revenue:
+            checks["annual_revenue"] = self.revenue.at_least(policy.min_annual_revenue)
+        if policy.min_amount:
+            checks["loan_amount_min"] = self.amount.at_least(policy.min_amount)
+        if policy.max_amount:
+            checks["loan_amount_max"] = self.amount.at_most(policy.max_amount)
+        if policy.min_term:
+            checks["term_min"] = self.term.at_least(policy.min_term)
+        if policy.max_term:
+            checks["term_max"] = self.term.at_most(policy.max_term)
+        if policy.max_equipment_age:
+            checks["equipment_age"] = self.equipment_age.at_most(policy.max_equipment_age)
+        if policy.allowed_states:
+            checks["state_allowed"] = self._any(self.states, policy.allowed_state_set)
+        elif policy.excluded_states:
+            checks["state_allowed"] = ~self._any(self.states, policy.excluded_state_set)
+        if policy.excluded_industries:
+            checks["industry"] = ~self._any(self.industries, policy.excluded_industry_set)
+        if policy.allowed_equipment_types:
+            checks["equipment_type"] = self._any(self.equipment_types, policy.allowed_equipment_set)
+        if policy.no_bankruptcy:
+            checks["no_bankruptcy"] = ~self.bankruptcy
+        if policy.no_open_tax_liens:
+            checks["no_tax_liens"] = ~self.tax_liens
+        return checks
+
+    def reach(self, policy: Union[LenderPolicy, CompiledPolicy], statuses: Optional[list[str]] = None) -> dict:
+        policy = as_compiled(policy)
+        considered = self._any(self.statuses, statuses) if statuses else np.ones(self.size, dtype=bool)
+        checks = self.checks(policy)
+
+        eligible = considered.copy()
+        for passed in checks.values():
+            eligible &= passed
+
+        custom = [name for name in policy.rules if name not in CRITERIA_NAMES]
+        if custom:
+            for idx in np.flatnonzero(eligible).tolist():
+                for name in custom:
+                    passed, _, value, required = RULES_REGISTRY[name](self.features[idx], policy)
+                    if not passed and not (value is None and required is None):
+                        eligible[idx] = False
+                        break
+
+        total = int(considered.sum())
+        eligible_idx = np.flatnonzero(eligible).tolist()
+        return {
+            "total_applications": total,
+            "eligible_count": len(eligible_idx),
+            "reach_rate": len(eligible_idx) / total if total else 0.0,
+            "failed_by_criteria": {
+                CRITERIA_NAMES[name]: int((considered & ~passed).sum()) for name, passed in checks.items()
+            },
+            "application_ids": [self.ids[idx] for idx in eligible_idx]
+        }
+
+
+class ApplicationIndexCache:
+
+    def __init__(self, ttl: float = settings.application_index_ttl, chunk_size: int = 1000):
+        self.ttl = ttl
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._index: Optional[ApplicationIndex] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.rebuilds = 0
+
+    def get(self, db: Session) -> ApplicationIndex:
+        index = self._index
+        if index is not None and time.monotonic() - index.built_at < self.ttl:
+            self.hits += 1
+            return index
+        if index is not None and not self._lock.acquire(blocking=False):
+            self.stale_hits += 1
+            return index
+        if index is None:
+            self._lock.acquire()
+
+        try:
+            index = self._index
+            if index is None or time.monotonic() - index.built_at >= self.ttl:
+                index = self._build(db)
+                self._index = index
+                self.rebuilds += 1
+            return index
+        finally:
+            self._lock.release()
+
+    def _build(self, db: Session) -> ApplicationIndex:
+        rows = db.query(LoanApplication.id, LoanApplication.status).order_by(LoanApplication.id).all()
+        statuses = {app_id: status.value for app_id, status in rows}
+        items = []
+        for _, chunk in feature_chunks(db, list(statuses), self.chunk_size):
+            items.extend((app_id, statuses[app_id], features) for app_id, features in chunk)
+        return ApplicationIndex(items)
+
+
+application_index = ApplicationIndexCache()
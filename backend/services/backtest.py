@@ -0,0 +1,117 @@
+import time
+from collections import Counter, deque
+from typing import Iterator
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from models import Borrower, LoanApplication, LenderPolicy
+from services.catalog import CatalogLender
+from services.compiled_policy import compile_policy
+from services.evaluation import evaluate_chunk
+from services.features import ApplicationFeatures
+from services.parallel import create_pool, submit_chunk
+from services.policy_matrix import PolicyMatrix
+
+
+def proposed_policy(policy: LenderPolicy, changes: dict) -> LenderPolicy:
+    values = {column.key: getattr(policy, column.key) for column in LenderPolicy.__table__.columns}
+    values.update(changes)
+    return LenderPolicy(**values)
+
+
+def stream_features(db: Session, chunk_size: int) -> Iterator[list[tuple[str, ApplicationFeatures]]]:
+    result = db.execute(
+        select(LoanApplication)
+        .options(selectinload(LoanApplication.borrower).selectinload(Borrower.guarantors))
+        .order_by(LoanApplication.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    for partition in result.scalars().partitions():
+        yield [(a.id, ApplicationFeatures.from_application(a)) for a in partition]
+
+
+class BacktestAggregate:
+
+    def __init__(self, sample_limit: int):
+        self.sample_limit = sample_limit
+        self.applications = 0
+        self.current_eligible = 0
+        self.proposed_eligible = 0
+        self.current_rejections = Counter()
+        self.proposed_rejections = Counter()
+        self.newly_rejected_count = 0
+        self.newly_approved_count = 0
+        self.newly_rejected: list[str] = []
+        self.newly_approved: list[str] = []
+
+    def add(self, rows: list[dict]):
+        for current, proposed in zip(rows[0::2], rows[1::2]):
+            self.applications += 1
+            self.current_eligible += current["eligible"]
+            self.proposed_eligible += proposed["eligible"]
+            self.current_rejections.update(c["criteria"] for c in current["criteria_failed"])
+            self.proposed_rejections.update(c["criteria"] for c in proposed["criteria_failed"])
+
+            if current["eligible"] and not proposed["eligible"]:
+                self.newly_rejected_count += 1
+                if len(self.newly_rejected) < self.sample_limit:
+                    self.newly_rejected.append(current["application_id"])
+            elif proposed["eligible"] and not current["eligible"]:
+                self.newly_approved_count += 1
+                if len(self.newly_approved) < self.sample_limit:
+                    self.newly_approved.append(current["application_id"])
+
+    def _rate(self, eligible: int) -> float:
+        return eligible / self.applications if self.applications else 0.0
+
+    def to_dict(self) -> dict:
+        current_rate = self._rate(self.current_eligible)
+        proposed_rate = self._rate(self.proposed_eligible)
+        return {
+            "applications": self.applications,
+            "current": {
+                "eligible_count": self.current_eligible,
+                "approval_rate": current_rate,
+                "rejections_by_criteria": dict(self.current_rejections.most_common())
+            },
+            "proposed": {
+                "eligible_count": self.proposed_eligible,
+                "approval_rate": proposed_rate,
+                "rejections_by_criteria": dict(self.proposed_rejections.most_common())
+            },
+            "approval_rate_delta": proposed_rate - current_rate,
+            "newly_rejected_count": self.newly_rejected_count,
+            "newly_approved_count": self.newly_approved_count,
+            "newly_rejected": self.newly_rejected,
+            "newly_approved": self.newly_approved
+        }
+
+
+def backtest_policy(db: Session, policy: LenderPolicy, changes: dict, chunk_size: int = 1000,
+                    workers: int = 1, sample_limit: int = 100) -> dict:
+    started = time.perf_counter()
+    lender = CatalogLender(id=policy.lender_id, name=policy.lender.name)
+    entries = [(lender, compile_policy(policy)), (lender, compile_policy(proposed_policy(policy, changes)))]
+    policy_id = policy.id
+
+    aggregate = BacktestAggregate(sample_limit)
+    chunks = stream_features(db, chunk_size)
+    if workers > 1:
+        with create_pool(tuple(entries), workers) as pool:
+            pending = deque()
+            for items in chunks:
+                pending.append(submit_chunk(pool, items))
+                if len(pending) >= workers * 2:
+                    aggregate.add(pending.popleft().result()[0])
+            while pending:
+                aggregate.add(pending.popleft().result()[0])
+    else:
+        matrix = PolicyMatrix(entries)
+        for items in chunks:
+            aggregate.add(evaluate_chunk(matrix, items)[0])
+
+    return {
+        "policy_id": policy_id,
+        **aggregate.to_dict(),
+        "workers": workers,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
@@ -0,0 +1,164 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, selectinload
+from config import settings
+from models import Lender, CatalogVersion, GLOBAL_VERSION_KEY
+from services.compiled_policy import CompiledPolicy, compile_policy
+from services.policy_matrix import PolicyMatrix
+
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogLender:
+    id: str
+    name: str
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogSnapshot:
+    version: int
+    lenders: tuple[CatalogLender, ...]
+    policies: dict[str, tuple[CompiledPolicy, ...]]
+    entries: tuple[tuple[CatalogLender, CompiledPolicy], ...]
+    by_policy_id: dict[str, CompiledPolicy]
+    matrix: PolicyMatrix
+
+
+def _snapshot(version: int, lenders: list[CatalogLender], policies: dict[str, tuple[CompiledPolicy, ...]]) -> CatalogSnapshot:
+    entries = tuple((lender, p) for lender in lenders for p in policies[lender.id])
+    return CatalogSnapshot(
+        version=version,
+        lenders=tuple(lenders),
+        policies=policies,
+        entries=entries,
+        by_policy_id={p.id: p for _, p in entries},
+        matrix=PolicyMatrix(list(entries))
+    )
+
+
+def upsert_versions(db: Session, rows: list[dict], increment: bool = False):
+    dialect = db.get_bind().dialect.name
+    if dialect not in UPSERT_INSERTS:
+        raise RuntimeError(f"Unsupported database dialect for catalog versions: {dialect}")
+    
+    statement = UPSERT_INSERTS[dialect](CatalogVersion).values(rows)
+    version = CatalogVersion.version + 1 if increment else statement.excluded.version
+    db.execute(statement.on_conflict_do_update(index_elements=[CatalogVersion.lender_id], set_={"version": version}))
+
+
+class PolicyCatalog:
+
+    def __init__(self, check_interval: float = settings.catalog_check_interval):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._stale = True
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.partial_rebuilds = 0
+        self.lenders_reloaded = 0
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version if self._snapshot else 0
+
+    def mark_changed(self, db: Session, *lender_ids: str) -> int:
+        upsert_versions(db, [{"lender_id": GLOBAL_VERSION_KEY, "version": 1}], increment=True)
+        version = db.query(CatalogVersion.version).filter(CatalogVersion.lender_id == GLOBAL_VERSION_KEY).scalar()
+        if lender_ids:
+            upsert_versions(db, [{"lender_id": lender_id, "version": version} for lender_id in sorted(set(lender_ids))])
+
+        event.listen(db, "after_commit", lambda session: self.invalidate(), once=True)
+        return version
+
+    def invalidate(self):
+        self._stale = True
+
+    def get(self, db: Session) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and not self._stale and time.monotonic() - self._checked_at < self.check_interval:
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            self._stale = False
+            self._checked_at = time.monotonic()
+            version = self._remote_version(db)
+            snapshot = self._snapshot
+
+            if snapshot is None or version < snapshot.version:
+                self.misses += 1
+                snapshot = self._build(db, version)
+                self.rebuilds += 1
+            elif version != snapshot.version:
+                self.misses += 1
+                snapshot = self._refresh(db, snapshot, version)
+                self.partial_rebuilds += 1
+            else:
+                self.hits += 1
+
+            self._snapshot = snapshot
+            return snapshot
+
+    def _remote_version(self, db: Session) -> int:
+        version = db.query(CatalogVersion.version).filter(CatalogVersion.lender_id == GLOBAL_VERSION_KEY).scalar()
+        return version or 0
+
+    def _load(self, db: Session, lender_ids: Optional[set[str]] = None) -> tuple[list[CatalogLender], dict]:
+        query = db.query(Lender).options(selectinload(Lender.policies)).filter(Lender.is_active == True)
+        if lender_ids is not None:
+            query = query.filter(Lender.id.in_(lender_ids))
+
+        lenders = []
+        policies = {}
+        for row in query.all():
+            lender = CatalogLender(id=row.id, name=row.name)
+            lenders.append(lender)
+            policies[lender.id] = tuple(compile_policy(p) for p in row.policies)
+        return lenders, policies
+
+    def _build(self, db: Session, version: int) -> CatalogSnapshot:
+        lenders, policies = self._load(db)
+        return _snapshot(version, lenders, policies)
+
+    def _refresh(self, db: Session, snapshot: CatalogSnapshot, version: int) -> CatalogSnapshot:
+        changed = {
+            lender_id for (lender_id,) in db.query(CatalogVersion.lender_id).filter(
+                CatalogVersion.version > snapshot.version,
+                CatalogVersion.lender_id != GLOBAL_VERSION_KEY
+            )
+        }
+        reloaded, reloaded_policies = self._load(db, changed) if changed else ([], {})
+        self.lenders_reloaded += len(reloaded)
+
+        lenders = [l for l in snapshot.lenders if l.id not in changed] + reloaded
+        policies = {l.id: snapshot.policies[l.id] for l in snapshot.lenders if l.id not in changed}
+        policies.update(reloaded_policies)
+        return _snapshot(version, lenders, policies)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "cached": snapshot is not None,
+            "lenders": len(snapshot.lenders) if snapshot else 0,
+            "policies": len(snapshot.entries) if snapshot else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rebuilds": self.rebuilds,
+            "partial_rebuilds": self.partial_rebuilds,
+            "lenders_reloaded": self.lenders_reloaded,
+            "check_interval": self.check_interval,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+policy_catalog = PolicyCatalog()
@@ -0,0 +1,86 @@
+from dataclasses import dataclass
+from typing import Optional, Union
+from models import LenderPolicy
+from services.criteria import policy_bounds, required_strings
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledPolicy:
+    id: str
+    lender_id: str
+    program_name: str
+
+    fico_min: Optional[int]
+    fico_max: Optional[int]
+    paynet_min: Optional[int]
+    min_years_in_business: Optional[int]
+    min_annual_revenue: Optional[float]
+    min_amount: Optional[float]
+    max_amount: Optional[float]
+    min_term: Optional[int]
+    max_term: Optional[int]
+    max_equipment_age: Optional[int]
+
+    allowed_equipment_types: Optional[list]
+    allowed_states: Optional[list]
+    excluded_states: Optional[list]
+    excluded_industries: Optional[list]
+    no_bankruptcy: bool
+    no_open_tax_liens: bool
+
+    allowed_equipment_set: frozenset
+    allowed_state_set: frozenset
+    excluded_state_set: frozenset
+    excluded_industry_set: frozenset
+
+    bounds: dict
+    required: dict
+    rules: tuple
+
+
+def _copy(values: Optional[list]) -> Optional[list]:
+    return list(values) if values is not None else None
+
+
+def compile_policy(policy: LenderPolicy) -> CompiledPolicy:
+    from services.rules import RULES_REGISTRY, RULE_CONDITIONS
+
+    rules = tuple(
+        name for name in RULES_REGISTRY
+        if name not in RULE_CONDITIONS or RULE_CONDITIONS[name](policy)
+    )
+    bounds = policy_bounds(policy)
+    return CompiledPolicy(
+        id=policy.id,
+        lender_id=policy.lender_id,
+        program_name=policy.program_name,
+        fico_min=policy.fico_min,
+        fico_max=policy.fico_max,
+        paynet_min=policy.paynet_min,
+        min_years_in_business=policy.min_years_in_business,
+        min_annual_revenue=policy.min_annual_revenue,
+        min_amount=policy.min_amount,
+        max_amount=policy.max_amount,
+        min_term=policy.min_term,
+        max_term=policy.max_term,
+        max_equipment_age=policy.max_equipment_age,
+        allowed_equipment_types=_copy(policy.allowed_equipment_types),
+        allowed_states=_copy(policy.allowed_states),
+        excluded_states=_copy(policy.excluded_states),
+        excluded_industries=_copy(policy.excluded_industries),
+        no_bankruptcy=bool(policy.no_bankruptcy),
+        no_open_tax_liens=bool(policy.no_open_tax_liens),
+        allowed_equipment_set=frozenset(e.lower() for e in policy.allowed_equipment_types or []),
+        allowed_state_set=frozenset(policy.allowed_states or []),
+        excluded_state_set=frozenset(policy.excluded_states or []),
+        excluded_industry_set=frozenset(i.lower() for i in policy.excluded_industries or []),
+        bounds=bounds,
+        required=required_strings(bounds),
+        rules=rules
+    )
+
+
+def as_compiled(policy: Union[LenderPolicy, CompiledPolicy]) -> CompiledPolicy:
+    if isinstance(policy, CompiledPolicy):
+        return policy
+    return compile_policy(policy)
@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+NO_GUARANTOR = "No guarantor"
+ALL_STATES_ALLOWED = "All states allowed"
+
+
+@dataclass(frozen=True, slots=True)
+class Criterion:
+    name: str
+    bound: str
+    met: str
+    failed: Optional[str] = None
+
+    def required(self, bound: Any, passed: bool) -> str:
+        template = self.met if passed or self.failed is None else self.failed
+        return template.format(bound)
+
+
+CRITERIA = {
+    "fico_score": Criterion("FICO Score", "fico_min", ">= {}"),
+    "paynet_score": Criterion("PayNet Score", "paynet_min", ">= {}"),
+    "years_in_business": Criterion("Years in Business", "min_years_in_business", ">= {}"),
+    "annual_revenue": Criterion("Annual Revenue", "min_annual_revenue", ">= ${:,.0f}"),
+    "loan_amount_min": Criterion("Minimum Loan Amount", "min_amount", ">= ${:,.0f}"),
+    "loan_amount_max": Criterion("Maximum Loan Amount", "max_amount", "<= ${:,.0f}"),
+    "term_min": Criterion("Minimum Term", "min_term", ">= {} months"),
+    "term_max": Criterion("Maximum Term", "max_term", "<= {} months"),
+    "equipment_age": Criterion("Equipment Age", "max_equipment_age", "<= {} years"),
+    "state_allowed": Criterion("State", "allowed_states", "in {}", "must be in {}"),
+    "industry": Criterion("Industry", "excluded_industries", "Not in excluded list", "Excluded: {}"),
+    "equipment_type": Criterion("Equipment Type", "allowed_equipment_types", "in {}", "must be in {}"),
+    "no_bankruptcy": Criterion("Bankruptcy", "no_bankruptcy", "No bankruptcy allowed"),
+    "no_tax_liens": Criterion("Tax Liens", "no_open_tax_liens", "No open tax liens allowed"),
+}
+EXCLUDED_STATES = Criterion("State", "excluded_states", "not in {}", "excluded: {}")
+GUARANTOR_CHECKS = ("no_bankruptcy", "no_tax_liens")
+
+CRITERIA_NAMES = {rule: criterion.name for rule, criterion in CRITERIA.items()}
+
+
+def policy_bounds(policy: Any) -> dict[str, Any]:
+    bounds = {}
+    for criterion in (*CRITERIA.values(), EXCLUDED_STATES):
+        value = getattr(policy, criterion.bound)
+        if value:
+            bounds[criterion.bound] = list(value) if isinstance(value, list) else value
+    return bounds
+
+
+def bound_criterion(rule: str, bounds: dict) -> Optional[Criterion]:
+    criterion = CRITERIA[rule]
+    if rule == "state_allowed" and not bounds.get("allowed_states") and bounds.get("excluded_states"):
+        criterion = EXCLUDED_STATES
+    return criterion if bounds.get(criterion.bound) else None
+
+
+def rule_bounds(rules: Iterable[str], bounds: dict) -> dict[str, Any]:
+    used = {}
+    for rule in rules:
+        criterion = bound_criterion(rule, bounds)
+        if criterion is not None:
+            used[criterion.bound] = bounds[criterion.bound]
+    return used
+
+
+def required_strings(bounds: dict) -> dict[str, tuple[str, str]]:
+    required = {}
+    for rule in CRITERIA:
+        criterion = bound_criterion(rule, bounds)
+        if criterion is not None:
+            bound = bounds[criterion.bound]
+            required[rule] = (criterion.required(bound, True), criterion.required(bound, False))
+        elif rule == "state_allowed":
+            required[rule] = (ALL_STATES_ALLOWED, ALL_STATES_ALLOWED)
+    return required
+
+
+def required_value(required: dict, rule: str, passed: bool, value: Any) -> Optional[str]:
+    if rule in GUARANTOR_CHECKS and value == NO_GUARANTOR:
+        return None
+    pair = required.get(rule)
+    if pair is None:
+        return None
+    return pair[0] if passed else pair[1]
@@ -0,0 +1,146 @@
+from typing import Any, Iterable, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from config import settings
+from models import LenderPolicy, MatchResult
+from services.catalog import policy_catalog
+from services.compiled_policy import CompiledPolicy, compile_policy
+from services.criteria import CRITERIA_NAMES, required_strings, required_value, rule_bounds
+
+RULE_IDS = tuple(CRITERIA_NAMES)
+
+RULE_BITS = {name: bit for bit, name in enumerate(RULE_IDS)}
+CRITERIA_BITS = {CRITERIA_NAMES[name]: bit for name, bit in RULE_BITS.items()}
+COMPACT_FIELDS = ("met_mask", "failed_mask", "observed", "bounds")
+RESPONSE_FIELDS = (
+    "id", "application_id", "lender_id", "policy_id", "lender_name",
+    "eligible", "fit_score", "matched_program"
+)
+
+
+def encode(criteria_met: Optional[list], criteria_failed: Optional[list], policy: CompiledPolicy) -> Optional[dict]:
+    values: dict[int, Any] = {}
+    masks = [0, 0]
+    for slot, entries in enumerate((criteria_met or [], criteria_failed or [])):
+        for entry in entries:
+            bit = CRITERIA_BITS.get(entry["criteria"])
+            if bit is None or bit in values:
+                return None
+            if entry["required"] != required_value(policy.required, RULE_IDS[bit], slot == 0, entry["value"]):
+                return None
+            values[bit] = entry["value"]
+            masks[slot] |= 1 << bit
+    return {
+        "met_mask": masks[0],
+        "failed_mask": masks[1],
+        "observed": [values[bit] for bit in sorted(values)],
+        "bounds": rule_bounds((RULE_IDS[bit] for bit in values), policy.bounds)
+    }
+
+
+def decode(met_mask: int, failed_mask: int, observed: Optional[list], bounds: Optional[dict],
+           policy: Optional[CompiledPolicy] = None) -> tuple[list, list, Optional[list]]:
+    if bounds is None and policy is None:
+        raise ValueError("Compact match has no stored bounds and its policy is gone")
+    required = required_strings(bounds) if bounds is not None else policy.required
+    criteria_met = []
+    criteria_failed = []
+    rejection_reasons = []
+    values = iter(observed or [])
+    for bit, rule_name in enumerate(RULE_IDS):
+        flag = 1 << bit
+        if not (met_mask | failed_mask) & flag:
+            continue
+        value = next(values)
+        passed = bool(met_mask & flag)
+        criteria_name = CRITERIA_NAMES[rule_name]
+        entry = {"criteria": criteria_name, "value": value, "required": required_value(required, rule_name, passed, value)}
+        if passed:
+            criteria_met.append(entry)
+        else:
+            criteria_failed.append(entry)
+            rejection_reasons.append(f"{criteria_name}: {value} does not meet {entry['required']}")
+    return criteria_met, criteria_failed, rejection_reasons if failed_mask else None
+
+
+def storage_row(row: dict, policy: Optional[CompiledPolicy]) -> dict:
+    if settings.match_storage != "compact" or policy is None:
+        return row
+    compact = encode(row["criteria_met"], row["criteria_failed"], policy)
+    if compact is None:
+        return row
+    return {**row, **compact, "criteria_met": None, "criteria_failed": None, "rejection_reasons": None}
+
+
+def storage_rows(db: Session, rows: list[dict]) -> list[dict]:
+    if settings.match_storage != "compact":
+        return rows
+    policies = policy_lookup(db, {row["policy_id"] for row in rows})
+    return [storage_row(row, policies.get(row["policy_id"])) for row in rows]
+
+
+def policy_lookup(db: Session, policy_ids: Iterable[str]) -> dict[str, CompiledPolicy]:
+    by_id = policy_catalog.get(db).by_policy_id
+    found = {pid: by_id[pid] for pid in policy_ids if pid in by_id}
+    missing = set(policy_ids) - set(found)
+    if missing:
+        for policy in db.query(LenderPolicy).filter(LenderPolicy.id.in_(missing)):
+            found[policy.id] = compile_policy(policy)
+    return found
+
+
+def expand_matches(db: Session, matches: list[MatchResult]) -> list:
+    if all(m.met_mask is None for m in matches):
+        return matches
+
+    policies = policy_lookup(db, {m.policy_id for m in matches if m.met_mask is not None and m.bounds is None})
+    expanded = []
+    for m in matches:
+        policy = policies.get(m.policy_id)
+        if m.met_mask is None or (m.bounds is None and policy is None):
+            expanded.append(m)
+            continue
+        criteria_met, criteria_failed, rejection_reasons = decode(
+            m.met_mask, m.failed_mask, m.observed, m.bounds, policy
+        )
+        expanded.append({
+            **{name: getattr(m, name) for name in RESPONSE_FIELDS},
+            "criteria_met": criteria_met,
+            "criteria_failed": criteria_failed,
+            "rejection_reasons": rejection_reasons
+        })
+    return expanded
+
+
+def backfill_compact(db: Session, batch_size: int = 1000) -> dict:
+    converted = 0
+    skipped = 0
+    last_id = ""
+    while True:
+        rows = db.query(
+            MatchResult.id, MatchResult.policy_id, MatchResult.criteria_met, MatchResult.criteria_failed
+        ).filter(
+            MatchResult.id > last_id,
+            MatchResult.met_mask.is_(None)
+        ).order_by(MatchResult.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        policies = policy_lookup(db, {row.policy_id for row in rows})
+        updates = []
+        for row in rows:
+            policy = policies.get(row.policy_id)
+            compact = encode(row.criteria_met, row.criteria_failed, policy) if policy is not None else None
+            if compact is None:
+                skipped += 1
+                continue
+            updates.append({
+                "id": row.id, **compact,
+                "criteria_met": None, "criteria_failed": None, "rejection_reasons": None
+            })
+        if updates:
+            db.execute(update(MatchResult), updates)
+            db.commit()
+            converted += len(updates)
+    return {"converted": converted, "skipped": skipped}
@@ -0,0 +1,43 @@
+from services.features import ApplicationFeatures
+from services.policy_matrix import PolicyMatrix
+from utils.id_generator import match_id
+
+
+def match_row(application_id: str, lender, policy, result: tuple[bool, float, list, list, list]) -> dict:
+    eligible, score, met, failed, reasons = result
+    return {
+        "id": match_id(),
+        "application_id": application_id,
+        "lender_id": lender.id,
+        "policy_id": policy.id,
+        "lender_name": lender.name,
+        "eligible": eligible,
+        "fit_score": score,
+        "matched_program": policy.program_name if eligible else None,
+        "criteria_met": met,
+        "criteria_failed": failed,
+        "rejection_reasons": reasons if not eligible else None
+    }
+
+
+def match_rows(application_id: str, matrix: PolicyMatrix, features: ApplicationFeatures) -> list[dict]:
+    return [match_row(application_id, lender, policy, result) for lender, policy, result in matrix.evaluate(features)]
+
+
+def summarize(application_id: str, rows: list[dict]) -> dict:
+    return {
+        "application_id": application_id,
+        "status": "completed",
+        "total_policies": len(rows),
+        "eligible_count": sum(1 for r in rows if r["eligible"])
+    }
+
+
+def evaluate_chunk(matrix: PolicyMatrix, items: list[tuple[str, ApplicationFeatures]]) -> tuple[list[dict], list[dict]]:
+    rows = []
+    summaries = []
+    for application_id, features in items:
+        app_rows = match_rows(application_id, matrix, features)
+        summaries.append(summarize(application_id, app_rows))
+        rows.extend(app_rows)
+    return rows, summaries
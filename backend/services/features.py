@@ -0,0 +1,51 @@
+from dataclasses import dataclass
+from typing import Optional, Union
+from models import LoanApplication
+
+
+@dataclass(frozen=True, slots=True)
+class ApplicationFeatures:
+    has_guarantor: bool
+    fico_score: Optional[int]
+    has_bankruptcy: int
+    has_open_tax_liens: int
+    paynet_score: Optional[int]
+    years_in_business: int
+    annual_revenue: float
+    state: str
+    industry: str
+    industry_lower: str
+    equipment_type: str
+    equipment_type_lower: str
+    amount: float
+    term_months: int
+    equipment_age_years: int
+
+    @classmethod
+    def from_application(cls, app: LoanApplication) -> "ApplicationFeatures":
+        borrower = app.borrower
+        guarantors = borrower.guarantors
+        primary = guarantors[0] if guarantors else None
+        return cls(
+            has_guarantor=primary is not None,
+            fico_score=primary.fico_score if primary is not None else None,
+            has_bankruptcy=primary.has_bankruptcy if primary is not None else 0,
+            has_open_tax_liens=primary.has_open_tax_liens if primary is not None else 0,
+            paynet_score=borrower.paynet_score,
+            years_in_business=borrower.years_in_business,
+            annual_revenue=borrower.annual_revenue,
+            state=borrower.state,
+            industry=borrower.industry,
+            industry_lower=borrower.industry.lower(),
+            equipment_type=app.equipment_type,
+            equipment_type_lower=app.equipment_type.lower(),
+            amount=app.amount,
+            term_months=app.term_months,
+            equipment_age_years=app.equipment_age_years
+        )
+
+
+def as_features(app: Union[LoanApplication, ApplicationFeatures]) -> ApplicationFeatures:
+    if isinstance(app, ApplicationFeatures):
+        return app
+    return ApplicationFeatures.from_application(app)
@@ -0,0 +1,118 @@
+import enum
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from utils.id_generator import job_id
+
+
+class JobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass
+class Job:
+    key: str
+    kind: str = "application"
+    id: str = field(default_factory=job_id)
+    status: JobStatus = JobStatus.QUEUED
+    queued_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    after: Optional["Job"] = field(default=None, repr=False)
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> dict:
+        queue_ms = run_ms = None
+        if self.started_at is not None:
+            queue_ms = round((self.started_at - self.queued_at) * 1000, 2)
+        if self.finished_at is not None and self.started_at is not None:
+            run_ms = round((self.finished_at - self.started_at) * 1000, 2)
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            f"{self.kind}_id": self.key,
+            "status": self.status.value,
+            "queued_at": self.queued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_ms": queue_ms,
+            "run_ms": run_ms,
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class JobQueue:
+
+    def __init__(self, workers: int, max_retained: int = 10000):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="underwrite")
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._latest: dict[str, str] = {}
+        self.max_retained = max_retained
+
+    def submit(self, key: str, task: Callable[[str], dict], kind: str = "application",
+               requeue_running: bool = False) -> Job:
+        with self._lock:
+            current = self.latest_for(key)
+            if current is not None and current.status == JobStatus.QUEUED:
+                return current
+            if current is not None and current.status == JobStatus.RUNNING and not requeue_running:
+                return current
+            
+            after = current if current is not None and current.status == JobStatus.RUNNING else None
+            job = Job(key=key, kind=kind, after=after)
+            self._jobs[job.id] = job
+            self._latest[key] = job.id
+            self._evict()
+        self._executor.submit(self._run, job, task)
+        return job
+
+    def _run(self, job: Job, task: Callable[[str], dict]):
+        if job.after is not None:
+            job.after.done.wait()
+            job.after = None
+        job.started_at = time.time()
+        job.status = JobStatus.RUNNING
+        try:
+            job.result = task(job.key)
+            job.status = JobStatus.COMPLETED
+        except Exception as e:
+            job.error = str(e)
+            job.status = JobStatus.FAILED
+        finally:
+            job.finished_at = time.time()
+            job.done.set()
+
+    def _evict(self):
+        while len(self._jobs) > self.max_retained:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status in (JobStatus.QUEUED, JobStatus.RUNNING):
+                break
+            del self._jobs[oldest_id]
+            if self._latest.get(oldest.key) == oldest_id:
+                del self._latest[oldest.key]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def latest_for(self, key: str) -> Optional[Job]:
+        job_id = self._latest.get(key)
+        return self._jobs.get(job_id) if job_id else None
+
+    def stats(self) -> dict:
+        counts = {status.value: 0 for status in JobStatus}
+        for job in list(self._jobs.values()):
+            counts[job.status.value] += 1
+        return counts
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,13 @@
+from sqlalchemy.orm import Query, Session, joinedload, selectinload
+from models import Borrower, Lender, LoanApplication
+
+APPLICATION_DETAIL = joinedload(LoanApplication.borrower).selectinload(Borrower.guarantors)
+LENDER_DETAIL = selectinload(Lender.policies)
+
+
+def application_query(db: Session) -> Query:
+    return db.query(LoanApplication).options(APPLICATION_DETAIL)
+
+
+def lender_query(db: Session) -> Query:
+    return db.query(Lender).options(LENDER_DETAIL)
@@ -1,119 +1,117 @@
+from typing import Union
 from models import LoanApplication, LenderPolicy
+from services.features import ApplicationFeatures, as_features
+from services.compiled_policy import CompiledPolicy, as_compiled
 
-def evaluate_policy(application: LoanApplication, policy: LenderPolicy):
+def evaluate_policy(application: Union[LoanApplication, ApplicationFeatures], policy: Union[LenderPolicy, CompiledPolicy]):
     
-    borrower = application.borrower
-    guarantors = borrower.guarantors
-    primary_guarantor = guarantors[0] if guarantors else None
+    app = as_features(application)
+    policy = as_compiled(policy)
     
     criteria_met = []
     criteria_failed = []
     rejection_reasons = []
     
-    if policy.fico_min and primary_guarantor:
-        if primary_guarantor.fico_score >= policy.fico_min:
-            criteria_met.append({"criteria": "FICO Score", "value": primary_guarantor.fico_score, "required": f">= {policy.fico_min}"})
+    if policy.fico_min and app.has_guarantor:
+        if app.fico_score >= policy.fico_min:
+            criteria_met.append({"criteria": "FICO Score", "value": app.fico_score, "required": f">= {policy.fico_min}"})
         else:
-            criteria_failed.append({"criteria": "FICO Score", "value": primary_guarantor.fico_score, "required": f">= {policy.fico_min}"})
-            rejection_reasons.append(f"FICO score {primary_guarantor.fico_score} below minimum {policy.fico_min}")
+            criteria_failed.append({"criteria": "FICO Score", "value": app.fico_score, "required": f">= {policy.fico_min}"})
+            rejection_reasons.append(f"FICO score {app.fico_score} below minimum {policy.fico_min}")
     
-    if policy.paynet_min and borrower.paynet_score:
-        if borrower.paynet_score >= policy.paynet_min:
-            criteria_met.append({"criteria": "PayNet Score", "value": borrower.paynet_score, "required": f">= {policy.paynet_min}"})
+    if policy.paynet_min and app.paynet_score:
+        if app.paynet_score >= policy.paynet_min:
+            criteria_met.append({"criteria": "PayNet Score", "value": app.paynet_score, "required": f">= {policy.paynet_min}"})
         else:
-            criteria_failed.append({"criteria": "PayNet Score", "value": borrower.paynet_score, "required": f">= {policy.paynet_min}"})
-            rejection_reasons.append(f"PayNet score {borrower.paynet_score} below minimum {policy.paynet_min}")
+            criteria_failed.append({"criteria": "PayNet Score", "value": app.paynet_score, "required": f">= {policy.paynet_min}"})
+            rejection_reasons.append(f"PayNet score {app.paynet_score} below minimum {policy.paynet_min}")
     
     if policy.min_years_in_business:
-        if borrower.years_in_business >= policy.min_years_in_business:
-            criteria_met.append({"criteria": "Years in Business", "value": borrower.years_in_business, "required": f">= {policy.min_years_in_business}"})
+        if app.years_in_business >= policy.min_years_in_business:
+            criteria_met.append({"criteria": "Years in Business", "value": app.years_in_business, "required": f">= {policy.min_years_in_business}"})
         else:
-            criteria_failed.append({"criteria": "Years in Business", "value": borrower.years_in_business, "required": f">= {policy.min_years_in_business}"})
-            rejection_reasons.append(f"Time in business {borrower.years_in_business}y below minimum {policy.min_years_in_business}y")
+            criteria_failed.append({"criteria": "Years in Business", "value": app.years_in_business, "required": f">= {policy.min_years_in_business}"})
+            rejection_reasons.append(f"Time in business {app.years_in_business}y below minimum {policy.min_years_in_business}y")
     
     if policy.min_annual_revenue:
-        if borrower.annual_revenue >= policy.min_annual_revenue:
-            criteria_met.append({"criteria": "Annual Revenue", "value": borrower.annual_revenue, "required": f">= ${policy.min_annual_revenue:,.0f}"})
+        if app.annual_revenue >= policy.min_annual_revenue:
+            criteria_met.append({"criteria": "Annual Revenue", "value": app.annual_revenue, "required": f">= ${policy.min_annual_revenue:,.0f}"})
         else:
-            criteria_failed.append({"criteria": "Annual Revenue", "value": borrower.annual_revenue, "required": f">= ${policy.min_annual_revenue:,.0f}"})
-            rejection_reasons.append(f"Annual revenue ${borrower.annual_revenue:,.0f} below minimum ${policy.min_annual_revenue:,.0f}")
+            criteria_failed.append({"criteria": "Annual Revenue", "value": app.annual_revenue, "required": f">= ${policy.min_annual_revenue:,.0f}"})
+            rejection_reasons.append(f"Annual revenue ${app.annual_revenue:,.0f} below minimum ${policy.min_annual_revenue:,.0f}")
     
     if policy.min_amount:
-        if application.amount >= policy.min_amount:
-            criteria_met.append({"criteria": "Minimum Loan Amount", "value": application.amount, "required": f">= ${policy.min_amount:,.0f}"})
+        if app.amount >= policy.min_amount:
+            criteria_met.append({"criteria": "Minimum Loan Amount", "value": app.amount, "required": f">= ${policy.min_amount:,.0f}"})
         else:
-            criteria_failed.append({"criteria": "Minimum Loan Amount", "value": application.amount, "required": f">= ${policy.min_amount:,.0f}"})
-            rejection_reasons.append(f"Loan amount ${application.amount:,.0f} below minimum ${policy.min_amount:,.0f}")
+            criteria_failed.append({"criteria": "Minimum Loan Amount", "value": app.amount, "required": f">= ${policy.min_amount:,.0f}"})
+            rejection_reasons.append(f"Loan amount ${app.amount:,.0f} below minimum ${policy.min_amount:,.0f}")
     
     if policy.max_amount:
-        if application.amount <= policy.max_amount:
-            criteria_met.append({"criteria": "Maximum Loan Amount", "value": application.amount, "required": f"<= ${policy.max_amount:,.0f}"})
+        if app.amount <= policy.max_amount:
+            criteria_met.append({"criteria": "Maximum Loan Amount", "value": app.amount, "required": f"<= ${policy.max_amount:,.0f}"})
         else:
-            criteria_failed.append({"criteria": "Maximum Loan Amount", "value": application.amount, "required": f"<= ${policy.max_amount:,.0f}"})
-            rejection_reasons.append(f"Loan amount ${application.amount:,.0f} exceeds maximum ${policy.max_amount:,.0f}")
+            criteria_failed.append({"criteria": "Maximum Loan Amount", "value": app.amount, "required": f"<= ${policy.max_amount:,.0f}"})
+            rejection_reasons.append(f"Loan amount ${app.amount:,.0f} exceeds maximum ${policy.max_amount:,.0f}")
     
     if policy.min_term:
-        if application.term_months >= policy.min_term:
-            criteria_met.append({"criteria": "Minimum Term", "value": application.term_months, "required": f">= {policy.min_term} months"})
+        if app.term_months >= policy.min_term:
+            criteria_met.append({"criteria": "Minimum Term", "value": app.term_months, "required": f">= {policy.min_term} months"})
         else:
-            criteria_failed.append({"criteria": "Minimum Term", "value": application.term_months, "required": f">= {policy.min_term} months"})
-            rejection_reasons.append(f"Term {application.term_months} months below minimum {policy.min_term} months")
+            criteria_failed.append({"criteria": "Minimum Term", "value": app.term_months, "required": f">= {policy.min_term} months"})
+            rejection_reasons.append(f"Term {app.term_months} months below minimum {policy.min_term} months")
     
     if policy.max_term:
-        if application.term_months <= policy.max_term:
-            criteria_met.append({"criteria": "Maximum Term", "value": application.term_months, "required": f"<= {policy.max_term} months"})
+        if app.term_months <= policy.max_term:
+            criteria_met.append({"criteria": "Maximum Term", "value": app.term_months, "required": f"<= {policy.max_term} months"})
         else:
-            criteria_failed.append({"criteria": "Maximum Term", "value": application.term_months, "required": f"<= {policy.max_term} months"})
-            rejection_reasons.append(f"Term {application.term_months} months exceeds maximum {policy.max_term} months")
+            criteria_failed.append({"criteria": "Maximum Term", "value": app.term_months, "required": f"<= {policy.max_term} months"})
+            rejection_reasons.append(f"Term {app.term_months} months exceeds maximum {policy.max_term} months")
     
     if policy.max_equipment_age:
-        if application.equipment_age_years <= policy.max_equipment_age:
-            criteria_met.append({"criteria": "Equipment Age", "value": application.equipment_age_years, "required": f"<= {policy.max_equipment_age} years"})
+        if app.equipment_age_years <= policy.max_equipment_age:
+            criteria_met.append({"criteria": "Equipment Age", "value": app.equipment_age_years, "required": f"<= {policy.max_equipment_age} years"})
         else:
-            criteria_failed.append({"criteria": "Equipment Age", "value": application.equipment_age_years, "required": f"<= {policy.max_equipment_age} years"})
-            rejection_reasons.append(f"Equipment age {application.equipment_age_years}y exceeds maximum {policy.max_equipment_age}y")
+            criteria_failed.append({"criteria": "Equipment Age", "value": app.equipment_age_years, "required": f"<= {policy.max_equipment_age} years"})
+            rejection_reasons.append(f"Equipment age {app.equipment_age_years}y exceeds maximum {policy.max_equipment_age}y")
     
     if policy.allowed_states:
-        if borrower.state in policy.allowed_states:
-            criteria_met.append({"criteria": "State", "value": borrower.state, "required": f"in {policy.allowed_states}"})
+        if app.state in policy.allowed_state_set:
+            criteria_met.append({"criteria": "State", "value": app.state, "required": f"in {policy.allowed_states}"})
         else:
-            criteria_failed.append({"criteria": "State", "value": borrower.state, "required": f"in {policy.allowed_states}"})
-            rejection_reasons.append(f"State {borrower.state} not in allowed states")
+            criteria_failed.append({"criteria": "State", "value": app.state, "required": f"in {policy.allowed_states}"})
+            rejection_reasons.append(f"State {app.state} not in allowed states")
     
     if policy.excluded_states:
-        if borrower.state not in policy.excluded_states:
-            criteria_met.append({"criteria": "Excluded States", "value": borrower.state, "required": f"not in {policy.excluded_states}"})
+        if app.state not in policy.excluded_state_set:
+            criteria_met.append({"criteria": "Excluded States", "value": app.state, "required": f"not in {policy.excluded_states}"})
         else:
-            criteria_failed.append({"criteria": "Excluded States", "value": borrower.state, "required": f"not in {policy.excluded_states}"})
-            rejection_reasons.append(f"State {borrower.state} is excluded")
+            criteria_failed.append({"criteria": "Excluded States", "value": app.state, "required": f"not in {policy.excluded_states}"})
+            rejection_reasons.append(f"State {app.state} is excluded")
     
     if policy.excluded_industries:
-        industry_lower = borrower.industry.lower()
-        excluded_lower = [i.lower() for i in policy.excluded_industries]
-        if industry_lower not in excluded_lower:
-            criteria_met.append({"criteria": "Industry", "value": borrower.industry, "required": f"not in excluded list"})
+        if app.industry_lower not in policy.excluded_industry_set:
+            criteria_met.append({"criteria": "Industry", "value": app.industry, "required": f"not in excluded list"})
         else:
-            criteria_failed.append({"criteria": "Industry", "value": borrower.industry, "required": f"not in excluded list"})
-            rejection_reasons.append(f"Industry {borrower.industry} is excluded")
+            criteria_failed.append({"criteria": "Industry", "value": app.industry, "required": f"not in excluded list"})
+            rejection_reasons.append(f"Industry {app.industry} is excluded")
     
     if policy.allowed_equipment_types:
-        equip_lower = application.equipment_type.lower()
-        allowed_lower = [e.lower() for e in policy.allowed_equipment_types]
-        if equip_lower in allowed_lower:
-            criteria_met.append({"criteria": "Equipment Type", "value": application.equipment_type, "required": f"in {policy.allowed_equipment_types}"})
+        if app.equipment_type_lower in policy.allowed_equipment_set:
+            criteria_met.append({"criteria": "Equipment Type", "value": app.equipment_type, "required": f"in {policy.allowed_equipment_types}"})
         else:
-            criteria_failed.append({"criteria": "Equipment Type", "value": application.equipment_type, "required": f"in {policy.allowed_equipment_types}"})
-            rejection_reasons.append(f"Equipment type {application.equipment_type} not allowed")
+            criteria_failed.append({"criteria": "Equipment Type", "value": app.equipment_type, "required": f"in {policy.allowed_equipment_types}"})
+            rejection_reasons.append(f"Equipment type {app.equipment_type} not allowed")
     
-    if policy.no_bankruptcy and primary_guarantor:
-        if primary_guarantor.has_bankruptcy == 0:
+    if policy.no_bankruptcy and app.has_guarantor:
+        if app.has_bankruptcy == 0:
             criteria_met.append({"criteria": "No Bankruptcy", "value": "Clear", "required": "No bankruptcy"})
         else:
             criteria_failed.append({"criteria": "No Bankruptcy", "value": "Has bankruptcy", "required": "No bankruptcy"})
             rejection_reasons.append("Guarantor has bankruptcy on record")
     
-    if policy.no_open_tax_liens and primary_guarantor:
-        if primary_guarantor.has_open_tax_liens == 0:
+    if policy.no_open_tax_liens and app.has_guarantor:
+        if app.has_open_tax_liens == 0:
             criteria_met.append({"criteria": "No Tax Liens", "value": "Clear", "required": "No open tax liens"})
         else:
             criteria_failed.append({"criteria": "No Tax Liens", "value": "Has tax liens", "required": "No open tax liens"})
@@ -0,0 +1,107 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, Optional
+from sqlalchemy import Select, and_, or_, select
+from models import Borrower, Lender, LoanApplication, MatchResult, ApplicationStatus
+from services.loaders import APPLICATION_DETAIL, LENDER_DETAIL
+
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[list]:
+    if cursor is None:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def page(rows: list, limit: int, key: Callable[[Any], tuple]) -> tuple[list, Optional[str]]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
+
+
+def application_key(application: LoanApplication) -> tuple:
+    return (application.id,)
+
+
+def lender_key(lender: Lender) -> tuple:
+    return (lender.id,)
+
+
+def match_key(match) -> tuple:
+    return (match.fit_score, match.id)
+
+
+def application_list(status: Optional[str] = None, state: Optional[str] = None,
+                     min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+                     cursor: Optional[str] = None, limit: int = 100, skip: int = 0) -> Select:
+    query = select(LoanApplication).options(APPLICATION_DETAIL)
+    if status is not None:
+        try:
+            query = query.where(LoanApplication.status == ApplicationStatus(status))
+        except ValueError:
+            raise ValueError(f"Unknown status: {status}")
+    if state is not None:
+        query = query.join(LoanApplication.borrower).where(Borrower.state == state.upper())
+    if min_amount is not None:
+        query = query.where(LoanApplication.amount >= min_amount)
+    if max_amount is not None:
+        query = query.where(LoanApplication.amount <= max_amount)
+    after = decode_cursor(cursor, 1)
+    if after is not None:
+        query = query.where(LoanApplication.id > after[0])
+    return query.order_by(LoanApplication.id).offset(skip).limit(limit + 1)
+
+
+def lender_list(active_only: bool = False, cursor: Optional[str] = None, limit: int = 100) -> Select:
+    query = select(Lender).options(LENDER_DETAIL)
+    if active_only:
+        query = query.where(Lender.is_active == True)
+    after = decode_cursor(cursor, 1)
+    if after is not None:
+        query = query.where(Lender.id > after[0])
+    return query.order_by(Lender.id).limit(limit + 1)
+
+
+def match_list(application_id: str, min_fit_score: Optional[float] = None, eligible_only: bool = False,
+               cursor: Optional[str] = None, limit: int = 100) -> Select:
+    query = select(MatchResult).where(MatchResult.application_id == application_id)
+    if eligible_only:
+        query = query.where(MatchResult.eligible == True)
+    if min_fit_score is not None:
+        query = query.where(MatchResult.fit_score >= min_fit_score)
+    after = decode_cursor(cursor, 2)
+    if after is not None:
+        fit_score, match_id = after
+        query = query.where(or_(
+            MatchResult.fit_score < fit_score,
+            and_(MatchResult.fit_score == fit_score, MatchResult.id > match_id)
+        ))
+    return query.order_by(MatchResult.fit_score.desc(), MatchResult.id).limit(limit + 1)
+
+
+def pending_match_list(rows: list[dict], min_fit_score: Optional[float] = None, eligible_only: bool = False,
+                       cursor: Optional[str] = None, limit: int = 100) -> list[MatchResult]:
+    after = decode_cursor(cursor, 2)
+    ordered = sorted(rows, key=lambda row: (-row["fit_score"], row["id"]))
+    selected = [
+        MatchResult(**row) for row in ordered
+        if (not eligible_only or row["eligible"])
+        and (min_fit_score is None or row["fit_score"] >= min_fit_score)
+        and (after is None or (-row["fit_score"], row["id"]) > (-after[0], after[1]))
+    ]
+    return selected[:limit + 1]
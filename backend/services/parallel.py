@@ -0,0 +1,30 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from services.features import ApplicationFeatures
+from services.policy_matrix import PolicyMatrix
+from services.evaluation import evaluate_chunk
+
+_matrix: Optional[PolicyMatrix] = None
+
+
+def _init_worker(entries: tuple):
+    global _matrix
+    _matrix = PolicyMatrix(list(entries))
+
+
+def _evaluate_chunk(items: list[tuple[str, ApplicationFeatures]]) -> tuple[list[dict], list[dict]]:
+    return evaluate_chunk(_matrix, items)
+
+
+def create_pool(entries: tuple, workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(entries,)
+    )
+
+
+def submit_chunk(pool: ProcessPoolExecutor, items: list[tuple[str, ApplicationFeatures]]):
+    return pool.submit(_evaluate_chunk, items)
@@ -0,0 +1,411 @@
+import heapq
+import time
+import numpy as np
+from typing import Any, Iterator, Optional
+from services.rules import RULES_REGISTRY, rule_stats
+from services.features import ApplicationFeatures, as_features
+from services.compiled_policy import as_compiled
+from services.criteria import CRITERIA_NAMES, NO_GUARANTOR, required_value
+
+ADJUSTABLE_RULES = {
+    "loan_amount_min": ("amount", "min_amount"),
+    "loan_amount_max": ("amount", "max_amount"),
+    "term_min": ("term_months", "min_term"),
+    "term_max": ("term_months", "max_term"),
+    "equipment_age": ("equipment_age_years", "max_equipment_age"),
+}
+
+NUMERIC_FIELDS = (
+    "fico_min", "paynet_min", "min_years_in_business", "min_annual_revenue",
+    "min_amount", "max_amount", "min_term", "max_term", "max_equipment_age"
+)
+
+
+def _column(values: list) -> np.ndarray:
+    return np.array([v if v else np.nan for v in values], dtype=np.float64)
+
+
+def _vocab(*groups: list[set[str]]) -> dict[str, int]:
+    vocab: dict[str, int] = {}
+    for sets in groups:
+        for s in sets:
+            for item in sorted(s):
+                vocab.setdefault(item, len(vocab))
+    return vocab
+
+
+def _membership(sets: list[set[str]], vocab: dict[str, int]) -> np.ndarray:
+    matrix = np.zeros((len(sets), max(len(vocab), 1)), dtype=bool)
+    for row, s in enumerate(sets):
+        for item in s:
+            matrix[row, vocab[item]] = True
+    return matrix
+
+
+def _lookup(vocab: dict[str, int], matrix: np.ndarray, key: str) -> np.ndarray:
+    col = vocab.get(key)
+    if col is None:
+        return np.zeros(matrix.shape[0], dtype=bool)
+    return matrix[:, col]
+
+
+class PolicyMatrix:
+
+    def __init__(self, entries: list[tuple[Any, Any]]):
+        self.entries = [(lender, as_compiled(policy)) for lender, policy in entries]
+        policies = [p for _, p in self.entries]
+        self.size = len(policies)
+
+        self.columns = {f: _column([getattr(p, f) for p in policies]) for f in NUMERIC_FIELDS}
+        self.no_bankruptcy = np.array([bool(p.no_bankruptcy) for p in policies], dtype=bool)
+        self.no_open_tax_liens = np.array([bool(p.no_open_tax_liens) for p in policies], dtype=bool)
+
+        self.has_allowed_states = np.array([bool(p.allowed_states) for p in policies], dtype=bool)
+        self.has_excluded_states = np.array([bool(p.excluded_states) for p in policies], dtype=bool)
+        self.has_excluded_industries = np.array([bool(p.excluded_industries) for p in policies], dtype=bool)
+        self.has_allowed_equipment = np.array([bool(p.allowed_equipment_types) for p in policies], dtype=bool)
+
+        allowed_states = [p.allowed_state_set for p in policies]
+        excluded_states = [p.excluded_state_set for p in policies]
+        excluded_industries = [p.excluded_industry_set for p in policies]
+        allowed_equipment = [p.allowed_equipment_set for p in policies]
+
+        self.state_vocab = _vocab(allowed_states, excluded_states)
+        self.allowed_states = _membership(allowed_states, self.state_vocab)
+        self.excluded_states = _membership(excluded_states, self.state_vocab)
+        self.industry_vocab = _vocab(excluded_industries)
+        self.excluded_industries = _membership(excluded_industries, self.industry_vocab)
+        self.equipment_vocab = _vocab(allowed_equipment)
+        self.allowed_equipment = _membership(allowed_equipment, self.equipment_vocab)
+
+        self.required = [p.required for p in policies]
+
+    @classmethod
+    def from_lenders(cls, lenders) -> "PolicyMatrix":
+        return cls([(lender, policy) for lender in lenders for policy in lender.policies])
+
+    def _masks(self, app: ApplicationFeatures) -> dict[str, tuple[np.ndarray, np.ndarray, Any]]:
+        cols = self.columns
+        n = self.size
+        ones = np.ones(n, dtype=bool)
+
+        def active(field):
+            return ~np.isnan(cols[field])
+
+        masks = {}
+
+        if app.has_guarantor:
+            fico = app.fico_score
+            masks["fico_score"] = (active("fico_min"), fico >= cols["fico_min"], fico)
+        else:
+            masks["fico_score"] = (active("fico_min"), ~ones, NO_GUARANTOR)
+
+        paynet = app.paynet_score
+        if paynet:
+            masks["paynet_score"] = (active("paynet_min"), paynet >= cols["paynet_min"], paynet)
+        else:
+            masks["paynet_score"] = (active("paynet_min"), ~ones, "Not provided")
+
+        years = app.years_in_business
+        masks["years_in_business"] = (active("min_years_in_business"), years >= cols["min_years_in_business"], years)
+
+        revenue = app.annual_revenue
+        masks["annual_revenue"] = (active("min_annual_revenue"), revenue >= cols["min_annual_revenue"], f"${revenue:,.0f}")
+
+        amount = app.amount
+        masks["loan_amount_min"] = (active("min_amount"), amount >= cols["min_amount"], f"${amount:,.0f}")
+        masks["loan_amount_max"] = (active("max_amount"), amount <= cols["max_amount"], f"${amount:,.0f}")
+
+        term = app.term_months
+        masks["term_min"] = (active("min_term"), term >= cols["min_term"], f"{term} months")
+        masks["term_max"] = (active("max_term"), term <= cols["max_term"], f"{term} months")
+
+        age = app.equipment_age_years
+        masks["equipment_age"] = (active("max_equipment_age"), age <= cols["max_equipment_age"], f"{age} years")
+
+        state = app.state
+        in_allowed = _lookup(self.state_vocab, self.allowed_states, state)
+        in_excluded = _lookup(self.state_vocab, self.excluded_states, state)
+        state_passed = np.where(
+            self.has_allowed_states, in_allowed,
+            np.where(self.has_excluded_states, ~in_excluded, True)
+        )
+        masks["state_allowed"] = (ones, state_passed, state)
+
+        excluded = _lookup(self.industry_vocab, self.excluded_industries, app.industry_lower)
+        masks["industry"] = (self.has_excluded_industries, ~excluded, app.industry)
+
+        allowed = _lookup(self.equipment_vocab, self.allowed_equipment, app.equipment_type_lower)
+        masks["equipment_type"] = (self.has_allowed_equipment, allowed, app.equipment_type)
+
+        if app.has_guarantor:
+            masks["no_bankruptcy"] = (
+                self.no_bankruptcy, ones & (app.has_bankruptcy == 0),
+                "Clear" if app.has_bankruptcy == 0 else "Has bankruptcy"
+            )
+            masks["no_tax_liens"] = (
+                self.no_open_tax_liens, ones & (app.has_open_tax_liens == 0),
+                "Clear" if app.has_open_tax_liens == 0 else "Has tax liens"
+            )
+        else:
+            masks["no_bankruptcy"] = (self.no_bankruptcy, ones, NO_GUARANTOR)
+            masks["no_tax_liens"] = (self.no_open_tax_liens, ones, NO_GUARANTOR)
+
+        return masks
+
+    def _required(self, rule: str, idx: int, passed: bool, value: Any) -> Any:
+        return required_value(self.required[idx], rule, passed, value)
+
+    def evaluate(self, app) -> list[tuple[Any, Any, tuple[bool, float, list, list, list]]]:
+        n = self.size
+        if n == 0:
+            return []
+
+        app = as_features(app)
+        masks = self._masks(app)
+        criteria_met: list[list] = [[] for _ in range(n)]
+        criteria_failed: list[list] = [[] for _ in range(n)]
+        rejection_reasons: list[list] = [[] for _ in range(n)]
+        met_count = np.zeros(n, dtype=np.int64)
+        failed_count = np.zeros(n, dtype=np.int64)
+
+        for rule_name, rule_func in RULES_REGISTRY.items():
+            started = time.perf_counter_ns()
+            if rule_name not in CRITERIA_NAMES:
+                for idx, (_, policy) in enumerate(self.entries):
+                    if rule_name not in policy.rules:
+                        continue
+                    passed, criteria_name, value, required = rule_func(app, policy)
+                    if value is None and required is None:
+                        continue
+                    entry = {"criteria": criteria_name, "value": value, "required": required}
+                    if passed:
+                        criteria_met[idx].append(entry)
+                        met_count[idx] += 1
+                    else:
+                        criteria_failed[idx].append(entry)
+                        rejection_reasons[idx].append(f"{criteria_name}: {value} does not meet {required}")
+                        failed_count[idx] += 1
+                rule_stats.record_cost(rule_name, n, time.perf_counter_ns() - started)
+                continue
+
+            active, passed, value = masks[rule_name]
+            passed = passed & active
+            failed = active & ~passed
+            met_count += passed
+            failed_count += failed
+            rule_stats.record_outcomes(rule_name, int(np.count_nonzero(passed)), int(np.count_nonzero(failed)))
+            criteria_name = CRITERIA_NAMES[rule_name]
+
+            for idx in np.flatnonzero(passed).tolist():
+                required = self._required(rule_name, idx, True, value)
+                criteria_met[idx].append({"criteria": criteria_name, "value": value, "required": required})
+            for idx in np.flatnonzero(failed).tolist():
+                required = self._required(rule_name, idx, False, value)
+                criteria_failed[idx].append({"criteria": criteria_name, "value": value, "required": required})
+                rejection_reasons[idx].append(f"{criteria_name}: {value} does not meet {required}")
+            rule_stats.record_cost(rule_name, n, time.perf_counter_ns() - started)
+
+        total = met_count + failed_count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.where(total > 0, met_count / total * 100, 0)
+        eligible = failed_count == 0
+
+        results = []
+        for idx, (lender, policy) in enumerate(self.entries):
+            score = float(scores[idx]) if total[idx] > 0 else 0
+            results.append((
+                lender, policy,
+                (bool(eligible[idx]), score, criteria_met[idx], criteria_failed[idx], rejection_reasons[idx])
+            ))
+        return results
+
+    def _plan(self, masks: dict, record: bool = True) -> list[tuple]:
+        plan = []
+        for rule_name, rule_func in RULES_REGISTRY.items():
+            if rule_name in CRITERIA_NAMES:
+                active, passed, value = masks[rule_name]
+                passed = passed & active
+                if record:
+                    evaluated = int(np.count_nonzero(active))
+                    met = int(np.count_nonzero(passed))
+                    rule_stats.record_outcomes(rule_name, met, evaluated - met)
+                plan.append((rule_name, None, active.tolist(), passed.tolist(), value))
+            else:
+                plan.append((rule_name, rule_func, None, None, None))
+        return plan
+
+    def _result(self, app: ApplicationFeatures, plan: list[tuple], idx: int) -> tuple[bool, float, list, list, list]:
+        policy = self.entries[idx][1]
+        criteria_met = []
+        criteria_failed = []
+        rejection_reasons = []
+        for rule_name, rule_func, active, passed_mask, value in plan:
+            if rule_func is not None:
+                if rule_name not in policy.rules:
+                    continue
+                passed, criteria_name, rule_value, required = rule_func(app, policy)
+                if rule_value is None and required is None:
+                    continue
+            else:
+                if not active[idx]:
+                    continue
+                passed = passed_mask[idx]
+                criteria_name = CRITERIA_NAMES[rule_name]
+                rule_value = value
+                required = self._required(rule_name, idx, passed, value)
+
+            if passed:
+                criteria_met.append({"criteria": criteria_name, "value": rule_value, "required": required})
+            else:
+                criteria_failed.append({"criteria": criteria_name, "value": rule_value, "required": required})
+                rejection_reasons.append(f"{criteria_name}: {rule_value} does not meet {required}")
+
+        total = len(criteria_met) + len(criteria_failed)
+        score = (len(criteria_met) / total * 100) if total > 0 else 0
+        return len(criteria_failed) == 0, score, criteria_met, criteria_failed, rejection_reasons
+
+    def iter_evaluate(self, app) -> Iterator[tuple[Any, Any, tuple[bool, float, list, list, list]]]:
+        if self.size == 0:
+            return
+
+        app = as_features(app)
+        plan = self._plan(self._masks(app))
+        for idx, (lender, policy) in enumerate(self.entries):
+            yield lender, policy, self._result(app, plan, idx)
+
+    def rank(self, app, top_k: int) -> tuple[list, list]:
+        n = self.size
+        if n == 0:
+            return [], []
+
+        app = as_features(app)
+        masks = self._masks(app)
+        met_count = np.zeros(n, dtype=np.int64)
+        failed_count = np.zeros(n, dtype=np.int64)
+        first_rule = np.full(n, -1, dtype=np.int64)
+        rule_names = [name for name in RULES_REGISTRY if name in CRITERIA_NAMES]
+
+        for pos, rule_name in enumerate(rule_names):
+            active, passed, _ = masks[rule_name]
+            passed = passed & active
+            failed = active & ~passed
+            met_count += passed
+            failed_count += failed
+            rule_stats.record_outcomes(rule_name, int(np.count_nonzero(passed)), int(np.count_nonzero(failed)))
+            first_rule[failed & (first_rule < 0)] = pos
+
+        eligible = failed_count == 0
+        first_custom = {}
+        custom = [(name, func) for name, func in RULES_REGISTRY.items() if name not in CRITERIA_NAMES]
+        if custom:
+            for idx in np.flatnonzero(eligible).tolist():
+                policy = self.entries[idx][1]
+                for rule_name, rule_func in custom:
+                    if rule_name not in policy.rules:
+                        continue
+                    passed, criteria_name, value, required = rule_func(app, policy)
+                    if value is None and required is None:
+                        continue
+                    if passed:
+                        met_count[idx] += 1
+                    else:
+                        failed_count[idx] += 1
+                        eligible[idx] = False
+                        first_custom[idx] = {"criteria": criteria_name, "value": value, "required": required}
+                        break
+
+        total = met_count + failed_count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.where(total > 0, met_count / total * 100, 0)
+
+        top_idx = heapq.nlargest(
+            top_k, np.flatnonzero(eligible).tolist(),
+            key=lambda i: (scores[i], met_count[i], -i)
+        )
+        plan = self._plan(masks, record=False)
+        top = [(*self.entries[idx], self._result(app, plan, idx)) for idx in top_idx]
+
+        selected = set(top_idx)
+        rest = []
+        for idx, (lender, policy) in enumerate(self.entries):
+            if idx in selected:
+                continue
+            if eligible[idx]:
+                rest.append((lender, policy, self._result(app, plan, idx)))
+                continue
+            score = float(scores[idx]) if total[idx] > 0 else 0
+            if idx in first_custom:
+                failure = first_custom[idx]
+            else:
+                rule_name = rule_names[first_rule[idx]]
+                failure = {
+                    "criteria": CRITERIA_NAMES[rule_name],
+                    "value": masks[rule_name][2],
+                    "required": self._required(rule_name, idx, False, masks[rule_name][2])
+                }
+            reason = f"{failure['criteria']}: {failure['value']} does not meet {failure['required']}"
+            rest.append((lender, policy, (False, score, None, [failure], [reason])))
+        return top, rest
+
+    def near_misses(self, app, max_failures: int) -> list[tuple[Any, Any, list, list]]:
+        n = self.size
+        if n == 0:
+            return []
+
+        app = as_features(app)
+        masks = self._masks(app)
+        failed_count = np.zeros(n, dtype=np.int64)
+        failed_masks = []
+        for rule_name in RULES_REGISTRY:
+            if rule_name not in CRITERIA_NAMES:
+                continue
+            active, passed, value = masks[rule_name]
+            failed = active & ~passed
+            failed_count += failed
+            failed_masks.append((rule_name, failed, value))
+
+        custom = [(name, func) for name, func in RULES_REGISTRY.items() if name not in CRITERIA_NAMES]
+        results = []
+        for idx in np.flatnonzero(failed_count <= max_failures).tolist():
+            lender, policy = self.entries[idx]
+            criteria_failed = []
+            failed_rules = []
+            for rule_name, failed, value in failed_masks:
+                if failed[idx]:
+                    failed_rules.append(rule_name)
+                    criteria_failed.append({
+                        "criteria": CRITERIA_NAMES[rule_name],
+                        "value": value,
+                        "required": self._required(rule_name, idx, False, value)
+                    })
+
+            for rule_name, rule_func in custom:
+                if len(criteria_failed) > max_failures:
+                    break
+                if rule_name not in policy.rules:
+                    continue
+                passed, criteria_name, value, required = rule_func(app, policy)
+                if not passed and not (value is None and required is None):
+                    failed_rules.append(rule_name)
+                    criteria_failed.append({"criteria": criteria_name, "value": value, "required": required})
+
+            if not criteria_failed or len(criteria_failed) > max_failures:
+                continue
+            results.append((lender, policy, criteria_failed, self._adjustments(app, policy, failed_rules)))
+
+        results.sort(key=lambda r: (len(r[2]), r[3] is None))
+        return results
+
+    def _adjustments(self, app: ApplicationFeatures, policy: Any, failed_rules: list[str]) -> Optional[list[dict]]:
+        adjustments = {}
+        for rule_name in failed_rules:
+            if rule_name not in ADJUSTABLE_RULES:
+                return None
+            field, bound = ADJUSTABLE_RULES[rule_name]
+            if field in adjustments:
+                return None
+            current = getattr(app, field)
+            required = getattr(policy, bound)
+            adjustments[field] = {"field": field, "current": current, "required": required, "change": required - current}
+        return list(adjustments.values())
@@ -0,0 +1,63 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+class QueryCounter:
+
+    def __init__(self, budget: Optional[int] = None):
+        self.budget = budget
+        self.count = 0
+        self.statements: list[str] = []
+
+    def record(self, statement: str):
+        self.count += 1
+        self.statements.append(statement)
+        if self.budget is not None and self.count > self.budget:
+            raise QueryBudgetExceeded(
+                f"Query budget of {self.budget} exceeded:\n" + "\n".join(self.statements)
+            )
+
+
+_current: ContextVar[Optional[QueryCounter]] = ContextVar("query_counter", default=None)
+
+
+@contextmanager
+def count_queries(budget: Optional[int] = None) -> Iterator[QueryCounter]:
+    counter = QueryCounter(budget)
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def count_connection_queries(connection: Connection, budget: Optional[int] = None) -> Iterator[QueryCounter]:
+    counter = QueryCounter(budget)
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        counter.record(statement)
+    
+    event.listen(connection, "before_cursor_execute", record)
+    try:
+        yield counter
+    finally:
+        event.remove(connection, "before_cursor_execute", record)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counter = _current.get()
+    if counter is not None:
+        counter.record(statement)
+
+
+def instrument(engine: Engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
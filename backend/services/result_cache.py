@@ -0,0 +1,86 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import astuple
+from typing import Optional
+from config import settings
+from services.features import ApplicationFeatures
+from utils.id_generator import match_id
+
+ROW_FIELDS = (
+    "lender_id", "policy_id", "lender_name", "eligible", "fit_score", "matched_program",
+    "criteria_met", "criteria_failed", "rejection_reasons"
+)
+
+
+def fingerprint(features: ApplicationFeatures) -> str:
+    payload = json.dumps(astuple(features), separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+
+    def __init__(self, max_entries: int = settings.result_cache_size, ttl: float = settings.result_cache_ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, int], tuple[float, tuple[dict, ...]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, features: ApplicationFeatures, catalog_version: int, application_id: str) -> Optional[list[dict]]:
+        key = (fingerprint(features), catalog_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] >= self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            templates = entry[1]
+
+        return [
+            {"id": match_id(), "application_id": application_id, **copy.deepcopy(template)}
+            for template in templates
+        ]
+
+    def put(self, features: ApplicationFeatures, catalog_version: int, rows: list[dict]):
+        if self.max_entries <= 0:
+            return
+        key = (fingerprint(features), catalog_version)
+        templates = tuple(copy.deepcopy({name: row[name] for name in ROW_FIELDS}) for row in rows)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), templates)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+result_cache = ResultCache()
@@ -1,198 +1,303 @@
-from typing import Callable, Any
+import threading
+import time
+from typing import Callable, Any, Optional, Union
 from models import LoanApplication, LenderPolicy
+from services.features import ApplicationFeatures, as_features
+from services.compiled_policy import CompiledPolicy, as_compiled
+from services.criteria import CRITERIA_NAMES, NO_GUARANTOR
 
-RuleFunction = Callable[[LoanApplication, LenderPolicy], tuple[bool, str, Any, Any]]
+RuleFunction = Callable[[ApplicationFeatures, CompiledPolicy], tuple[bool, str, Any, Any]]
+RuleCondition = Callable[[Any], bool]
 
 RULES_REGISTRY: dict[str, RuleFunction] = {}
+RULE_CONDITIONS: dict[str, RuleCondition] = {}
 
-def register_rule(name: str):
+
+class RuleStats:
+
+    def __init__(self, refresh_every: int = 1000):
+        self.refresh_every = refresh_every
+        self._lock = threading.Lock()
+        self._counts: dict[str, list[int]] = {}
+        self._costs: dict[str, list[int]] = {}
+        self._pending = 0
+        self._priority: dict[str, float] = {}
+        self._orders: dict[tuple, list[str]] = {}
+
+    def record_outcomes(self, name: str, passed: int, failed: int):
+        with self._lock:
+            entry = self._counts.setdefault(name, [0, 0])
+            entry[0] += passed
+            entry[1] += failed
+            self._pending += passed + failed
+
+    def record_cost(self, name: str, calls: int, elapsed_ns: int):
+        with self._lock:
+            entry = self._costs.setdefault(name, [0, 0])
+            entry[0] += calls
+            entry[1] += elapsed_ns
+
+    def _refresh(self):
+        costs = {name: elapsed_ns / calls for name, (calls, elapsed_ns) in self._costs.items() if calls}
+        default_cost = sum(costs.values()) / len(costs) if costs else 1.0
+        self._priority = {
+            name: costs.get(name, default_cost) * (passed + failed + 2) / (failed + 1)
+            for name, (passed, failed) in self._counts.items()
+        }
+        self._orders = {}
+        self._pending = 0
+
+    def order(self, rules: tuple) -> list[str]:
+        with self._lock:
+            if self._pending >= self.refresh_every:
+                self._refresh()
+            ordered = self._orders.get(rules)
+            if ordered is None:
+                priority = self._priority
+                ordered = sorted(rules, key=lambda name: priority.get(name, float("inf")))
+                self._orders[rules] = ordered
+            return ordered
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {name: tuple(entry) for name, entry in self._counts.items()}
+            costs = {name: tuple(entry) for name, entry in self._costs.items()}
+        result = {}
+        for name in RULES_REGISTRY:
+            passed, failed = counts.get(name, (0, 0))
+            calls, elapsed_ns = costs.get(name, (0, 0))
+            evaluated = passed + failed
+            result[name] = {
+                "evaluated": evaluated,
+                "passed": passed,
+                "failed": failed,
+                "fail_rate": failed / evaluated if evaluated else 0.0,
+                "avg_ns": elapsed_ns / calls if calls else None
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._counts = {}
+            self._costs = {}
+            self._priority = {}
+            self._orders = {}
+            self._pending = 0
+
+
+rule_stats = RuleStats()
+
+
+def register_rule(name: str, applies: Optional[RuleCondition] = None):
     def decorator(func: RuleFunction):
         RULES_REGISTRY[name] = func
+        if applies is not None:
+            RULE_CONDITIONS[name] = applies
         return func
     return decorator
 
-@register_rule("fico_score")
-def check_fico(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, str, Any, Any]:
+@register_rule("fico_score", applies=lambda p: bool(p.fico_min))
+def check_fico(app: ApplicationFeatures, policy: CompiledPolicy) -> tuple[bool, str, Any, Any]:
     if not policy.fico_min:
-        return True, "FICO Score", None, None
+        return True, CRITERIA_NAMES["fico_score"], None, None
     
-    guarantors = app.borrower.guarantors
-    if not guarantors:
-        return False, "FICO Score", "No guarantor", f">= {policy.fico_min}"
+    required = policy.required["fico_score"][0]
+    if not app.has_guarantor:
+        return False, CRITERIA_NAMES["fico_score"], NO_GUARANTOR, required
     
-    fico = guarantors[0].fico_score
+    fico = app.fico_score
     if fico >= policy.fico_min:
-        return True, "FICO Score", fico, f">= {policy.fico_min}"
-    return False, "FICO Score", fico, f">= {policy.fico_min}"
+        return True, CRITERIA_NAMES["fico_score"], fico, required
+    return False, CRITERIA_NAMES["fico_score"], fico, required
 
-@register_rule("paynet_score")
-def check_paynet(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, str, Any, Any]:
+@register_rule("paynet_score", applies=lambda p: bool(p.paynet_min))
+def check_paynet(app: ApplicationFeatures, policy: CompiledPolicy) -> tuple[bool, str, Any, Any]:
     if not policy.paynet_min:
-        return True, "PayNet Score", None, None
+        return True, CRITERIA_NAMES["paynet_score"], None, None
     
-    score = app.borrower.paynet_score
+    required = policy.required["paynet_score"][0]
+    score = app.paynet_score
     if not score:
-        return False, "PayNet Score", "Not provided", f">= {policy.paynet_min}"
+        return False, CRITERIA_NAMES["paynet_score"], "Not provided", required
     
     if score >= policy.paynet_min:
-        return True, "PayNet Score", score, f">= {policy.paynet_min}"
-    return False, "PayNet Score", score, f">= {policy.paynet_min}"
+        return True, CRITERIA_NAMES["paynet_score"], score, required
+    return False, CRITERIA_NAMES["paynet_score"], score, required
 
-@register_rule("years_in_business")
-def check_years(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, str, Any, Any]:
+@register_rule("years_in_business", applies=lambda p: bool(p.min_years_in_business))
+def check_years(app: ApplicationFeatures, policy: CompiledPolicy) -> tuple[bool, str, Any, Any]:
     if not policy.min_years_in_business:
-        return True, "Years in Business", None, None
+        return True, CRITERIA_NAMES["years_in_business"], None, None
     
-    years = app.borrower.years_in_business
+    required = policy.required["years_in_business"][0]
+    years = app.years_in_business
     if years >= policy.min_years_in_business:
-        return True, "Years in Business", years, f">= {policy.min_years_in_business}"
-    return False, "Years in Business", years, f">= {policy.min_years_in_business}"
+        return True, CRITERIA_NAMES["years_in_business"], years, required
+    return False, CRITERIA_NAMES["years_in_business"], years, required
 
-@register_rule("annual_revenue")
-def check_revenue(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, str, Any, Any]:
+@register_rule("annual_revenue", applies=lambda p: bool(p.min_annual_revenue))
+def check_revenue(app: ApplicationFeatures, policy: CompiledPolicy) -> tuple[bool, str, Any, Any]:
     if not policy.min_annual_revenue:
-        return True, "Annual Revenue", None, None
+        return True, CRITERIA_NAMES["annual_revenue"], None, None
     
-    revenue = app.borrower.annual_revenue
+    required = policy.required["annual_revenue"][0]
+    revenue = app.annual_revenue
     if revenue >= policy.min_annual_revenue:
-        return True, "Annual Revenue", f"${revenue:,.0f}", f">= ${policy.min_annual_revenue:,.0f}"
-    return False, "Annual Revenue", f"${revenue:,.0f}", f">= ${policy.min_annual_revenue:,.0f}"
+        return True, CRITERIA_NAMES["annual_revenue"], f"${revenue:,.0f}", required
+    return False, CRITERIA_NAMES["annual_revenue"], f"${revenue:,.0f}", required
 
-@register_rule("loan_amount_min")
-def check_min_amount(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, str, Any, Any]:
+@register_rule("loan_amount_min", applies=lambda p: bool(p.min_amount))
+def check_min_amount(app: ApplicationFeatures, policy: CompiledPolicy) -> tuple[bool, str, Any, Any]:
     if not policy.min_amount:
-        return True, "Minimum Loan Amount", None, None
+        return True, CRITERIA_NAMES["loan_amount_min"], None, None
     
+    required = policy.required["loan_amount_min"][0]
     amount = app.amount
     if amount >= policy.min_amount:
-        return True, "Minimum Loan Amount", f"${amount:,.0f}", f">= ${policy.min_amount:,.0f}"
-    return False, "Minimum Loan Amount", f"${amount:,.0f}", f">= ${policy.min_amount:,.0f}"
+        return True, CRITERIA_NAMES["loan_amount_min"], f"${amount:,.0f}", required
+    return False, CRITERIA_NAMES["loan_amount_min"], f"${amount:,.0f}", required
 
-@register_rule("loan_amount_max")
-def check_max_amount(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, str, Any, Any]:
+@register_rule("loan_amount_max", applies=lambda p: bool(p.max_amount))
+def check_max_amount(app: ApplicationFeatures, policy: CompiledPolicy) -> tuple[bool, str, Any, Any]:
     if not policy.max_amount:
-        return True, "Maximum Loan Amount", None, None
+        return True, CRITERIA_NAMES["loan_amount_max"], None, None
     
+    required = policy.required["loan_amount_max"][0]
     amount = app.amount
     if amount <= policy.max_amount:
-        return True, "Maximum Loan Amount", f"${amount:,.0f}", f"<= ${policy.max_amount:,.0f}"
-    return False, "Maximum Loan Amount", f"${amount:,.0f}", f"<= ${policy.max_amount:,.0f}"
+        return True, CRITERIA_NAMES["loan_amount_max"], f"${amount:,.0f}", required
+    return False, CRITERIA_NAMES["loan_amount_max"], f"${amount:,.0f}", required
 
-@register_rule("term_min")
-def check_min_term(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, str, Any, Any]:
+@register_rule("term_min", applies=lambda p: bool(p.min_term))
+def check_min_term(app: ApplicationFeatures, policy: CompiledPolicy) -> tuple[bool, str, Any, Any]:
     if not policy.min_term:
-        return True, "Minimum Term", None, None
+        return True, CRITERIA_NAMES["term_min"], None, None
     
+    required = policy.required["term_min"][0]
     term = app.term_months
     if term >= policy.min_term:
-        return True, "Minimum Term", f"{term} months", f">= {policy.min_term} months"
-    return False, "Minimum Term", f"{term} months", f">= {policy.min_term} months"
+        return True, CRITERIA_NAMES["term_min"], f"{term} months", required
+    return False, CRITERIA_NAMES["term_min"], f"{term} months", required
 
-@register_rule("term_max")
-def check_max_term(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, str, Any, Any]:
+@register_rule("term_max", applies=lambda p: bool(p.max_term))
+def check_max_term(app: ApplicationFeatures, policy: CompiledPolicy) -> tuple[bool, str, Any, Any]:
     if not policy.max_term:
-        return True, "Maximum Term", None, None
+        return True, CRITERIA_NAMES["term_max"], None, None
     
+    required = policy.required["term_max"][0]
     term = app.term_months
     if term <= policy.max_term:
-        return True, "Maximum Term", f"{term} months", f"<= {policy.max_term} months"
-    return False, "Maximum Term", f"{term} months", f"<= {policy.max_term} months"
+        return True, CRITERIA_NAMES["term_max"], f"{term} months", required
+    return False, CRITERIA_NAMES["term_max"], f"{term} months", required
 
-@register_rule("equipment_age")
-def check_equipment_age(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, str, Any, Any]:
+@register_rule("equipment_age", applies=lambda p: bool(p.max_equipment_age))
+def check_equipment_age(app: ApplicationFeatures, policy: CompiledPolicy) -> tuple[bool, str, Any, Any]:
     if not policy.max_equipment_age:
-        return True, "Equipment Age", None, None
+        return True, CRITERIA_NAMES["equipment_age"], None, None
     
+    required = policy.required["equipment_age"][0]
     age = app.equipment_age_years
     if age <= policy.max_equipment_age:
-        return True, "Equipment Age", f"{age} years", f"<= {policy.max_equipment_age} years"
-    return False, "Equipment Age", f"{age} years", f"<= {policy.max_equipment_age} years"
+        return True, CRITERIA_NAMES["equipment_age"], f"{age} years", required
+    return False, CRITERIA_NAMES["equipment_age"], f"{age} years", required
 
 @register_rule("state_allowed")
-def check_state(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, str, Any, Any]:
-    state = app.borrower.state
+def check_state(app: ApplicationFeatures, policy: CompiledPolicy) -> tuple[bool, str, Any, Any]:
+    state = app.state
+    met, failed = policy.required["state_allowed"]
     
     if policy.allowed_states:
-        if state in policy.allowed_states:
-            return True, "State", state, f"in {policy.allowed_states}"
-        return False, "State", state, f"must be in {policy.allowed_states}"
+        if state in policy.allowed_state_set:
+            return True, CRITERIA_NAMES["state_allowed"], state, met
+        return False, CRITERIA_NAMES["state_allowed"], state, failed
     
     if policy.excluded_states:
-        if state not in policy.excluded_states:
-            return True, "State", state, f"not in {policy.excluded_states}"
-        return False, "State", state, f"excluded: {policy.excluded_states}"
+        if state not in policy.excluded_state_set:
+            return True, CRITERIA_NAMES["state_allowed"], state, met
+        return False, CRITERIA_NAMES["state_allowed"], state, failed
     
-    return True, "State", state, "All states allowed"
+    return True, CRITERIA_NAMES["state_allowed"], state, met
 
-@register_rule("industry")
-def check_industry(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, str, Any, Any]:
+@register_rule("industry", applies=lambda p: bool(p.excluded_industries))
+def check_industry(app: ApplicationFeatures, policy: CompiledPolicy) -> tuple[bool, str, Any, Any]:
     if not policy.excluded_industries:
-        return True, "Industry", None, None
-    
-    industry = app.borrower.industry.lower()
-    excluded = [i.lower() for i in policy.excluded_industries]
+        return True, CRITERIA_NAMES["industry"], None, None
     
-    if industry not in excluded:
-        return True, "Industry", app.borrower.industry, "Not in excluded list"
-    return False, "Industry", app.borrower.industry, f"Excluded: {policy.excluded_industries}"
+    met, failed = policy.required["industry"]
+    if app.industry_lower not in policy.excluded_industry_set:
+        return True, CRITERIA_NAMES["industry"], app.industry, met
+    return False, CRITERIA_NAMES["industry"], app.industry, failed
 
-@register_rule("equipment_type")
-def check_equipment_type(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, str, Any, Any]:
+@register_rule("equipment_type", applies=lambda p: bool(p.allowed_equipment_types))
+def check_equipment_type(app: ApplicationFeatures, policy: CompiledPolicy) -> tuple[bool, str, Any, Any]:
     if not policy.allowed_equipment_types:
-        return True, "Equipment Type", None, None
+        return True, CRITERIA_NAMES["equipment_type"], None, None
     
-    equip = app.equipment_type.lower()
-    allowed = [e.lower() for e in policy.allowed_equipment_types]
-    
-    if equip in allowed:
-        return True, "Equipment Type", app.equipment_type, f"in {policy.allowed_equipment_types}"
-    return False, "Equipment Type", app.equipment_type, f"must be in {policy.allowed_equipment_types}"
+    met, failed = policy.required["equipment_type"]
+    if app.equipment_type_lower in policy.allowed_equipment_set:
+        return True, CRITERIA_NAMES["equipment_type"], app.equipment_type, met
+    return False, CRITERIA_NAMES["equipment_type"], app.equipment_type, failed
 
-@register_rule("no_bankruptcy")
-def check_bankruptcy(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, str, Any, Any]:
+@register_rule("no_bankruptcy", applies=lambda p: bool(p.no_bankruptcy))
+def check_bankruptcy(app: ApplicationFeatures, policy: CompiledPolicy) -> tuple[bool, str, Any, Any]:
     if not policy.no_bankruptcy:
-        return True, "Bankruptcy", None, None
+        return True, CRITERIA_NAMES["no_bankruptcy"], None, None
     
-    guarantors = app.borrower.guarantors
-    if not guarantors:
-        return True, "Bankruptcy", "No guarantor", None
+    if not app.has_guarantor:
+        return True, CRITERIA_NAMES["no_bankruptcy"], NO_GUARANTOR, None
     
-    if guarantors[0].has_bankruptcy == 0:
-        return True, "Bankruptcy", "Clear", "No bankruptcy allowed"
-    return False, "Bankruptcy", "Has bankruptcy", "No bankruptcy allowed"
+    required = policy.required["no_bankruptcy"][0]
+    if app.has_bankruptcy == 0:
+        return True, CRITERIA_NAMES["no_bankruptcy"], "Clear", required
+    return False, CRITERIA_NAMES["no_bankruptcy"], "Has bankruptcy", required
 
-@register_rule("no_tax_liens")
-def check_tax_liens(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, str, Any, Any]:
+@register_rule("no_tax_liens", applies=lambda p: bool(p.no_open_tax_liens))
+def check_tax_liens(app: ApplicationFeatures, policy: CompiledPolicy) -> tuple[bool, str, Any, Any]:
     if not policy.no_open_tax_liens:
-        return True, "Tax Liens", None, None
+        return True, CRITERIA_NAMES["no_tax_liens"], None, None
     
-    guarantors = app.borrower.guarantors
-    if not guarantors:
-        return True, "Tax Liens", "No guarantor", None
+    if not app.has_guarantor:
+        return True, CRITERIA_NAMES["no_tax_liens"], NO_GUARANTOR, None
     
-    if guarantors[0].has_open_tax_liens == 0:
-        return True, "Tax Liens", "Clear", "No open tax liens allowed"
-    return False, "Tax Liens", "Has tax liens", "No open tax liens allowed"
+    required = policy.required["no_tax_liens"][0]
+    if app.has_open_tax_liens == 0:
+        return True, CRITERIA_NAMES["no_tax_liens"], "Clear", required
+    return False, CRITERIA_NAMES["no_tax_liens"], "Has tax liens", required
 
 
-def run_all_rules(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, float, list, list, list]:
+def run_all_rules(app: Union[LoanApplication, ApplicationFeatures], policy: Union[LenderPolicy, CompiledPolicy],
+                  explain: bool = True) -> tuple[bool, Optional[float], list, list, list]:
+    app = as_features(app)
+    policy = as_compiled(policy)
     criteria_met = []
     criteria_failed = []
     rejection_reasons = []
     
-    for rule_name, rule_func in RULES_REGISTRY.items():
-        passed, criteria_name, value, required = rule_func(app, policy)
-        
+    rules = policy.rules if explain else rule_stats.order(policy.rules)
+    for rule_name in rules:
+        started = time.perf_counter_ns()
+        passed, criteria_name, value, required = RULES_REGISTRY[rule_name](app, policy)
+        rule_stats.record_cost(rule_name, 1, time.perf_counter_ns() - started)
         if value is None and required is None:
             continue
         
         if passed:
-            criteria_met.append({"criteria": criteria_name, "value": value, "required": required})
+            criteria_met.append((rule_name, {"criteria": criteria_name, "value": value, "required": required}))
         else:
             criteria_failed.append({"criteria": criteria_name, "value": value, "required": required})
             rejection_reasons.append(f"{criteria_name}: {value} does not meet {required}")
+            if not explain:
+                break
+    
+    if not explain:
+        position = {name: i for i, name in enumerate(policy.rules)}
+        criteria_met.sort(key=lambda item: position[item[0]])
+    criteria_met = [entry for _, entry in criteria_met]
     
     eligible = len(criteria_failed) == 0
+    if not eligible and not explain:
+        return eligible, None, criteria_met, criteria_failed, rejection_reasons
+    
     total = len(criteria_met) + len(criteria_failed)
     score = (len(criteria_met) / total * 100) if total > 0 else 0
     
@@ -201,3 +306,10 @@ def run_all_rules(app: LoanApplication, policy: LenderPolicy) -> tuple[bool, flo
 
 def get_available_rules() -> list[str]:
     return list(RULES_REGISTRY.keys())
+
+
+def get_rule_stats() -> dict:
+    return {
+        "stats": rule_stats.stats(),
+        "adaptive_order": rule_stats.order(tuple(RULES_REGISTRY))
+    }
@@ -0,0 +1,431 @@
+import time
+from collections import Counter, deque
+from typing import Iterator, Optional
+from sqlalchemy import delete, insert, text, update
+from sqlalchemy.orm import Session, selectinload
+from config import settings
+from database import SessionLocal
+from models import Borrower, LoanApplication, LenderPolicy, MatchResult, ApplicationStatus
+from services.catalog import CatalogLender, CatalogSnapshot, policy_catalog
+from services.compiled_policy import compile_policy
+from services.criteria_codec import COMPACT_FIELDS, storage_row, storage_rows
+from services.evaluation import evaluate_chunk, match_row, match_rows
+from services.features import ApplicationFeatures
+from services.parallel import create_pool, submit_chunk
+from services.policy_matrix import PolicyMatrix
+from services.jobs import JobQueue
+from services.query_counter import count_connection_queries
+from services.loaders import application_query
+from services.result_cache import result_cache
+from services.single_flight import SingleFlight
+from services.write_behind import WriteBehindBuffer
+
+underwriting_jobs = JobQueue(settings.underwriting_job_workers)
+underwriting_flights = SingleFlight()
+
+RESULT_FIELDS = (
+    "eligible", "fit_score", "matched_program", "criteria_met", "criteria_failed", "rejection_reasons",
+    *COMPACT_FIELDS
+)
+SYNC_FIELDS = ("lender_id", "lender_name", *RESULT_FIELDS)
+NO_CHANGES = {"inserted": 0, "updated": 0, "deleted": 0}
+
+
+class MatchSync:
+
+    def __init__(self, db: Session, application_ids: list[str]):
+        self.current = {}
+        self.stale = []
+        self.inserted = 0
+        self.updated = 0
+        for row in db.query(
+            MatchResult.id, MatchResult.application_id, MatchResult.policy_id,
+            *(getattr(MatchResult, name) for name in SYNC_FIELDS)
+        ).filter(MatchResult.application_id.in_(application_ids)):
+            key = (row.application_id, row.policy_id)
+            if key in self.current:
+                self.stale.append(row.id)
+            else:
+                self.current[key] = row
+
+    def apply(self, db: Session, rows: list[dict]):
+        inserts = []
+        updates = []
+        for row in storage_rows(db, rows):
+            old = self.current.pop((row["application_id"], row["policy_id"]), None)
+            if old is None:
+                inserts.append(row)
+            elif any(getattr(old, name) != row.get(name) for name in SYNC_FIELDS):
+                updates.append({"id": old.id, **{name: row.get(name) for name in SYNC_FIELDS}})
+        if updates:
+            db.execute(update(MatchResult), updates)
+        if inserts:
+            db.execute(insert(MatchResult), inserts)
+        self.inserted += len(inserts)
+        self.updated += len(updates)
+
+    def finish(self, db: Session) -> dict:
+        stale = self.stale + [row.id for row in self.current.values()]
+        if stale:
+            db.execute(delete(MatchResult).where(MatchResult.id.in_(stale)))
+        self.current = {}
+        self.stale = []
+        return {"inserted": self.inserted, "updated": self.updated, "deleted": len(stale)}
+
+
+def sync_matches(db: Session, application_ids: list[str], rows: list[dict]) -> dict:
+    sync = MatchSync(db, application_ids)
+    sync.apply(db, rows)
+    return sync.finish(db)
+
+
+def load_matches(db: Session, application_id: str, rows: list[dict]) -> list[MatchResult]:
+    position = {row["policy_id"]: idx for idx, row in enumerate(rows)}
+    matches = db.query(MatchResult).filter(MatchResult.application_id == application_id).all()
+    return sorted(matches, key=lambda m: position.get(m.policy_id, len(position)))
+
+
+def lock_applications(db: Session, application_ids: list[str]):
+    ids = sorted(set(application_ids))
+    if not ids:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        for application_id in ids:
+            db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"underwrite:{application_id}"})
+    elif dialect == "sqlite":
+        db.execute(
+            update(LoanApplication)
+            .where(LoanApplication.id.in_(ids))
+            .values(status=LoanApplication.status)
+        )
+    else:
+        db.query(LoanApplication.id).filter(LoanApplication.id.in_(ids)).order_by(LoanApplication.id).with_for_update().all()
+
+
+def lock_application(db: Session, application_id: str):
+    lock_applications(db, [application_id])
+
+
+def write_behind() -> bool:
+    return settings.match_persistence == "write_behind"
+
+
+def begin_underwriting(db: Session, application: LoanApplication):
+    if write_behind():
+        return
+    application.status = ApplicationStatus.UNDERWRITING
+    db.commit()
+
+
+def assign_match_ids(db: Session, application_id: str, rows: list[dict]):
+    ids = match_writer.match_ids(application_id)
+    if ids is None:
+        ids = dict(
+            db.query(MatchResult.policy_id, MatchResult.id)
+            .filter(MatchResult.application_id == application_id)
+            .all()
+        )
+    for row in rows:
+        row["id"] = ids.get(row["policy_id"], row["id"])
+
+
+def persist_matches(db: Session, application: LoanApplication, rows: list[dict]) -> Optional[dict]:
+    if write_behind():
+        assign_match_ids(db, application.id, rows)
+        match_writer.submit(application.id, rows)
+        return None
+    
+    lock_application(db, application.id)
+    changes = sync_matches(db, [application.id], rows)
+    application.status = ApplicationStatus.COMPLETED
+    db.commit()
+    return changes
+
+
+def _underwrite_application(db: Session, application: LoanApplication) -> tuple[CatalogSnapshot, list[dict], bool, Optional[dict]]:
+    features = ApplicationFeatures.from_application(application)
+    begin_underwriting(db, application)
+    catalog = policy_catalog.get(db)
+    
+    rows = result_cache.get(features, catalog.version, application.id)
+    cached = rows is not None
+    if not cached:
+        rows = match_rows(application.id, catalog.matrix, features)
+        result_cache.put(features, catalog.version, rows)
+    
+    return catalog, rows, cached, persist_matches(db, application, rows)
+
+
+def underwrite_application(db: Session, application: LoanApplication) -> tuple[CatalogSnapshot, list[MatchResult], bool, Optional[dict], bool]:
+    (catalog, rows, cached, changes), shared = underwriting_flights.do(
+        ("full", application.id), lambda: _underwrite_application(db, application)
+    )
+    if changes is None:
+        return catalog, [MatchResult(**row) for row in rows], cached, None, shared
+    if shared:
+        changes = dict(NO_CHANGES)
+    return catalog, load_matches(db, application.id, rows), cached, changes, shared
+
+
+def _underwrite_top_k(db: Session, application: LoanApplication, top_k: int) -> tuple[CatalogSnapshot, list[dict], int, Optional[dict]]:
+    features = ApplicationFeatures.from_application(application)
+    begin_underwriting(db, application)
+    catalog = policy_catalog.get(db)
+    
+    top, rest = catalog.matrix.rank(features, top_k)
+    top_rows = [match_row(application.id, lender, policy, result) for lender, policy, result in top]
+    rows = top_rows + [match_row(application.id, lender, policy, result) for lender, policy, result in rest]
+    changes = persist_matches(db, application, rows)
+    
+    return catalog, top_rows, sum(1 for r in rows if r["eligible"]), changes
+
+
+def underwrite_top_k(db: Session, application: LoanApplication, top_k: int) -> tuple[CatalogSnapshot, list[dict], int, Optional[dict], bool]:
+    (catalog, top_rows, eligible_count, changes), shared = underwriting_flights.do(
+        ("top_k", application.id, top_k), lambda: _underwrite_top_k(db, application, top_k)
+    )
+    if shared and changes is not None:
+        changes = dict(NO_CHANGES)
+    return catalog, top_rows, eligible_count, changes, shared
+
+
+def save_stream(db: Session, application_id: str, rows: list[dict]) -> Optional[dict]:
+    if write_behind():
+        assign_match_ids(db, application_id, rows)
+        match_writer.submit(application_id, rows)
+        return None
+    
+    changes = write_matches(db, [application_id], rows)
+    db.commit()
+    return changes
+
+
+def stream_application(application_id: str, catalog: CatalogSnapshot, features: ApplicationFeatures,
+                       previous_status: ApplicationStatus = ApplicationStatus.SUBMITTED) -> Iterator[tuple[str, dict]]:
+    match_writer.flush()
+    db = SessionLocal()
+    completed = False
+    try:
+        rows = match_rows(application_id, catalog.matrix, features)
+        with count_connection_queries(db.connection()) as queries:
+            changes = save_stream(db, application_id, rows)
+        completed = True
+    finally:
+        if not completed:
+            db.rollback()
+            db.execute(
+                update(LoanApplication)
+                .where(LoanApplication.id == application_id)
+                .values(status=previous_status)
+            )
+            db.commit()
+        db.close()
+    
+    for row in rows:
+        yield "match", row
+    yield "summary", {
+        "application_id": application_id,
+        "status": "completed",
+        "total_lenders": len(catalog.lenders),
+        "total_policies": len(rows),
+        "eligible_count": sum(1 for row in rows if row["eligible"]),
+        "changes": changes,
+        "query_count": queries.count
+    }
+
+
+def run_underwriting_job(application_id: str) -> dict:
+    db = SessionLocal()
+    try:
+        application = application_query(db).filter(LoanApplication.id == application_id).first()
+        if not application:
+            raise ValueError("Application not found")
+        
+        catalog, matches, cached, changes, shared = underwrite_application(db, application)
+        return {
+            "total_lenders": len(catalog.lenders),
+            "total_policies": len(matches),
+            "eligible_count": sum(1 for m in matches if m.eligible),
+            "cached": cached,
+            "changes": changes,
+            "shared": shared
+        }
+    finally:
+        db.close()
+
+
+def run_policy_reunderwrite_job(policy_id: str) -> dict:
+    db = SessionLocal()
+    try:
+        policy = db.query(LenderPolicy).filter(LenderPolicy.id == policy_id).first()
+        if not policy:
+            raise ValueError("Policy not found")
+        return reunderwrite_policy(db, policy)
+    finally:
+        db.close()
+
+
+def load_applications(db: Session, application_ids: list[str]) -> list[LoanApplication]:
+    return db.query(LoanApplication).options(
+        selectinload(LoanApplication.borrower).selectinload(Borrower.guarantors)
+    ).filter(LoanApplication.id.in_(application_ids)).all()
+
+
+def select_application_ids(db: Session, application_ids: Optional[list[str]] = None,
+                           status: Optional[ApplicationStatus] = None) -> list[str]:
+    query = db.query(LoanApplication.id)
+    if application_ids is not None:
+        query = query.filter(LoanApplication.id.in_(application_ids))
+    if status is not None:
+        query = query.filter(LoanApplication.status == status)
+    return [app_id for (app_id,) in query.order_by(LoanApplication.id).all()]
+
+
+def feature_chunks(db: Session, ids: list[str], chunk_size: int) -> Iterator[tuple[list[str], list[tuple[str, ApplicationFeatures]]]]:
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        items = [(a.id, ApplicationFeatures.from_application(a)) for a in load_applications(db, chunk)]
+        db.expunge_all()
+        yield chunk, items
+
+
+def write_matches(db: Session, application_ids: list[str], rows: list[dict]) -> dict:
+    lock_applications(db, application_ids)
+    changes = sync_matches(db, application_ids, rows)
+    db.execute(
+        update(LoanApplication)
+        .where(LoanApplication.id.in_(application_ids))
+        .values(status=ApplicationStatus.COMPLETED)
+    )
+    return changes
+
+
+def persist_pending(batch: dict[str, list[dict]]):
+    db = SessionLocal()
+    try:
+        application_ids = sorted(batch)
+        write_matches(db, application_ids, [row for app_id in application_ids for row in batch[app_id]])
+        db.commit()
+    finally:
+        db.close()
+
+
+match_writer = WriteBehindBuffer(
+    persist_pending, settings.write_behind_batch_size,
+    settings.write_behind_flush_interval, settings.write_behind_max_pending,
+    settings.write_behind_max_attempts
+)
+
+
+def underwrite_batch(db: Session, application_ids: Optional[list[str]] = None,
+                     status: Optional[ApplicationStatus] = None, chunk_size: int = 500,
+                     workers: int = 1) -> dict:
+    started = time.perf_counter()
+    match_writer.flush()
+    ids = select_application_ids(db, application_ids, status)
+    catalog = policy_catalog.get(db)
+
+    summaries = []
+    matches_written = 0
+    changes = Counter(inserted=0, updated=0, deleted=0)
+
+    def write(chunk: list[str], rows: list[dict], chunk_summaries: list[dict]):
+        nonlocal matches_written
+        changes.update(write_matches(db, chunk, rows))
+        db.commit()
+        summaries.extend(chunk_summaries)
+        matches_written += len(rows)
+
+    chunks = feature_chunks(db, ids, chunk_size)
+    if workers > 1 and len(ids) > chunk_size:
+        with create_pool(catalog.entries, workers) as pool:
+            pending = deque()
+            for chunk, items in chunks:
+                pending.append((chunk, submit_chunk(pool, items)))
+                if len(pending) >= workers * 2:
+                    chunk, future = pending.popleft()
+                    write(chunk, *future.result())
+            while pending:
+                chunk, future = pending.popleft()
+                write(chunk, *future.result())
+    else:
+        workers = 1
+        for chunk, items in chunks:
+            write(chunk, *evaluate_chunk(catalog.matrix, items))
+
+    if application_ids is not None:
+        found = set(ids)
+        summaries.extend(
+            {"application_id": app_id, "status": "not_found", "total_policies": 0, "eligible_count": 0}
+            for app_id in dict.fromkeys(application_ids) if app_id not in found
+        )
+
+    elapsed = time.perf_counter() - started
+    return {
+        "processed": len(ids),
+        "matches_written": matches_written,
+        "changes": dict(changes),
+        "total_lenders": len(catalog.lenders),
+        "workers": workers,
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "applications_per_second": round(len(ids) / elapsed, 2) if elapsed > 0 else 0.0,
+        "results": summaries
+    }
+
+
+def reunderwrite_policy(db: Session, policy: LenderPolicy, chunk_size: int = 500) -> dict:
+    started = time.perf_counter()
+    match_writer.flush()
+    policy_id = policy.id
+    lender = CatalogLender(id=policy.lender_id, name=policy.lender.name)
+    compiled = compile_policy(policy)
+    matrix = PolicyMatrix([(lender, compiled)])
+    
+    ids = [
+        app_id for (app_id,) in db.query(MatchResult.application_id)
+        .filter(MatchResult.policy_id == policy_id)
+        .distinct()
+        .order_by(MatchResult.application_id)
+    ]
+    
+    rows_updated = 0
+    changed = []
+    for chunk, items in feature_chunks(db, ids, chunk_size):
+        lock_applications(db, chunk)
+        current = {
+            row.application_id: row for row in db.query(
+                MatchResult.id, MatchResult.application_id,
+                *(getattr(MatchResult, name) for name in RESULT_FIELDS)
+            ).filter(MatchResult.policy_id == policy_id, MatchResult.application_id.in_(chunk))
+        }
+        
+        updates = []
+        for application_id, features in items:
+            (row,) = match_rows(application_id, matrix, features)
+            row = storage_row(row, compiled)
+            old = current.get(application_id)
+            if old is None:
+                continue
+            if all(getattr(old, name) == row.get(name) for name in RESULT_FIELDS):
+                continue
+            updates.append({"id": old.id, **{name: row.get(name) for name in RESULT_FIELDS}})
+            if old.eligible != row["eligible"]:
+                changed.append({
+                    "application_id": application_id,
+                    "eligible_before": old.eligible,
+                    "eligible_after": row["eligible"]
+                })
+        
+        if updates:
+            db.execute(update(MatchResult), updates)
+            rows_updated += len(updates)
+        db.commit()
+    
+    return {
+        "policy_id": policy_id,
+        "applications_checked": len(ids),
+        "rows_updated": rows_updated,
+        "eligibility_changed": changed,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
@@ -0,0 +1,200 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+
+    def __init__(self, writer: Callable[[dict[str, list[dict]]], None], batch_size: int = 500,
+                 flush_interval: float = 0.2, max_pending: int = 10000, max_attempts: int = 3):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._cond = threading.Condition()
+        self._pending: OrderedDict[str, tuple[float, list[dict]]] = OrderedDict()
+        self._pending_rows = 0
+        self._inflight: dict[str, list[dict]] = {}
+        self._attempts: dict[str, int] = {}
+        self._flushing = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.flushes = 0
+        self.rows_written = 0
+        self.waits = 0
+        self.retries = 0
+        self.failed = 0
+        self.dropped_rows = 0
+        self.last_error: Optional[str] = None
+
+    def submit(self, application_id: str, rows: list[dict]):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-behind buffer is shut down")
+            queued = self._pending.get(application_id)
+            previous = len(queued[1]) if queued else 0
+            if self._pending_rows > 0 and self._pending_rows - previous + len(rows) > self.max_pending:
+                self.waits += 1
+                self._cond.notify_all()
+                while self._pending_rows > 0 and self._pending_rows - previous + len(rows) > self.max_pending:
+                    self._cond.wait()
+                    queued = self._pending.get(application_id)
+                    previous = len(queued[1]) if queued else 0
+
+            queued_at = queued[0] if queued else time.monotonic()
+            self._pending[application_id] = (queued_at, rows)
+            self._pending_rows += len(rows) - previous
+            self._start()
+            self._cond.notify_all()
+
+    def pending(self, application_id: str) -> Optional[list[dict]]:
+        with self._cond:
+            queued = self._pending.get(application_id)
+            if queued is not None:
+                return list(queued[1])
+            rows = self._inflight.get(application_id)
+            return list(rows) if rows is not None else None
+
+    def match_ids(self, application_id: str) -> Optional[dict[str, str]]:
+        rows = self.pending(application_id)
+        if rows is None:
+            return None
+        return {row["policy_id"]: row["id"] for row in rows}
+
+    def discard(self, application_id: str):
+        with self._cond:
+            self._drop_pending(application_id)
+            while application_id in self._inflight:
+                self._cond.wait()
+            self._drop_pending(application_id)
+            self._attempts.pop(application_id, None)
+
+    def _drop_pending(self, application_id: str):
+        queued = self._pending.pop(application_id, None)
+        if queued is not None:
+            self._pending_rows -= len(queued[1])
+            self._cond.notify_all()
+
+    def flush(self):
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._pending or self._inflight:
+                    self._cond.wait()
+            finally:
+                self._flushing -= 1
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="match-writer", daemon=True)
+            self._thread.start()
+
+    def _due(self) -> bool:
+        if not self._pending:
+            return False
+        if self._closed or self._flushing or self._pending_rows >= self.batch_size:
+            return True
+        oldest = next(iter(self._pending.values()))[0]
+        return time.monotonic() - oldest >= self.flush_interval
+
+    def _timeout(self) -> Optional[float]:
+        if not self._pending:
+            return None
+        oldest = next(iter(self._pending.values()))[0]
+        return max(0.0, self.flush_interval - (time.monotonic() - oldest))
+
+    def _take(self) -> dict[str, list[dict]]:
+        batch = {}
+        rows = 0
+        while self._pending and (not batch or rows < self.batch_size):
+            application_id, (_, app_rows) = self._pending.popitem(last=False)
+            batch[application_id] = app_rows
+            rows += len(app_rows)
+        self._pending_rows -= rows
+        return batch
+
+    def _write(self, batch: dict[str, list[dict]]) -> dict[str, Exception]:
+        try:
+            self.writer(batch)
+            return {}
+        except Exception:
+            failed = {}
+            for application_id, rows in batch.items():
+                try:
+                    self.writer({application_id: rows})
+                except Exception as e:
+                    failed[application_id] = e
+            return failed
+
+    def _retry(self, application_id: str, rows: list[dict], error: Exception):
+        self.last_error = str(error)
+        if application_id in self._pending:
+            self._attempts.pop(application_id, None)
+            return
+        attempts = self._attempts.get(application_id, 0) + 1
+        if attempts < self.max_attempts:
+            self._attempts[application_id] = attempts
+            self._pending[application_id] = (time.monotonic(), rows)
+            self._pending_rows += len(rows)
+            self.retries += 1
+            logger.warning("Match write for %s failed (attempt %d of %d): %s",
+                           application_id, attempts, self.max_attempts, error)
+            return
+        self._attempts.pop(application_id, None)
+        self.failed += 1
+        self.dropped_rows += len(rows)
+        logger.error("Dropping %d match rows for %s after %d failed writes: %s",
+                     len(rows), application_id, attempts, error)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._due():
+                    if self._closed and not self._pending:
+                        return
+                    self._cond.wait(self._timeout())
+                batch = self._take()
+                self._inflight = batch
+                self._cond.notify_all()
+
+            failed = self._write(batch)
+
+            with self._cond:
+                self._inflight = {}
+                self.flushes += 1
+                for application_id, rows in batch.items():
+                    if application_id in failed:
+                        self._retry(application_id, rows, failed[application_id])
+                    else:
+                        self._attempts.pop(application_id, None)
+                        self.rows_written += len(rows)
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pending_applications": len(self._pending),
+                "pending_rows": self._pending_rows,
+                "inflight_applications": len(self._inflight),
+                "flushes": self.flushes,
+                "rows_written": self.rows_written,
+                "backpressure_waits": self.waits,
+                "retried_writes": self.retries,
+                "failed_applications": self.failed,
+                "dropped_rows": self.dropped_rows,
+                "last_error": self.last_error
+            }
@@ -0,0 +1,72 @@
+import random
+import threading
+from services.application_index import ApplicationIndex, ApplicationIndexCache, SortedColumn
+from services.compiled_policy import compile_policy
+from services.features import ApplicationFeatures
+from services.rules import run_all_rules
+from tests.test_policy_matrix import random_application, random_policy, make_policy, make_application
+
+
+def build_index(apps, statuses=None):
+    statuses = statuses or ["submitted"] * len(apps)
+    return ApplicationIndex([
+        (f"app_{i}", status, ApplicationFeatures.from_application(app))
+        for i, (app, status) in enumerate(zip(apps, statuses))
+    ])
+
+
+class TestApplicationIndex:
+    def test_reach_matches_rules_engine(self):
+        rng = random.Random(11)
+        apps = [random_application(rng) for _ in range(300)]
+        index = build_index(apps)
+        for i in range(60):
+            policy = compile_policy(random_policy(rng, i))
+            expected = [f"app_{j}" for j, app in enumerate(apps) if run_all_rules(app, policy)[0]]
+            reach = index.reach(policy)
+            assert reach["application_ids"] == expected
+            assert reach["eligible_count"] == len(expected)
+
+    def test_status_filter_and_failure_counts(self):
+        apps = [make_application(amount=50000), make_application(amount=300000), make_application(amount=80000)]
+        index = build_index(apps, ["submitted", "submitted", "draft"])
+        reach = index.reach(compile_policy(make_policy(max_amount=100000)), ["submitted"])
+        assert reach["total_applications"] == 2
+        assert reach["application_ids"] == ["app_0"]
+        assert reach["failed_by_criteria"] == {"Maximum Loan Amount": 1}
+
+    def test_sorted_column_bounds_are_inclusive(self):
+        column = SortedColumn([700, None, 650, 720, 650])
+        assert column.at_least(650).tolist() == [True, False, True, True, True]
+        assert column.at_most(650).tolist() == [False, False, True, False, True]
+
+
+class TestApplicationIndexCache:
+    def test_index_is_reused_until_ttl(self, monkeypatch):
+        cache = ApplicationIndexCache(ttl=60)
+        monkeypatch.setattr(cache, "_build", lambda db: build_index([make_application()]))
+        first = cache.get(None)
+        assert cache.get(None) is first
+        assert (cache.hits, cache.rebuilds) == (1, 1)
+
+    def test_stale_index_is_served_during_rebuild(self, monkeypatch):
+        cache = ApplicationIndexCache(ttl=0)
+        stale = build_index([make_application()])
+        cache._index = stale
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_build(db):
+            started.set()
+            release.wait(5)
+            return build_index([make_application(), make_application()])
+
+        monkeypatch.setattr(cache, "_build", slow_build)
+        rebuild = threading.Thread(target=cache.get, args=(None,))
+        rebuild.start()
+        assert started.wait(5)
+        assert cache.get(None) is stale
+        release.set()
+        rebuild.join(5)
+        assert cache._index.size == 2
+        assert (cache.stale_hits, cache.rebuilds) == (1, 1)
@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from config import settings
+from database import Base, async_database_url, engine_options
+from routers import async_applications, async_lenders, async_matches, with_fallback
+from routers import applications_router, lenders_router
+from schemas import LenderCreate, LenderPolicyCreate, LoanApplicationCreate, LoanApplicationUpdate
+from services import catalog
+from services.query_counter import count_queries, instrument
+
+
+def application_payload(fico=700):
+    return LoanApplicationCreate(
+        borrower={
+            "business_name": "Biz", "industry": "Construction", "state": "TX",
+            "years_in_business": 3, "annual_revenue": 400000,
+            "guarantors": [{"name": "Owner", "fico_score": fico}]
+        },
+        amount=50000, term_months=36, equipment_type="Excavator"
+    )
+
+
+def run(scenario):
+    async def main():
+        engine = create_async_engine(
+            "sqlite+aiosqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        instrument(engine.sync_engine)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        try:
+            return await scenario(sessions)
+        finally:
+            await engine.dispose()
+    return asyncio.run(main())
+
+
+@pytest.fixture(autouse=True)
+def fresh_catalog(monkeypatch):
+    monkeypatch.setattr(async_lenders, "policy_catalog", catalog.PolicyCatalog(check_interval=60))
+
+
+class TestAsyncRoutes:
+    def test_application_crud(self):
+        async def scenario(sessions):
+            async with sessions() as db:
+                created = await async_applications.create_application_async(application_payload(), db=db)
+                app_id = created.id
+            async with sessions() as db:
+                with count_queries(budget=2):
+                    listed = await async_applications.list_applications_async(Response(), limit=100, db=db)
+                    assert [g.name for g in listed[0].borrower.guarantors] == ["Owner"]
+            async with sessions() as db:
+                updated = await async_applications.update_application_async(
+                    app_id, LoanApplicationUpdate(amount=75000), db=db
+                )
+                assert updated.amount == 75000
+                submitted = await async_applications.submit_application_async(app_id, db=db)
+                assert submitted["status"] == "submitted"
+            async with sessions() as db:
+                await async_applications.delete_application_async(app_id, db=db)
+                with pytest.raises(HTTPException) as exc:
+                    await async_applications.get_application_async(app_id, db=db)
+                return exc.value.status_code
+        assert run(scenario) == 404
+
+    def test_lender_policies_and_matches(self):
+        async def scenario(sessions):
+            async with sessions() as db:
+                lender = await async_lenders.create_lender_async(LenderCreate(name="Apex"), db=db)
+                await async_lenders.create_policy_async(
+                    lender.id, LenderPolicyCreate(program_name="A", fico_min=650), db=db
+                )
+                app = await async_applications.create_application_async(application_payload(), db=db)
+            async with sessions() as db:
+                with count_queries(budget=2):
+                    lenders = await async_lenders.list_lenders_async(Response(), limit=100, db=db)
+                    assert [p.program_name for p in lenders[0].policies] == ["A"]
+                matches = await async_matches.get_matches_async(app.id, Response(), limit=100, db=db)
+                eligible = await async_matches.get_eligible_matches_async(app.id, top_k=None, db=db)
+                return matches, eligible
+        assert run(scenario) == ([], [])
+
+
+class TestAsyncConfiguration:
+    def test_async_driver_is_derived_from_sync_url(self):
+        assert async_database_url("postgresql://u:p@db:5432/app") == "postgresql+asyncpg://u:p@db:5432/app"
+        assert async_database_url("sqlite:////tmp/app.db") == "sqlite+aiosqlite:////tmp/app.db"
+        assert async_database_url("postgresql+asyncpg://db/app") == "postgresql+asyncpg://db/app"
+
+    def test_pool_and_timeout_options(self, monkeypatch):
+        monkeypatch.setattr(settings, "db_pool_size", 20)
+        monkeypatch.setattr(settings, "db_statement_timeout_ms", 5000)
+        sync_options = engine_options("postgresql://db/app")
+        assert sync_options["pool_size"] == 20
+        assert sync_options["connect_args"] == {"options": "-c statement_timeout=5000"}
+        async_options = engine_options("postgresql+asyncpg://db/app")
+        assert async_options["connect_args"] == {"server_settings": {"statement_timeout": "5000"}}
+        assert "pool_size" not in engine_options("sqlite:////tmp/app.db")
+
+    def test_async_routes_shadow_sync_ones(self):
+        merged = with_fallback(async_applications.router, applications_router)
+        endpoints = {(route.path, tuple(sorted(route.methods))): route.endpoint.__name__ for route in merged.routes}
+        assert endpoints[("/applications/{app_id}", ("GET",))] == "get_application_async"
+        assert len(endpoints) == len(merged.routes)
+
+        lenders = with_fallback(async_lenders.router, lenders_router)
+        names = {route.endpoint.__name__ for route in lenders.routes}
+        assert {"backtest_policy_update", "update_policy", "list_lenders_async"} <= names
+        assert "list_lenders" not in names
@@ -0,0 +1,105 @@
+import threading
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+from models import CatalogVersion, GLOBAL_VERSION_KEY, Lender, LenderPolicy
+from services.catalog import PolicyCatalog
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    engine.dispose()
+
+
+def add_lender(db, catalog, name, fico_min=650):
+    lender = Lender(name=name, is_active=True)
+    db.add(lender)
+    db.flush()
+    db.add(LenderPolicy(lender_id=lender.id, program_name="Standard", fico_min=fico_min))
+    catalog.mark_changed(db, lender.id)
+    db.commit()
+    return lender
+
+
+class TestPolicyCatalog:
+    def test_warm_cache_skips_queries(self, session_factory):
+        db = session_factory()
+        catalog = PolicyCatalog(check_interval=60)
+        add_lender(db, catalog, "Alpha")
+        first = catalog.get(db)
+        assert catalog.get(db) is first
+        assert catalog.hits == 1
+        assert catalog.rebuilds == 1
+
+    def test_other_worker_reloads_only_changed_lender(self, session_factory):
+        db = session_factory()
+        writer = PolicyCatalog(check_interval=60)
+        reader = PolicyCatalog(check_interval=0)
+        alpha = add_lender(db, writer, "Alpha")
+        add_lender(db, writer, "Beta")
+        before = reader.get(db)
+        assert len(before.entries) == 2
+
+        policy = db.query(LenderPolicy).filter(LenderPolicy.lender_id == alpha.id).first()
+        policy.fico_min = 720
+        writer.mark_changed(db, alpha.id)
+        db.commit()
+
+        after = reader.get(db)
+        assert after.version == before.version + 1
+        assert reader.partial_rebuilds == 1
+        assert reader.lenders_reloaded == 1
+        assert {p.fico_min for _, p in after.entries} == {650, 720}
+
+    def test_deactivated_lender_is_dropped(self, session_factory):
+        db = session_factory()
+        catalog = PolicyCatalog(check_interval=60)
+        alpha = add_lender(db, catalog, "Alpha")
+        assert len(catalog.get(db).lenders) == 1
+
+        alpha.is_active = False
+        catalog.mark_changed(db, alpha.id)
+        db.commit()
+
+        assert catalog.get(db).lenders == ()
+
+    def test_first_changes_from_two_sessions_both_count(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        sessions = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+        barrier = threading.Barrier(2)
+        errors = []
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        def mark(lender_id):
+            db = sessions()
+            try:
+                barrier.wait(5)
+                PolicyCatalog(check_interval=60).mark_changed(db, lender_id, "ldr_shared")
+                db.commit()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.close()
+
+        threads = [threading.Thread(target=mark, args=(f"ldr_{i}",)) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert sum("ON CONFLICT (lender_id) DO UPDATE" in statement for statement in statements) == 4
+        db = sessions()
+        versions = dict(db.query(CatalogVersion.lender_id, CatalogVersion.version))
+        assert versions[GLOBAL_VERSION_KEY] == 2
+        assert versions["ldr_shared"] == 2
+        assert sorted((versions["ldr_0"], versions["ldr_1"])) == [1, 2]
+        db.close()
+        engine.dispose()
@@ -0,0 +1,61 @@
+import random
+import pytest
+from unittest.mock import MagicMock
+from sqlalchemy import create_engine, inspect, text
+from services.compiled_policy import compile_policy
+from services.criteria_codec import RULE_IDS, decode, encode
+from services.rules import RULES_REGISTRY
+from services.policy_matrix import PolicyMatrix
+from migrations import add_compact_match_columns
+from tests.test_policy_matrix import make_policy, random_application, random_policy
+
+
+class TestCriteriaCodec:
+    def test_round_trip_matches_full_detail(self):
+        rng = random.Random(17)
+        matrix = PolicyMatrix([(MagicMock(), random_policy(rng, i)) for i in range(100)])
+        for _ in range(30):
+            app = random_application(rng)
+            for _, policy, (eligible, _, met, failed, reasons) in matrix.evaluate(app):
+                compact = encode(met, failed, policy)
+                assert compact is not None
+                assert (compact["failed_mask"] == 0) == eligible
+                expected = (met, failed, reasons if not eligible else None)
+                assert decode(compact["met_mask"], compact["failed_mask"], compact["observed"], compact["bounds"]) == expected
+                assert decode(compact["met_mask"], compact["failed_mask"], compact["observed"], None, policy) == expected
+
+    def test_rows_store_bounds_not_strings(self):
+        policy = compile_policy(make_policy(min_revenue=250000.0, fico_min=700, excluded_states=["CA"], no_tax_liens=True))
+        met = [{"criteria": "Annual Revenue", "value": 300000.0, "required": ">= $250,000"}]
+        failed = [{"criteria": "State", "value": "CA", "required": "excluded: ['CA']"}]
+        compact = encode(met, failed, policy)
+        assert compact["bounds"] == {"min_annual_revenue": 250000.0, "excluded_states": ["CA"]}
+        assert decode(compact["met_mask"], compact["failed_mask"], compact["observed"], compact["bounds"])[:2] == (met, failed)
+
+    def test_rows_that_disagree_with_the_policy_stay_json(self):
+        policy = compile_policy(make_policy(fico_min=700))
+        assert encode([{"criteria": "FICO Score", "value": 720, "required": ">= 650"}], [], policy) is None
+
+    def test_rows_without_bounds_need_a_policy(self):
+        with pytest.raises(ValueError):
+            decode(1, 0, [700], None)
+
+    def test_bit_positions_never_move(self):
+        assert RULE_IDS == (
+            "fico_score", "paynet_score", "years_in_business", "annual_revenue",
+            "loan_amount_min", "loan_amount_max", "term_min", "term_max", "equipment_age",
+            "state_allowed", "industry", "equipment_type", "no_bankruptcy", "no_tax_liens",
+        )
+        assert tuple(RULES_REGISTRY) == RULE_IDS
+
+    def test_unknown_criteria_stay_json(self):
+        assert encode([{"criteria": "Custom Check", "value": 1, "required": 2}], [], compile_policy(make_policy())) is None
+
+    def test_migration_adds_columns_to_existing_table(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE match_results (id VARCHAR PRIMARY KEY, criteria_met JSON)"))
+        assert add_compact_match_columns(engine) == ["met_mask", "failed_mask", "observed"]
+        assert add_compact_match_columns(engine) == []
+        columns = {c["name"] for c in inspect(engine).get_columns("match_results")}
+        assert {"met_mask", "failed_mask", "observed"} <= columns
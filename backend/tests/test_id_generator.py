@@ -0,0 +1,66 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+import pytest
+from utils import id_generator
+from utils.id_generator import generate_id, id_time, match_id
+
+
+class TestIdGenerator:
+    def test_format_keeps_prefix(self):
+        value = match_id()
+        prefix, encoded = value.split("_")
+        assert prefix == "mtc"
+        assert len(encoded) == 26
+        assert set(encoded) <= set(id_generator.ALPHABET)
+
+    def test_ids_sort_in_creation_order(self):
+        ids = [generate_id("app") for _ in range(5000)]
+        assert ids == sorted(ids)
+        assert len(set(ids)) == len(ids)
+
+    def test_embedded_time_is_creation_time(self):
+        stamp = id_time(generate_id("ldr"))
+        assert abs(datetime.now(timezone.utc) - stamp) < timedelta(seconds=5)
+
+    def test_legacy_ids_have_no_time(self):
+        with pytest.raises(ValueError):
+            id_time("app_1a2b3c4d")
+
+    def test_clock_going_backwards_stays_monotonic(self, monkeypatch):
+        first = generate_id("mtc")
+        monkeypatch.setattr(id_generator.time, "time_ns", lambda: 0)
+        assert generate_id("mtc") > first
+
+    def test_threads_never_collide(self):
+        results = [[] for _ in range(8)]
+
+        def worker(out):
+            out.extend(generate_id("mtc") for _ in range(2000))
+
+        threads = [threading.Thread(target=worker, args=(out,)) for out in results]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ids = [value for out in results for value in out]
+        assert len(set(ids)) == len(ids)
+        assert all(out == sorted(out) for out in results)
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+    def test_forked_children_do_not_repeat_the_parent_sequence(self):
+        generate_id("mtc")
+        read_end, write_end = os.pipe()
+        children = []
+        for _ in range(2):
+            pid = os.fork()
+            if pid == 0:
+                os.write(write_end, (generate_id("mtc") + "\n").encode())
+                os._exit(0)
+            children.append(pid)
+        for pid in children:
+            os.waitpid(pid, 0)
+        os.close(write_end)
+        with os.fdopen(read_end) as pipe:
+            ids = pipe.read().split()
+        assert len(ids) == 2 and ids[0] != ids[1]
@@ -0,0 +1,40 @@
+import threading
+from services.jobs import JobQueue, JobStatus
+from tests.test_single_flight import wait_for
+
+
+class TestJobQueue:
+    def test_queued_and_running_jobs_are_shared(self):
+        queue = JobQueue(workers=2)
+        release = threading.Event()
+        first = queue.submit("app_1", lambda key: release.wait(5) and {"key": key})
+        wait_for(lambda: first.status == JobStatus.RUNNING)
+        assert queue.submit("app_1", lambda key: {}) is first
+        release.set()
+        wait_for(lambda: first.status == JobStatus.COMPLETED)
+        assert first.to_dict()["application_id"] == "app_1"
+        assert first.result == {"key": "app_1"}
+        queue.shutdown()
+
+    def test_requeue_running_runs_after_the_current_job(self):
+        queue = JobQueue(workers=2)
+        release = threading.Event()
+        order = []
+
+        def task(key):
+            order.append("start")
+            release.wait(5)
+            order.append("end")
+            return {}
+
+        first = queue.submit("pol_1", task, kind="policy", requeue_running=True)
+        wait_for(lambda: first.status == JobStatus.RUNNING)
+        second = queue.submit("pol_1", task, kind="policy", requeue_running=True)
+        assert second is not first
+        assert queue.submit("pol_1", task, kind="policy", requeue_running=True) is second
+        release.set()
+        wait_for(lambda: second.status == JobStatus.COMPLETED)
+        assert order == ["start", "end", "start", "end"]
+        assert second.to_dict()["policy_id"] == "pol_1"
+        assert queue.latest_for("pol_1") is second
+        queue.shutdown()
@@ -0,0 +1,98 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
+import migrations
+from database import Base
+from migrations import HOT_PATH_INDEXES, MIGRATIONS, applied_versions, create_index_ddl, migrate
+from models import MatchResult
+from services.pagination import match_list
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    yield engine
+    engine.dispose()
+
+
+def index_names(engine):
+    inspector = inspect(engine)
+    return {index["name"] for table in inspector.get_table_names() for index in inspector.get_indexes(table)}
+
+
+def legacy_schema(engine):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for name in (*HOT_PATH_INDEXES, "uq_match_results_application_policy"):
+            conn.execute(text(f"DROP INDEX {name}"))
+
+
+class TestMigrations:
+    def test_existing_database_gets_indexes_once(self, engine):
+        legacy_schema(engine)
+        assert not set(HOT_PATH_INDEXES) & index_names(engine)
+
+        applied = migrate(engine)
+        assert sorted(applied["hot_path_indexes"]) == sorted(HOT_PATH_INDEXES)
+        assert set(HOT_PATH_INDEXES) <= index_names(engine)
+        assert sorted(applied_versions(engine)) == [m.version for m in MIGRATIONS]
+        assert migrate(engine) == {}
+
+    def test_fresh_database_is_recorded_without_changes(self, engine):
+        Base.metadata.create_all(bind=engine)
+        assert migrate(engine) == {
+            "compact_match_columns": [], "hot_path_indexes": [], "unique_match_policy": [], "compact_bounds": []
+        }
+
+    def test_target_stops_at_version(self, engine):
+        legacy_schema(engine)
+        assert list(migrate(engine, target=1)) == ["compact_match_columns"]
+        assert not set(HOT_PATH_INDEXES) & index_names(engine)
+        assert list(migrate(engine)) == ["hot_path_indexes", "unique_match_policy", "compact_bounds"]
+
+    def test_match_pages_use_the_composite_index(self, engine):
+        legacy_schema(engine)
+        migrate(engine)
+        query = match_list("app_1", eligible_only=True, limit=10)
+        compiled = query.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+        with engine.connect() as conn:
+            plan = " ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+        assert "ix_match_results_application_eligible_score" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_postgres_builds_indexes_concurrently(self):
+        index = next(i for i in MatchResult.__table__.indexes if i.name == "ix_match_results_application_eligible_score")
+        assert create_index_ddl(index, postgresql.dialect()) == (
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_match_results_application_eligible_score "
+            "ON match_results (application_id, eligible, fit_score DESC, id)"
+        )
+        assert "CONCURRENTLY" not in create_index_ddl(index, sqlite.dialect())
+        assert {m.name for m in MIGRATIONS if not m.transactional} == {"hot_path_indexes", "unique_match_policy"}
+
+    def test_version_table_created_by_another_worker(self, engine, monkeypatch):
+        Base.metadata.create_all(bind=engine)
+        create = migrations.schema_migrations.create
+
+        def racing_create(bind, checkfirst=False):
+            create(bind)
+            raise OperationalError("CREATE TABLE schema_migrations", {}, Exception("table already exists"))
+
+        monkeypatch.setattr(migrations.schema_migrations, "create", racing_create)
+        assert sorted(migrate(engine)) == [
+            "compact_bounds", "compact_match_columns", "hot_path_indexes", "unique_match_policy"
+        ]
+
+    def test_duplicate_matches_are_removed_before_the_unique_index(self, engine):
+        legacy_schema(engine)
+        with engine.begin() as conn:
+            for match_id in ("mtc_1", "mtc_2", "mtc_3"):
+                conn.execute(text(
+                    "INSERT INTO match_results (id, application_id, lender_id, policy_id, eligible) "
+                    "VALUES (:id, 'app_1', 'ldr_1', :policy, 1)"
+                ), {"id": match_id, "policy": "pol_2" if match_id == "mtc_3" else "pol_1"})
+
+        assert migrate(engine)["unique_match_policy"] == ["uq_match_results_application_policy"]
+        with engine.connect() as conn:
+            assert [row.id for row in conn.execute(text("SELECT id FROM match_results ORDER BY id"))] == ["mtc_1", "mtc_3"]
@@ -0,0 +1,111 @@
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+from models import ApplicationStatus, Lender, LenderPolicy, LoanApplication, MatchResult
+from routers.applications import list_applications
+from routers.lenders import list_lenders
+from routers.matches import get_matches
+from services.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, pending_match_list
+from tests.test_underwriting import seed
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False, autocommit=False)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def walk(route, *args, **kwargs):
+    pages, cursor = [], None
+    while True:
+        response = Response()
+        pages.append([item.id for item in route(*args, response=response, cursor=cursor, **kwargs)])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+def seed_matches(db, app_id, scores):
+    lender = db.query(Lender).first()
+    for i, score in enumerate(scores):
+        policy = LenderPolicy(lender_id=lender.id, program_name=f"Program {i}")
+        db.add(policy)
+        db.flush()
+        db.add(MatchResult(
+            id=f"mtc_{i:03d}", application_id=app_id, lender_id=lender.id, policy_id=policy.id,
+            eligible=i % 2 == 0, fit_score=score
+        ))
+    db.commit()
+
+
+class TestCursor:
+    def test_round_trip(self):
+        assert decode_cursor(encode_cursor(82.5, "mtc_1"), 2) == [82.5, "mtc_1"]
+
+    @pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor("a", "b"), encode_cursor("a")[:-2]])
+    def test_invalid_cursor_is_rejected(self, cursor):
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            decode_cursor(cursor, 1)
+
+
+class TestApplicationPages:
+    def test_pages_cover_every_row_once(self, db):
+        ids = seed(db, applications=12)
+        pages = walk(list_applications, limit=5, db=db)
+        assert [len(p) for p in pages] == [5, 5, 2]
+        assert [app_id for p in pages for app_id in p] == sorted(ids)
+
+    def test_filters(self, db):
+        ids = seed(db, applications=12)
+        db.query(LoanApplication).filter(LoanApplication.id == ids[1]).update({"status": ApplicationStatus.SUBMITTED})
+        db.commit()
+        texas = walk(list_applications, state="tx", min_amount=100000, max_amount=400000, limit=2, db=db)
+        assert sorted(app_id for p in texas for app_id in p) == sorted(ids[i] for i in (1, 2, 3, 4, 6, 7))
+        submitted = list_applications(Response(), status="submitted", limit=100, db=db)
+        assert [a.id for a in submitted] == [ids[1]]
+
+    def test_bad_input_is_a_400(self, db):
+        for kwargs in ({"status": "funded"}, {"cursor": "garbage"}):
+            with pytest.raises(HTTPException) as exc:
+                list_applications(Response(), limit=10, db=db, **kwargs)
+            assert exc.value.status_code == 400
+
+
+class TestLenderPages:
+    def test_active_only(self, db):
+        for i in range(7):
+            db.add(Lender(name=f"Lender {i}", is_active=i != 3))
+        db.commit()
+        pages = walk(list_lenders, active_only=True, limit=4, db=db)
+        assert [len(p) for p in pages] == [4, 2]
+        inactive = db.query(Lender).filter(Lender.is_active == False).one()
+        assert inactive.id not in {lender_id for p in pages for lender_id in p}
+
+
+class TestMatchPages:
+    def test_ties_are_broken_by_id(self, db):
+        app_id = seed(db, applications=1)[0]
+        seed_matches(db, app_id, [90, 75, 75, 75, 75, 60, 40])
+        pages = walk(get_matches, app_id, limit=3, db=db)
+        assert pages == [["mtc_000", "mtc_001", "mtc_002"], ["mtc_003", "mtc_004", "mtc_005"], ["mtc_006"]]
+
+    def test_score_and_eligibility_filters(self, db):
+        app_id = seed(db, applications=1)[0]
+        seed_matches(db, app_id, [90, 75, 75, 75, 75, 60, 40])
+        pages = walk(get_matches, app_id, min_fit_score=60, eligible_only=True, limit=2, db=db)
+        assert pages == [["mtc_000", "mtc_002"], ["mtc_004"]]
+
+    def test_pending_rows_page_like_stored_rows(self):
+        rows = [{"id": f"mtc_{i:03d}", "eligible": i % 2 == 0, "fit_score": score}
+                for i, score in enumerate([90, 75, 75, 75, 75, 60, 40])]
+        first = pending_match_list(rows, limit=3)
+        assert [m.id for m in first] == ["mtc_000", "mtc_001", "mtc_002", "mtc_003"]
+        rest = pending_match_list(rows, cursor=encode_cursor(75, "mtc_002"), limit=3)
+        assert [m.id for m in rest] == ["mtc_003", "mtc_004", "mtc_005", "mtc_006"]
@@ -0,0 +1,271 @@
+import random
+import threading
+from dataclasses import replace
+import pytest
+from unittest.mock import MagicMock
+from services.criteria import CRITERIA
+from services.rules import RULES_REGISTRY, RuleStats, rule_stats, run_all_rules
+from services.policy_matrix import PolicyMatrix
+from services.features import ApplicationFeatures
+from services.compiled_policy import compile_policy
+
+
+def make_guarantor(fico=720, bankruptcy=0, tax_liens=0):
+    g = MagicMock()
+    g.fico_score = fico
+    g.has_bankruptcy = bankruptcy
+    g.has_open_tax_liens = tax_liens
+    return g
+
+
+def make_application(amount=100000, term=36, equipment_type="Excavator", equipment_age=2,
+                     years=5, revenue=500000, state="TX", industry="Construction", paynet=700, guarantors=None):
+    app = MagicMock()
+    app.amount = amount
+    app.term_months = term
+    app.equipment_type = equipment_type
+    app.equipment_age_years = equipment_age
+    app.borrower.years_in_business = years
+    app.borrower.annual_revenue = revenue
+    app.borrower.state = state
+    app.borrower.industry = industry
+    app.borrower.paynet_score = paynet
+    app.borrower.guarantors = [make_guarantor()] if guarantors is None else guarantors
+    return app
+
+
+def make_policy(**kwargs):
+    p = MagicMock()
+    p.id = kwargs.get("id", "pol_test")
+    p.program_name = kwargs.get("program_name", "Standard")
+    p.fico_min = kwargs.get("fico_min")
+    p.paynet_min = kwargs.get("paynet_min")
+    p.min_years_in_business = kwargs.get("min_years")
+    p.min_annual_revenue = kwargs.get("min_revenue")
+    p.min_amount = kwargs.get("min_amount")
+    p.max_amount = kwargs.get("max_amount")
+    p.min_term = kwargs.get("min_term")
+    p.max_term = kwargs.get("max_term")
+    p.max_equipment_age = kwargs.get("max_equipment_age")
+    p.allowed_states = kwargs.get("allowed_states")
+    p.excluded_states = kwargs.get("excluded_states")
+    p.excluded_industries = kwargs.get("excluded_industries")
+    p.allowed_equipment_types = kwargs.get("allowed_equipment_types")
+    p.no_bankruptcy = kwargs.get("no_bankruptcy", False)
+    p.no_open_tax_liens = kwargs.get("no_tax_liens", False)
+    return p
+
+
+def random_policy(rng, i):
+    maybe = lambda v: v if rng.random() < 0.5 else None
+    return make_policy(
+        id=f"pol_{i}",
+        fico_min=maybe(rng.choice([600, 650, 680, 700, 720])),
+        paynet_min=maybe(rng.choice([640, 660, 680])),
+        min_years=maybe(rng.choice([1, 2, 3, 5])),
+        min_revenue=maybe(rng.choice([100000.0, 250000.0, 1000000.0])),
+        min_amount=maybe(rng.choice([10000.0, 50000.0, 75000.0])),
+        max_amount=maybe(rng.choice([100000.0, 250000.0, 500000.0])),
+        min_term=maybe(rng.choice([12, 24, 36])),
+        max_term=maybe(rng.choice([48, 60, 72])),
+        max_equipment_age=maybe(rng.choice([5, 10, 15])),
+        allowed_states=maybe(rng.sample(["TX", "CA", "NY", "FL", "NV"], 2)),
+        excluded_states=maybe(rng.sample(["CA", "NV", "ND", "VT"], 2)),
+        excluded_industries=maybe(["Gambling", "Cannabis"]),
+        allowed_equipment_types=maybe(["Excavator", "Truck", "forklift"]),
+        no_bankruptcy=rng.random() < 0.7,
+        no_tax_liens=rng.random() < 0.7,
+    )
+
+
+def random_application(rng):
+    guarantors = [] if rng.random() < 0.1 else [make_guarantor(
+        fico=rng.randint(550, 800), bankruptcy=int(rng.random() < 0.2), tax_liens=int(rng.random() < 0.2)
+    )]
+    return make_application(
+        amount=rng.choice([5000.0, 60000.0, 150000.0, 400000.0, 750000.0]),
+        term=rng.choice([12, 36, 60, 84]),
+        equipment_type=rng.choice(["Excavator", "TRUCK", "Forklift", "Boat"]),
+        equipment_age=rng.randint(0, 20),
+        years=rng.randint(0, 10),
+        revenue=rng.choice([80000.0, 300000.0, 2000000.0]),
+        state=rng.choice(["TX", "CA", "NV", "OH"]),
+        industry=rng.choice(["Construction", "gambling", "Trucking"]),
+        paynet=rng.choice([None, 0, 650, 700]),
+        guarantors=guarantors,
+    )
+
+
+class TestPolicyMatrixParity:
+    def test_matches_run_all_rules(self):
+        rng = random.Random(7)
+        lender = MagicMock()
+        entries = [(lender, random_policy(rng, i)) for i in range(200)]
+        matrix = PolicyMatrix(entries)
+        for _ in range(50):
+            app = random_application(rng)
+            for _, policy, result in matrix.evaluate(app):
+                assert result == run_all_rules(app, policy)
+
+    def test_iter_evaluate_matches_evaluate(self):
+        rng = random.Random(3)
+        matrix = PolicyMatrix([(MagicMock(), random_policy(rng, i)) for i in range(100)])
+        for _ in range(20):
+            app = random_application(rng)
+            assert list(matrix.iter_evaluate(app)) == matrix.evaluate(app)
+
+    def test_rank_keeps_eligible_detail_and_compacts_rejections(self):
+        rng = random.Random(5)
+        matrix = PolicyMatrix([(MagicMock(), random_policy(rng, i)) for i in range(150)])
+        for _ in range(20):
+            app = random_application(rng)
+            full = {policy.id: result for _, policy, result in matrix.evaluate(app)}
+            top, rest = matrix.rank(app, 3)
+
+            eligible = sorted(
+                (pid for pid, result in full.items() if result[0]),
+                key=lambda pid: (full[pid][1], len(full[pid][2])), reverse=True
+            )
+            assert [policy.id for _, policy, _ in top] == eligible[:3]
+            for _, policy, result in top:
+                assert result == full[policy.id]
+            for _, policy, result in rest:
+                ok, score, met, failed, reasons = result
+                if ok:
+                    assert result == full[policy.id]
+                    continue
+                assert (ok, score, met) == (False, full[policy.id][1], None)
+                assert failed == full[policy.id][3][:1]
+                assert reasons == full[policy.id][4][:1]
+
+    def test_near_misses_match_failure_counts_and_fixes_work(self):
+        rng = random.Random(13)
+        matrix = PolicyMatrix([(MagicMock(), random_policy(rng, i)) for i in range(150)])
+        for _ in range(20):
+            app = ApplicationFeatures.from_application(random_application(rng))
+            full = {policy.id: result for _, policy, result in matrix.evaluate(app)}
+            misses = matrix.near_misses(app, 2)
+            assert {p.id for _, p, _, _ in misses} == {pid for pid, r in full.items() if 1 <= len(r[3]) <= 2}
+            for _, policy, criteria_failed, adjustments in misses:
+                assert criteria_failed == full[policy.id][3]
+                if adjustments is not None:
+                    fixed = replace(app, **{a["field"]: a["required"] for a in adjustments})
+                    assert run_all_rules(fixed, policy)[0]
+
+    def test_empty_catalog(self):
+        assert PolicyMatrix([]).evaluate(make_application()) == []
+
+    def test_unknown_state_uses_exclusion(self):
+        policy = make_policy(excluded_states=["CA"])
+        matrix = PolicyMatrix([(MagicMock(), policy)])
+        _, _, (eligible, score, met, failed, _) = matrix.evaluate(make_application(state="OH"))[0]
+        assert eligible is True
+        assert met[0]["criteria"] == "State"
+
+    def test_no_guarantor_fails_fico(self):
+        policy = make_policy(fico_min=650, no_bankruptcy=True)
+        matrix = PolicyMatrix([(MagicMock(), policy)])
+        _, _, (eligible, score, met, failed, _) = matrix.evaluate(make_application(guarantors=[]))[0]
+        assert eligible is False
+        assert failed[0]["value"] == "No guarantor"
+        assert score == pytest.approx(200 / 3)
+
+
+class TestApplicationFeatures:
+    def test_snapshot_is_detached(self):
+        app = make_application(industry="Gambling", equipment_type="TRUCK")
+        features = ApplicationFeatures.from_application(app)
+        app.borrower.guarantors = []
+        assert features.has_guarantor is True
+        assert features.fico_score == 720
+        assert features.industry_lower == "gambling"
+        assert features.equipment_type_lower == "truck"
+        assert not hasattr(features, "__dict__")
+
+    def test_rules_accept_features(self):
+        rng = random.Random(11)
+        for i in range(100):
+            app = random_application(rng)
+            policy = random_policy(rng, i)
+            assert run_all_rules(ApplicationFeatures.from_application(app), policy) == run_all_rules(app, policy)
+
+
+class TestCompiledPolicy:
+    def test_only_set_criteria_are_compiled(self):
+        compiled = compile_policy(make_policy(fico_min=700, excluded_industries=["Gambling"], no_bankruptcy=True))
+        assert compiled.rules == ("fico_score", "state_allowed", "industry", "no_bankruptcy")
+        assert compiled.excluded_industry_set == frozenset({"gambling"})
+        assert compiled.required["industry"] == ("Not in excluded list", "Excluded: ['Gambling']")
+
+    def test_required_strings_come_from_the_criteria_table(self):
+        compiled = compile_policy(make_policy(
+            min_revenue=250000, max_term=60, excluded_states=["CA"], no_tax_liens=True
+        ))
+        assert compiled.required["annual_revenue"] == (">= $250,000", ">= $250,000")
+        assert compiled.required["term_max"] == ("<= 60 months", "<= 60 months")
+        assert compiled.required["state_allowed"] == ("not in ['CA']", "excluded: ['CA']")
+        assert compiled.required["no_tax_liens"] == ("No open tax liens allowed",) * 2
+        assert set(compiled.required) <= set(CRITERIA)
+
+    def test_compiled_is_detached_from_source(self):
+        policy = make_policy(allowed_states=["TX"])
+        compiled = compile_policy(policy)
+        policy.allowed_states.append("CA")
+        assert compiled.allowed_state_set == frozenset({"TX"})
+        assert compiled.allowed_states == ["TX"]
+
+
+class TestAdaptiveRules:
+    def test_fail_fast_agrees_with_full_evaluation(self):
+        rng = random.Random(9)
+        for i in range(300):
+            app = random_application(rng)
+            policy = compile_policy(random_policy(rng, i))
+            full = run_all_rules(app, policy)
+            fast = run_all_rules(app, policy, explain=False)
+            assert fast[0] == full[0]
+            if full[0]:
+                assert fast == full
+            else:
+                assert fast[1] is None
+                assert len(fast[3]) == 1 and fast[3][0] in full[3]
+
+    def test_selective_rules_move_first(self):
+        stats = RuleStats(refresh_every=1)
+        stats.record_outcomes("state_allowed", 100, 0)
+        stats.record_outcomes("fico_score", 20, 80)
+        stats.record_outcomes("term_max", 60, 40)
+        assert stats.order(("state_allowed", "fico_score", "term_max")) == ["fico_score", "term_max", "state_allowed"]
+        assert stats.stats()["fico_score"]["fail_rate"] == 0.8
+
+    def test_cheap_rules_move_ahead_of_equally_selective_ones(self):
+        stats = RuleStats(refresh_every=1)
+        stats.record_outcomes("fico_score", 50, 50)
+        stats.record_outcomes("industry", 50, 50)
+        stats.record_cost("fico_score", 10, 10000)
+        stats.record_cost("industry", 10, 1000)
+        assert stats.order(("fico_score", "industry")) == ["industry", "fico_score"]
+        assert stats.stats()["industry"]["avg_ns"] == 100
+        assert stats.stats()["paynet_score"]["avg_ns"] is None
+
+    def test_evaluation_records_rule_cost(self):
+        rng = random.Random(4)
+        rule_stats.reset()
+        PolicyMatrix([(MagicMock(), random_policy(rng, i)) for i in range(10)]).evaluate(random_application(rng))
+        run_all_rules(random_application(rng), random_policy(rng, 11), explain=False)
+        stats = rule_stats.stats()
+        assert all(stats[name]["avg_ns"] is not None for name in RULES_REGISTRY)
+
+    def test_concurrent_outcomes_are_not_lost(self):
+        stats = RuleStats(refresh_every=10 ** 9)
+
+        def record():
+            for _ in range(2000):
+                stats.record_outcomes("fico_score", 1, 1)
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert stats.stats()["fico_score"]["evaluated"] == 8 * 2000 * 2
@@ -0,0 +1,71 @@
+import pytest
+from fastapi import Response
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+from models import Lender, LenderPolicy
+from routers.applications import get_application, list_applications
+from routers.lenders import list_lenders
+from schemas import LenderResponse, LoanApplicationResponse
+from services.query_counter import QueryBudgetExceeded, count_queries, instrument
+from tests.test_underwriting import seed
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    instrument(engine)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False, autocommit=False)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def seed_lenders(db, count):
+    for i in range(count):
+        db.add(Lender(name=f"Lender {i}", policies=[LenderPolicy(program_name="A"), LenderPolicy(program_name="B")]))
+    db.commit()
+
+
+class TestQueryBudget:
+    @pytest.mark.parametrize("applications", [2, 10])
+    def test_list_applications_is_constant(self, db, applications):
+        seed(db, applications=applications)
+        db.expunge_all()
+        with count_queries(budget=2) as counter:
+            response = [LoanApplicationResponse.model_validate(a) for a in list_applications(Response(), limit=100, db=db)]
+        assert len(response) == applications
+        assert all(len(a.borrower.guarantors) == 1 for a in response)
+        assert counter.count == 2
+
+    def test_get_application_loads_in_one_pass(self, db):
+        app_id = seed(db, applications=1)[0]
+        db.expunge_all()
+        with count_queries(budget=2):
+            LoanApplicationResponse.model_validate(get_application(app_id, db=db))
+
+    @pytest.mark.parametrize("lenders", [2, 10])
+    def test_list_lenders_is_constant(self, db, lenders):
+        seed_lenders(db, lenders)
+        db.expunge_all()
+        with count_queries(budget=2) as counter:
+            response = [LenderResponse.model_validate(l) for l in list_lenders(Response(), limit=100, db=db)]
+        assert sum(len(l.policies) for l in response) == lenders * 2
+        assert counter.count == 2
+
+    def test_lazy_loads_blow_the_budget(self, db):
+        seed_lenders(db, 3)
+        db.expunge_all()
+        with pytest.raises(QueryBudgetExceeded):
+            with count_queries(budget=2):
+                for lender in db.query(Lender).all():
+                    lender.policies
+
+    def test_queries_outside_a_counter_are_ignored(self, db):
+        seed_lenders(db, 1)
+        with count_queries() as counter:
+            pass
+        db.query(Lender).all()
+        assert counter.count == 0
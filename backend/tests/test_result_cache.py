@@ -0,0 +1,62 @@
+from services.features import ApplicationFeatures
+from services.result_cache import ResultCache, fingerprint
+
+
+def features(**overrides):
+    values = dict(
+        has_guarantor=True, fico_score=700, has_bankruptcy=False, has_open_tax_liens=False,
+        paynet_score=680, years_in_business=3, annual_revenue=400000.0, state="TX",
+        industry="Construction", industry_lower="construction", equipment_type="Excavator",
+        equipment_type_lower="excavator", amount=50000.0, term_months=36, equipment_age_years=2
+    )
+    values.update(overrides)
+    return ApplicationFeatures(**values)
+
+
+def row(policy_id, eligible=True):
+    return {
+        "id": "mtc_x", "application_id": "app_x", "lender_id": "ldr_1", "policy_id": policy_id,
+        "lender_name": "Apex", "eligible": eligible, "fit_score": 90.0, "matched_program": "A",
+        "criteria_met": [{"criteria": "FICO Score", "value": 700, "required": ">= 650"}],
+        "criteria_failed": [], "rejection_reasons": None
+    }
+
+
+class TestResultCache:
+    def test_fingerprint_tracks_rule_inputs(self):
+        assert fingerprint(features()) == fingerprint(features())
+        assert fingerprint(features()) != fingerprint(features(fico_score=701))
+
+    def test_hit_copies_rows_for_new_application(self):
+        cache = ResultCache(max_entries=10, ttl=60)
+        cache.put(features(), 3, [row("pol_1"), row("pol_2", eligible=False)])
+
+        rows = cache.get(features(), 3, "app_new")
+        assert [r["policy_id"] for r in rows] == ["pol_1", "pol_2"]
+        assert {r["application_id"] for r in rows} == {"app_new"}
+        assert "mtc_x" not in {r["id"] for r in rows}
+
+        rows[0]["criteria_met"].append({"criteria": "mutated"})
+        assert len(cache.get(features(), 3, "app_other")[0]["criteria_met"]) == 1
+        assert cache.hits == 2
+
+    def test_catalog_version_is_part_of_key(self):
+        cache = ResultCache(max_entries=10, ttl=60)
+        cache.put(features(), 3, [row("pol_1")])
+        assert cache.get(features(), 4, "app_x") is None
+        assert cache.misses == 1
+
+    def test_lru_eviction_and_ttl(self):
+        cache = ResultCache(max_entries=2, ttl=60)
+        cache.put(features(fico_score=1), 1, [row("pol_1")])
+        cache.put(features(fico_score=2), 1, [row("pol_1")])
+        cache.get(features(fico_score=1), 1, "app_x")
+        cache.put(features(fico_score=3), 1, [row("pol_1")])
+        assert cache.get(features(fico_score=2), 1, "app_x") is None
+        assert cache.get(features(fico_score=1), 1, "app_x") is not None
+        assert cache.evictions == 1
+
+        expired = ResultCache(max_entries=2, ttl=0)
+        expired.put(features(), 1, [row("pol_1")])
+        assert expired.get(features(), 1, "app_x") is None
+        assert expired.expirations == 1
@@ -0,0 +1,70 @@
+import threading
+import time
+from services.single_flight import SingleFlight
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_share_one_run(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            release.wait(5)
+            return "result"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flights.do("app_1", work)))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: flights.followers == 2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert len(calls) == 1
+        assert sorted(results) == [("result", False), ("result", True), ("result", True)]
+
+    def test_error_reaches_followers_and_clears_key(self):
+        flights = SingleFlight()
+        release = threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise ValueError("boom")
+
+        errors = []
+
+        def call():
+            try:
+                flights.do("app_1", fail)
+            except ValueError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=call) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: flights.followers == 1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert errors == ["boom", "boom"]
+        assert flights.do("app_1", lambda: "again") == ("again", False)
+
+    def test_distinct_keys_run_independently(self):
+        flights = SingleFlight()
+        assert flights.do("app_1", lambda: 1) == (1, False)
+        assert flights.do("app_2", lambda: 2) == (2, False)
+        assert flights.leaders == 2 and flights.followers == 0
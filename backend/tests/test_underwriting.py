@@ -0,0 +1,518 @@
+import threading
+import time
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+from models import Borrower, Guarantor, LoanApplication, Lender, LenderPolicy, MatchResult
+from config import settings
+from routers.lenders import update_policy
+from routers.matches import get_eligible_matches
+from schemas import LenderPolicyUpdate
+from services import backtest, underwriting
+from services.criteria_codec import backfill_compact, expand_matches
+from services.catalog import PolicyCatalog
+from services.jobs import JobStatus
+from services.result_cache import ResultCache
+from services.single_flight import SingleFlight
+from services.write_behind import WriteBehindBuffer
+
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine, autoflush=False, autocommit=False)()
+    monkeypatch.setattr(underwriting, "policy_catalog", PolicyCatalog(check_interval=60))
+    monkeypatch.setattr(underwriting, "result_cache", ResultCache(max_entries=16, ttl=60))
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def seed(db, applications=12):
+    lender = Lender(name="Apex", is_active=True)
+    db.add(lender)
+    db.flush()
+    for fico in (620, 680, 740):
+        db.add(LenderPolicy(
+            lender_id=lender.id, program_name=f"FICO {fico}", fico_min=fico,
+            max_amount=250000, excluded_states=["CA"], no_bankruptcy=True, no_open_tax_liens=True
+        ))
+
+    ids = []
+    for i in range(applications):
+        borrower = Borrower(
+            business_name=f"Biz {i}", industry="Construction", state="CA" if i % 5 == 0 else "TX",
+            years_in_business=3, annual_revenue=400000, paynet_score=680
+        )
+        db.add(borrower)
+        db.flush()
+        db.add(Guarantor(borrower_id=borrower.id, name="Owner", fico_score=600 + i * 15,
+                         has_bankruptcy=0, has_open_tax_liens=0))
+        application = LoanApplication(borrower_id=borrower.id, amount=50000 * (i + 1), term_months=36,
+                                      equipment_type="Excavator", equipment_age_years=2)
+        db.add(application)
+        db.flush()
+        ids.append(application.id)
+    db.commit()
+    return ids
+
+
+def stored_matches(db):
+    return sorted(
+        (m.application_id, m.policy_id, m.eligible, m.fit_score, m.matched_program,
+         m.criteria_met, m.criteria_failed, m.rejection_reasons)
+        for m in db.query(MatchResult).all()
+    )
+
+
+class TestBatchUnderwriting:
+    def test_batch_writes_all_matches(self, db):
+        ids = seed(db)
+        result = underwriting.underwrite_batch(db, application_ids=ids + ["app_missing"], chunk_size=5)
+        assert result["processed"] == len(ids)
+        assert result["matches_written"] == len(ids) * 3
+        assert result["results"][-1] == {
+            "application_id": "app_missing", "status": "not_found", "total_policies": 0, "eligible_count": 0
+        }
+        assert db.query(MatchResult).count() == len(ids) * 3
+
+    def test_rerun_replaces_matches(self, db):
+        ids = seed(db)
+        underwriting.underwrite_batch(db, application_ids=ids)
+        underwriting.underwrite_batch(db, application_ids=ids)
+        assert db.query(MatchResult).count() == len(ids) * 3
+
+    def test_parallel_matches_serial(self, db):
+        ids = seed(db)
+        serial = underwriting.underwrite_batch(db, application_ids=ids, chunk_size=3)
+        serial_rows = stored_matches(db)
+        parallel = underwriting.underwrite_batch(db, application_ids=ids, chunk_size=3, workers=2)
+        assert parallel["workers"] == 2
+        assert parallel["results"] == serial["results"]
+        assert stored_matches(db) == serial_rows
+
+
+class TestStreamingUnderwriting:
+    def test_stream_persists_matches_and_ends_with_summary(self, db, monkeypatch):
+        ids = seed(db, applications=3)
+        monkeypatch.setattr(underwriting, "SessionLocal", sessionmaker(bind=db.get_bind()))
+        application = underwriting.load_applications(db, [ids[1]])[0]
+        catalog = underwriting.policy_catalog.get(db)
+        features = underwriting.ApplicationFeatures.from_application(application)
+
+        statements = []
+        event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+        events = list(underwriting.stream_application(application.id, catalog, features))
+        kinds = [kind for kind, _ in events]
+        assert kinds == ["match", "match", "match", "summary"]
+        summary = events[-1][1]
+        assert summary["total_policies"] == 3
+        assert summary["eligible_count"] == sum(row["eligible"] for _, row in events[:-1])
+        assert summary["changes"] == {"inserted": 3, "updated": 0, "deleted": 0}
+        assert summary["query_count"] == len(statements)
+
+        db.expire_all()
+        assert db.query(MatchResult).filter(MatchResult.application_id == application.id).count() == 3
+        assert db.get(LoanApplication, application.id).status.value == "completed"
+
+    def test_stream_commits_before_sending_records(self, db, monkeypatch):
+        ids = seed(db, applications=1)
+        sessions = []
+        factory = sessionmaker(bind=db.get_bind())
+
+        def session_local():
+            sessions.append(factory())
+            return sessions[-1]
+
+        monkeypatch.setattr(underwriting, "SessionLocal", session_local)
+        locked = []
+        lock = underwriting.lock_applications
+        monkeypatch.setattr(underwriting, "lock_applications", lambda session, app_ids: locked.append(app_ids) or lock(session, app_ids))
+        application = underwriting.load_applications(db, ids)[0]
+        catalog = underwriting.policy_catalog.get(db)
+        features = underwriting.ApplicationFeatures.from_application(application)
+
+        events = underwriting.stream_application(application.id, catalog, features)
+        next(events)
+        assert locked == [[application.id]]
+        assert sessions and not any(session.in_transaction() for session in sessions)
+        db.expire_all()
+        assert db.query(MatchResult).filter(MatchResult.application_id == application.id).count() == 3
+        events.close()
+        assert db.get(LoanApplication, application.id).status.value == "completed"
+
+    def test_write_behind_stream_hands_rows_to_the_writer(self, db, monkeypatch):
+        ids = seed(db, applications=1)
+        monkeypatch.setattr(underwriting, "SessionLocal", sessionmaker(bind=db.get_bind()))
+        monkeypatch.setattr(settings, "match_persistence", "write_behind")
+        writer = WriteBehindBuffer(lambda batch: None, batch_size=1000, flush_interval=60)
+        monkeypatch.setattr(underwriting, "match_writer", writer)
+        application = underwriting.load_applications(db, ids)[0]
+        catalog = underwriting.policy_catalog.get(db)
+        features = underwriting.ApplicationFeatures.from_application(application)
+
+        events = list(underwriting.stream_application(application.id, catalog, features))
+        assert events[-1][1]["changes"] is None
+        assert [row["policy_id"] for row in writer.pending(application.id)] == [row["policy_id"] for _, row in events[:-1]]
+        assert db.query(MatchResult).count() == 0
+        writer.shutdown()
+
+    def test_failed_save_restores_previous_state(self, db, monkeypatch):
+        ids = seed(db, applications=1)
+        monkeypatch.setattr(underwriting, "SessionLocal", sessionmaker(bind=db.get_bind()))
+        application = underwriting.load_applications(db, ids)[0]
+        catalog = underwriting.policy_catalog.get(db)
+        features = underwriting.ApplicationFeatures.from_application(application)
+        list(underwriting.stream_application(application.id, catalog, features))
+        before = stored_matches(db)
+
+        db.query(LenderPolicy).update({"fico_min": 800})
+        underwriting.policy_catalog.mark_changed(db, catalog.lenders[0].id)
+        db.query(LoanApplication).update({"status": underwriting.ApplicationStatus.UNDERWRITING})
+        db.commit()
+        catalog = underwriting.policy_catalog.get(db)
+
+        sync = underwriting.sync_matches
+
+        def failing_sync(session, app_ids, rows):
+            sync(session, app_ids, rows)
+            raise RuntimeError("write failed")
+
+        monkeypatch.setattr(underwriting, "sync_matches", failing_sync)
+        events = underwriting.stream_application(
+            application.id, catalog, features, underwriting.ApplicationStatus.COMPLETED
+        )
+        with pytest.raises(RuntimeError):
+            next(events)
+
+        db.expire_all()
+        assert stored_matches(db) == before
+        assert db.get(LoanApplication, application.id).status.value == "completed"
+
+
+class TestLoadMatches:
+    def test_rows_missing_from_the_snapshot_sort_last(self, db):
+        ids = seed(db, applications=1)
+        result = underwriting.underwrite_batch(db, application_ids=ids)
+        assert result["matches_written"] == 3
+        stored = db.query(MatchResult).order_by(MatchResult.policy_id).all()
+        rows = [{"policy_id": m.policy_id} for m in reversed(stored[1:])]
+
+        loaded = underwriting.load_matches(db, ids[0], rows)
+        assert [m.policy_id for m in loaded] == [row["policy_id"] for row in rows] + [stored[0].policy_id]
+
+
+class TestMemoizedUnderwriting:
+    def test_unchanged_inputs_reuse_cached_matches(self, db):
+        ids = seed(db, applications=2)
+        application = db.get(LoanApplication, ids[0])
+        _, first, cached, _, _ = underwriting.underwrite_application(db, application)
+        assert not cached
+        expected = [(m.policy_id, m.eligible, m.fit_score) for m in first]
+
+        application.equipment_description = "Updated description"
+        db.commit()
+        _, second, cached, _, _ = underwriting.underwrite_application(db, application)
+        assert cached
+        assert [(m.policy_id, m.eligible, m.fit_score) for m in second] == expected
+        assert db.query(MatchResult).filter(MatchResult.application_id == ids[0]).count() == 3
+
+        application.amount += 1
+        db.commit()
+        assert not underwriting.underwrite_application(db, application)[2]
+
+
+class TestDiffPersistence:
+    def test_rerun_writes_only_changed_rows(self, db):
+        ids = seed(db, applications=2)
+        application = db.get(LoanApplication, ids[0])
+        _, first, _, changes, _ = underwriting.underwrite_application(db, application)
+        assert changes == {"inserted": 3, "updated": 0, "deleted": 0}
+        match_ids = {m.policy_id: m.id for m in first}
+
+        _, second, _, changes, _ = underwriting.underwrite_application(db, application)
+        assert changes == {"inserted": 0, "updated": 0, "deleted": 0}
+        assert {m.policy_id: m.id for m in second} == match_ids
+
+        policy = db.query(LenderPolicy).filter(LenderPolicy.fico_min == 620).first()
+        policy.fico_min = 700
+        lender = policy.lender
+        summit = Lender(name="Summit", is_active=True, policies=[LenderPolicy(program_name="Open")])
+        db.add(summit)
+        db.flush()
+        underwriting.policy_catalog.mark_changed(db, lender.id, summit.id)
+        db.commit()
+
+        _, third, _, changes, _ = underwriting.underwrite_application(db, application)
+        assert changes == {"inserted": 1, "updated": 1, "deleted": 0}
+        assert {m.policy_id: m.id for m in third if m.policy_id in match_ids} == match_ids
+
+        lender.is_active = False
+        underwriting.policy_catalog.mark_changed(db, lender.id)
+        db.commit()
+
+        _, fourth, _, changes, _ = underwriting.underwrite_application(db, application)
+        assert changes == {"inserted": 0, "updated": 0, "deleted": 3}
+        assert [m.lender_name for m in fourth] == ["Summit"]
+        assert db.query(MatchResult).filter(MatchResult.application_id == ids[0]).count() == 1
+
+    def test_batch_reports_changes(self, db):
+        ids = seed(db)
+        first = underwriting.underwrite_batch(db, application_ids=ids, chunk_size=5)
+        assert first["changes"] == {"inserted": len(ids) * 3, "updated": 0, "deleted": 0}
+        second = underwriting.underwrite_batch(db, application_ids=ids, chunk_size=5)
+        assert second["changes"] == {"inserted": 0, "updated": 0, "deleted": 0}
+
+
+class TestConcurrentUnderwriting:
+    def test_duplicate_request_joins_running_evaluation(self, db, monkeypatch):
+        ids = seed(db, applications=2)
+        monkeypatch.setattr(underwriting, "underwriting_flights", SingleFlight())
+        started = threading.Event()
+        release = threading.Event()
+        evaluate = underwriting.match_rows
+        calls = []
+
+        def slow_match_rows(*args):
+            calls.append(args[0])
+            started.set()
+            release.wait(5)
+            return evaluate(*args)
+
+        monkeypatch.setattr(underwriting, "match_rows", slow_match_rows)
+        follower_db = sessionmaker(bind=db.get_bind())()
+        follower_app = follower_db.get(LoanApplication, ids[0])
+        results = {}
+
+        def run(name, session, application):
+            results[name] = underwriting.underwrite_application(session, application)
+
+        leader = threading.Thread(target=run, args=("leader", db, db.get(LoanApplication, ids[0])))
+        leader.start()
+        assert started.wait(5)
+        follower = threading.Thread(target=run, args=("follower", follower_db, follower_app))
+        follower.start()
+        while underwriting.underwriting_flights.followers == 0:
+            time.sleep(0.005)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+        follower_db.close()
+
+        assert calls == [ids[0]]
+        _, leader_matches, _, leader_changes, leader_shared = results["leader"]
+        _, follower_matches, _, follower_changes, follower_shared = results["follower"]
+        assert not leader_shared and follower_shared
+        assert leader_changes["inserted"] == 3
+        assert follower_changes == {"inserted": 0, "updated": 0, "deleted": 0}
+        assert [m.id for m in follower_matches] == [m.id for m in leader_matches]
+        assert db.query(MatchResult).filter(MatchResult.application_id == ids[0]).count() == 3
+
+    def test_duplicate_rows_are_collapsed(self, db):
+        ids = seed(db, applications=1)
+        application = db.get(LoanApplication, ids[0])
+        _, matches, _, _, _ = underwriting.underwrite_application(db, application)
+        duplicate = matches[0]
+        db.execute(text("DROP INDEX uq_match_results_application_policy"))
+        db.add(MatchResult(
+            application_id=duplicate.application_id, lender_id=duplicate.lender_id,
+            policy_id=duplicate.policy_id, eligible=duplicate.eligible
+        ))
+        db.commit()
+
+        _, _, _, changes, _ = underwriting.underwrite_application(db, application)
+        assert changes == {"inserted": 0, "updated": 0, "deleted": 1}
+        assert db.query(MatchResult).count() == 3
+
+
+    def test_match_rows_are_unique_per_policy(self, db):
+        ids = seed(db, applications=1)
+        _, matches, _, _, _ = underwriting.underwrite_application(db, db.get(LoanApplication, ids[0]))
+        db.add(MatchResult(
+            application_id=ids[0], lender_id=matches[0].lender_id, policy_id=matches[0].policy_id, eligible=True
+        ))
+        with pytest.raises(IntegrityError):
+            db.commit()
+
+class TestWriteBehindPersistence:
+    def test_response_is_served_before_rows_are_written(self, db, monkeypatch):
+        ids = seed(db, applications=2)
+        monkeypatch.setattr(settings, "match_persistence", "write_behind")
+        monkeypatch.setattr(underwriting, "SessionLocal", sessionmaker(bind=db.get_bind()))
+        writer = WriteBehindBuffer(underwriting.persist_pending, batch_size=1000, flush_interval=60)
+        monkeypatch.setattr(underwriting, "match_writer", writer)
+        application = db.get(LoanApplication, ids[0])
+
+        _, first, _, changes, _ = underwriting.underwrite_application(db, application)
+        assert changes is None
+        assert db.query(MatchResult).count() == 0
+        assert [row["id"] for row in writer.pending(ids[0])] == [m.id for m in first]
+
+        writer.flush()
+        db.expire_all()
+        stored = {m.policy_id: m.id for m in db.query(MatchResult).all()}
+        assert stored == {m.policy_id: m.id for m in first}
+        assert db.get(LoanApplication, ids[0]).status.value == "completed"
+
+        _, second, _, _, _ = underwriting.underwrite_application(db, application)
+        assert {m.policy_id: m.id for m in second} == stored
+        writer.shutdown()
+        assert {m.policy_id: m.id for m in db.query(MatchResult).all()} == stored
+
+
+class TestPolicyReunderwriting:
+    def test_tightened_policy_updates_only_its_rows(self, db):
+        ids = seed(db)
+        underwriting.underwrite_batch(db, application_ids=ids)
+        before = stored_matches(db)
+
+        policy = db.query(LenderPolicy).filter(LenderPolicy.fico_min == 620).first()
+        policy_id = policy.id
+        was_eligible = {
+            m.application_id for m in db.query(MatchResult).filter(MatchResult.policy_id == policy_id, MatchResult.eligible)
+        }
+        policy.fico_min = 700
+        underwriting.policy_catalog.mark_changed(db, policy.lender_id)
+        db.commit()
+
+        report = underwriting.reunderwrite_policy(db, policy, chunk_size=5)
+        assert report["applications_checked"] == len(ids)
+        assert report["eligibility_changed"]
+        assert all(c["eligible_before"] and not c["eligible_after"] for c in report["eligibility_changed"])
+        assert {c["application_id"] for c in report["eligibility_changed"]} <= was_eligible
+
+        after = stored_matches(db)
+        assert [m for m in after if m[1] != policy_id] == [m for m in before if m[1] != policy_id]
+
+        underwriting.underwrite_batch(db, application_ids=ids)
+        assert stored_matches(db) == after
+
+    def test_rows_removed_mid_run_are_skipped(self, db, monkeypatch):
+        ids = seed(db, applications=4)
+        underwriting.underwrite_batch(db, application_ids=ids)
+        policy = db.query(LenderPolicy).filter(LenderPolicy.fico_min == 620).first()
+        policy_id = policy.id
+        chunks = underwriting.feature_chunks
+
+        def deleting_chunks(session, chunk_ids, chunk_size):
+            session.query(MatchResult).filter(
+                MatchResult.application_id == ids[0], MatchResult.policy_id == policy_id
+            ).delete()
+            yield from chunks(session, chunk_ids, chunk_size)
+
+        monkeypatch.setattr(underwriting, "feature_chunks", deleting_chunks)
+        report = underwriting.reunderwrite_policy(db, policy)
+        assert report["applications_checked"] == 4
+        assert ids[0] not in {c["application_id"] for c in report["eligibility_changed"]}
+
+
+    def test_policy_update_queues_a_reunderwrite_job(self, db, monkeypatch):
+        ids = seed(db, applications=6)
+        underwriting.underwrite_batch(db, application_ids=ids)
+        policy = db.query(LenderPolicy).filter(LenderPolicy.fico_min == 620).first()
+        monkeypatch.setattr(underwriting, "SessionLocal", sessionmaker(bind=db.get_bind(), autoflush=False))
+
+        response = update_policy(policy.lender_id, policy.id, LenderPolicyUpdate(fico_min=700), db=db)
+        job = underwriting.underwriting_jobs.get(response.reunderwriting_job_id)
+        assert job is not None and job.kind == "policy"
+        assert job.done.wait(5)
+        assert job.status == JobStatus.COMPLETED
+        assert job.result["applications_checked"] == len(ids)
+        assert job.result["eligibility_changed"]
+
+
+class TestPolicyBacktest:
+    def test_backtest_reports_deltas_without_saving(self, db):
+        ids = seed(db)
+        policy = db.query(LenderPolicy).filter(LenderPolicy.fico_min == 620).first()
+        policy_id = policy.id
+
+        report = backtest.backtest_policy(db, policy, {"fico_min": 700}, chunk_size=5, sample_limit=2)
+        assert report["applications"] == len(ids)
+        assert report["newly_approved_count"] == 0
+        assert report["newly_rejected_count"] > 0
+        assert len(report["newly_rejected"]) == min(report["newly_rejected_count"], 2)
+        assert report["current"]["eligible_count"] - report["proposed"]["eligible_count"] == report["newly_rejected_count"]
+        assert report["proposed"]["rejections_by_criteria"]["FICO Score"] > report["current"]["rejections_by_criteria"].get("FICO Score", 0)
+        assert db.get(LenderPolicy, policy_id).fico_min == 620
+
+    def test_parallel_backtest_matches_serial(self, db):
+        seed(db)
+        policy = db.query(LenderPolicy).filter(LenderPolicy.fico_min == 680).first()
+        changes = {"excluded_states": ["CA", "TX"]}
+        serial = backtest.backtest_policy(db, policy, changes, chunk_size=4)
+        policy = db.get(LenderPolicy, serial["policy_id"])
+        parallel = backtest.backtest_policy(db, policy, changes, chunk_size=4, workers=2)
+        for key in ("applications", "current", "proposed", "newly_rejected", "newly_approved"):
+            assert parallel[key] == serial[key]
+
+
+class TestTopK:
+    def test_eligible_rows_outside_the_top_keep_full_detail(self, db):
+        ids = seed(db, applications=12)
+        app_id = ids[9]
+        db.query(LoanApplication).filter(LoanApplication.id == app_id).update({"amount": 100000})
+        db.commit()
+        fields = ("policy_id", "eligible", "fit_score", "criteria_met", "criteria_failed", "rejection_reasons")
+
+        def eligible_rows():
+            return sorted(tuple(getattr(m, f) for f in fields) for m in get_eligible_matches(app_id, top_k=None, db=db))
+
+        underwriting.underwrite_batch(db, application_ids=[app_id])
+        expected = eligible_rows()
+        assert len(expected) > 1
+
+        application = underwriting.load_applications(db, [app_id])[0]
+        _, top_rows, eligible_count, _, _ = underwriting.underwrite_top_k(db, application, 1)
+        assert len(top_rows) == 1 and eligible_count == len(expected)
+        db.expire_all()
+        assert eligible_rows() == expected
+        assert all(row[3] for row in expected)
+
+
+class TestCompactStorage:
+    def expanded(self, db):
+        matches = db.query(MatchResult).all()
+        fields = ("application_id", "policy_id", "criteria_met", "criteria_failed", "rejection_reasons")
+        return sorted(
+            (tuple(m[f] if isinstance(m, dict) else getattr(m, f) for f in fields) for m in expand_matches(db, matches)),
+            key=lambda row: row[:2]
+        )
+
+    def test_compact_rows_expand_to_full_detail(self, db, monkeypatch):
+        ids = seed(db, applications=4)
+        underwriting.underwrite_batch(db, application_ids=ids[:1])
+        expected = self.expanded(db)
+
+        monkeypatch.setattr(settings, "match_storage", "compact")
+        underwriting.underwrite_batch(db, application_ids=ids[:1])
+        stored = db.query(MatchResult).all()
+        assert all(m.met_mask is not None and m.criteria_met is None for m in stored)
+        assert self.expanded(db) == expected
+
+    def test_backfill_converts_json_rows(self, db):
+        ids = seed(db, applications=4)
+        underwriting.underwrite_batch(db, application_ids=ids)
+        expected = self.expanded(db)
+
+        assert backfill_compact(db, batch_size=5) == {"converted": len(ids) * 3, "skipped": 0}
+        db.expire_all()
+        assert all(m.met_mask is not None for m in db.query(MatchResult).all())
+        assert self.expanded(db) == expected
+
+    def test_policy_edits_do_not_rewrite_stored_detail(self, db, monkeypatch):
+        monkeypatch.setattr(settings, "match_storage", "compact")
+        ids = seed(db, applications=4)
+        underwriting.underwrite_batch(db, application_ids=ids)
+        expected = self.expanded(db)
+
+        db.query(LenderPolicy).update({"fico_min": 800, "max_amount": 10000})
+        db.commit()
+        assert self.expanded(db) == expected
+        db.query(LenderPolicy).delete()
+        db.commit()
+        assert self.expanded(db) == expected
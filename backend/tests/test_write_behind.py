@@ -0,0 +1,142 @@
+import threading
+import time
+from services.write_behind import WriteBehindBuffer
+
+
+def rows(app_id, count=2):
+    return [{"id": f"mtc_{app_id}_{i}", "policy_id": f"pol_{i}", "application_id": app_id} for i in range(count)]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+class Recorder:
+
+    def __init__(self, fail_for=()):
+        self.batches = []
+        self.fail_for = set(fail_for)
+        self.release = threading.Event()
+        self.release.set()
+        self.entered = threading.Event()
+
+    def __call__(self, batch):
+        self.entered.set()
+        self.release.wait(5)
+        if self.fail_for & set(batch):
+            raise ValueError("write failed")
+        self.batches.append(dict(batch))
+
+
+class TestWriteBehindBuffer:
+    def test_size_trigger_flushes_without_waiting_for_interval(self):
+        writer = Recorder()
+        buffer = WriteBehindBuffer(writer, batch_size=4, flush_interval=60)
+        buffer.submit("app_1", rows("app_1"))
+        buffer.submit("app_2", rows("app_2"))
+        wait_for(lambda: buffer.stats()["rows_written"] == 4)
+        assert [sorted(batch) for batch in writer.batches] == [["app_1", "app_2"]]
+        buffer.shutdown()
+
+    def test_time_trigger_flushes_small_batches(self):
+        writer = Recorder()
+        buffer = WriteBehindBuffer(writer, batch_size=100, flush_interval=0.05)
+        buffer.submit("app_1", rows("app_1"))
+        wait_for(lambda: writer.batches)
+        assert buffer.pending("app_1") is None
+        buffer.shutdown()
+
+    def test_pending_rows_are_readable_until_written(self):
+        writer = Recorder()
+        writer.release.clear()
+        buffer = WriteBehindBuffer(writer, batch_size=1, flush_interval=60)
+        buffer.submit("app_1", rows("app_1"))
+        assert writer.entered.wait(5)
+        assert buffer.pending("app_1") == rows("app_1")
+        assert buffer.match_ids("app_1") == {"pol_0": "mtc_app_1_0", "pol_1": "mtc_app_1_1"}
+        writer.release.set()
+        buffer.flush()
+        assert buffer.pending("app_1") is None
+        buffer.shutdown()
+
+    def test_resubmit_replaces_queued_rows(self):
+        writer = Recorder()
+        buffer = WriteBehindBuffer(writer, batch_size=100, flush_interval=60)
+        buffer.submit("app_1", rows("app_1", 3))
+        buffer.submit("app_1", rows("app_1", 1))
+        assert buffer.stats()["pending_rows"] == 1
+        buffer.flush()
+        assert writer.batches == [{"app_1": rows("app_1", 1)}]
+        buffer.shutdown()
+
+    def test_full_buffer_blocks_submitters(self):
+        writer = Recorder()
+        writer.release.clear()
+        buffer = WriteBehindBuffer(writer, batch_size=2, flush_interval=60, max_pending=2)
+        buffer.submit("app_1", rows("app_1"))
+        assert writer.entered.wait(5)
+        buffer.submit("app_2", rows("app_2"))
+
+        blocked = threading.Thread(target=buffer.submit, args=("app_3", rows("app_3")))
+        blocked.start()
+        wait_for(lambda: buffer.stats()["backpressure_waits"] == 1)
+        assert blocked.is_alive()
+
+        writer.release.set()
+        blocked.join(5)
+        assert not blocked.is_alive()
+        buffer.shutdown()
+        assert buffer.stats()["rows_written"] == 6
+
+    def test_failed_application_does_not_drop_the_batch(self):
+        writer = Recorder(fail_for={"app_2"})
+        buffer = WriteBehindBuffer(writer, batch_size=100, flush_interval=60)
+        for app_id in ("app_1", "app_2", "app_3"):
+            buffer.submit(app_id, rows(app_id))
+        buffer.flush()
+        assert sorted(app_id for batch in writer.batches for app_id in batch) == ["app_1", "app_3"]
+        stats = buffer.stats()
+        assert stats["failed_applications"] == 1
+        assert stats["last_error"] == "write failed"
+        buffer.shutdown()
+
+    def test_transient_failure_is_retried_without_losing_rows(self):
+        attempts = []
+
+        def flaky(batch):
+            attempts.append(sorted(batch))
+            if len(attempts) <= 2:
+                raise ValueError("connection reset")
+
+        buffer = WriteBehindBuffer(flaky, batch_size=100, flush_interval=60)
+        buffer.submit("app_1", rows("app_1", 3))
+        buffer.flush()
+        stats = buffer.stats()
+        assert stats["rows_written"] == 3
+        assert stats["retried_writes"] == 1
+        assert stats["dropped_rows"] == 0
+        assert buffer.pending("app_1") is None
+        buffer.shutdown()
+
+    def test_exhausted_retries_report_dropped_rows(self, caplog):
+        writer = Recorder(fail_for={"app_1"})
+        buffer = WriteBehindBuffer(writer, batch_size=100, flush_interval=60, max_attempts=3)
+        buffer.submit("app_1", rows("app_1", 4))
+        with caplog.at_level("ERROR", logger="services.write_behind"):
+            buffer.flush()
+        stats = buffer.stats()
+        assert stats["retried_writes"] == 2
+        assert stats["failed_applications"] == 1
+        assert stats["dropped_rows"] == 4
+        assert "Dropping 4 match rows for app_1" in caplog.text
+        buffer.shutdown()
+
+    def test_shutdown_flushes_pending_rows(self):
+        writer = Recorder()
+        buffer = WriteBehindBuffer(writer, batch_size=100, flush_interval=60)
+        buffer.submit("app_1", rows("app_1"))
+        buffer.shutdown()
+        assert writer.batches == [{"app_1": rows("app_1")}]
@@ -1,9 +1,63 @@
-import uuid
-from datetime import datetime
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+ALPHABET = "0123456789abcdefghjkmnpqrstvwxyz"
+TIME_CHARS = 10
+RANDOM_CHARS = 16
+RANDOM_BITS = 80
+MAX_RANDOM = (1 << RANDOM_BITS) - 1
+
+
+class IdState:
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.last_ms = 0
+        self.last_random = 0
+
+    def next(self) -> tuple[int, int]:
+        with self.lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self.last_ms:
+                self.last_ms = now_ms
+                self.last_random = int.from_bytes(os.urandom(10), "big")
+            elif self.last_random < MAX_RANDOM:
+                self.last_random += 1
+            else:
+                self.last_ms += 1
+                self.last_random = int.from_bytes(os.urandom(10), "big")
+            return self.last_ms, self.last_random
+
+
+_state = IdState()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_state.reset)
+
+def encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(ALPHABET[index])
+    return "".join(reversed(chars))
 
 def generate_id(prefix: str) -> str:
-    short_uuid = uuid.uuid4().hex[:8]
-    return f"{prefix}_{short_uuid}"
+    timestamp, randomness = _state.next()
+    return f"{prefix}_{encode(timestamp, TIME_CHARS)}{encode(randomness, RANDOM_CHARS)}"
+
+def id_time(value: str) -> datetime:
+    encoded = value.rsplit("_", 1)[-1]
+    if len(encoded) != TIME_CHARS + RANDOM_CHARS:
+        raise ValueError(f"Not a time-ordered id: {value}")
+    timestamp = 0
+    for char in encoded[:TIME_CHARS]:
+        timestamp = timestamp * 32 + ALPHABET.index(char)
+    return datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc)
 
 def app_id() -> str:
     return generate_id("app")
@@ -22,3 +76,6 @@ def policy_id() -> str:
 
 def match_id() -> str:
     return generate_id("mtc")
+
+def job_id() -> str:
+    return generate_id("job")